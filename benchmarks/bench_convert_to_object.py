@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares the indexed type lookup of Client.convert_to_object
+with scanning every registered type, as it used to do.
+"""
+
+from fixtures import best_of, list_fixtures, report
+
+from pybitbucket.bitbucket import Client
+
+
+def scan_all_types(data):
+    for t in Client.bitbucket_types:
+        if t.is_type(data):
+            return t
+
+
+def nested_dicts(data):
+    """Every dict that convert_to_object may see while building a page."""
+    if isinstance(data, dict):
+        yield data
+        data = list(data.values())
+    if isinstance(data, list):
+        for value in data:
+            for d in nested_dicts(value):
+                yield d
+
+
+def main():
+    rows = []
+    for name, page in list_fixtures().items():
+        items = list(nested_dicts(page))
+
+        def scan():
+            for item in items:
+                scan_all_types(item)
+
+        def index():
+            for item in items:
+                Client.bitbucket_types.type_of(item)
+
+        scanned = best_of(scan)
+        indexed = best_of(index)
+        rows.append((name, '{0:8.1f}us {1:8.1f}us {2:5.1f}x'.format(
+            scanned, indexed, scanned / indexed)))
+    report(
+        'type lookups per page, nested dicts included:'
+        ' scan, index, speedup', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares the peak memory of reading a large pull request diff whole,
+as PullRequest.diff does, with parsing it one file at a time,
+as PullRequest.diff_files does,
+on a diff made by repeating the Diff.txt fixture.
+"""
+
+import tracemalloc
+
+from fixtures import best_of, fixture_text, report
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.streaming import parse_diff
+
+REPEATS = 20000
+
+
+def large_diff_chunks():
+    content = (fixture_text('Diff.txt') * REPEATS).encode('utf-8')
+    size = Client.stream_chunk_size
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+def whole(chunks):
+    # As response.content does, before the diff can be looked at.
+    for line in b''.join(chunks).decode('utf-8').splitlines():
+        pass
+
+
+def parsed(chunks):
+    for file_diff in parse_diff(chunks):
+        pass
+
+
+def peak_memory(read, chunks):
+    tracemalloc.start()
+    read(chunks)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    chunks = large_diff_chunks()
+    rows = []
+    for name, read in (('whole diff', whole), ('file by file', parsed)):
+        elapsed = best_of(lambda: read(chunks), number=1)
+        rows.append((name, '{0:8.1f}ms {1:8.0f}KB'.format(
+            elapsed / 1e3, peak_memory(read, chunks) / 1024.0)))
+    report(
+        'a diff of {0} files, {1}KB: time, peak memory'.format(
+            2 * REPEATS, sum(len(c) for c in chunks) // 1024),
+        rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares converting pages of resources, whose embedded resources
+are only built when first used, with building every one of them,
+as Client.convert_to_object used to do.
+"""
+
+import gc
+
+from fixtures import best_of, list_fixtures, report
+
+from pybitbucket.bitbucket import BitbucketBase, Client
+
+
+def build_everything(resource):
+    """Use every deferred attribute, and theirs, recursively."""
+    if isinstance(resource, list):
+        for r in resource:
+            build_everything(r)
+    elif isinstance(resource, BitbucketBase):
+        for name in list(resource.__dict__.get('pending_resources', {})):
+            build_everything(getattr(resource, name))
+
+
+def objects_allocated(convert):
+    gc.collect()
+    before = len(gc.get_objects())
+    kept = convert()
+    gc.collect()
+    after = len(gc.get_objects())
+    del kept
+    return after - before
+
+
+def main():
+    client = Client()
+    rows = []
+    for name, page in list_fixtures().items():
+
+        def lazy():
+            return [client.convert_to_object(item) for item in page]
+
+        def eager():
+            resources = lazy()
+            build_everything(resources)
+            return resources
+
+        eager_time = best_of(eager, number=200)
+        lazy_time = best_of(lazy, number=200)
+        rows.append((name, (
+            '{0:8.1f}us {1:8.1f}us {2:5.1f}x {3:6d} {4:6d}').format(
+            eager_time,
+            lazy_time,
+            eager_time / lazy_time,
+            objects_allocated(eager),
+            objects_allocated(lazy))))
+    report(
+        'converting a page: eager, lazy, speedup,'
+        ' objects kept eager, lazy', rows)
+
+
+if __name__ == '__main__':
+    main()
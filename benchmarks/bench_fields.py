@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares the size of a page of repositories and pull requests,
+and the time to decode it and make its resources,
+with every field and trimmed to a few fields to include,
+as Bitbucket trims a response for the fields parameter.
+Pages are made by repeating the items of the list fixtures
+up to the largest pagelen that Bitbucket allows.
+"""
+
+import json
+
+from fixtures import best_of, fixture_data, report
+
+from pybitbucket.bitbucket import Client
+
+PAGELEN = 100
+
+WORKLOADS = (
+    ('Repository_list.json', ['values.full_name', 'values.updated_on']),
+    ('PullRequest_list.json', [
+        'values.title', 'values.state', 'values.updated_on']),
+)
+
+
+def trim(data, fields):
+    """Keep the dotted fields of data, as Bitbucket does."""
+    trimmed = {}
+    for field in fields:
+        source, target = data, trimmed
+        names = field.split('.')
+        for name in names[:-1]:
+            if not isinstance(source, dict) or name not in source:
+                break
+            source = source[name]
+            target = target.setdefault(name, {})
+        else:
+            if isinstance(source, list):
+                # Fields below values apply to each of its items.
+                continue
+            if isinstance(source, dict) and names[-1] in source:
+                target[names[-1]] = source[names[-1]]
+    return trimmed
+
+
+def main():
+    client = Client()
+    rows = []
+    for filename, fields in WORKLOADS:
+        page = fixture_data(filename)
+        values = page['values']
+        page['values'] = [values[i % len(values)] for i in range(PAGELEN)]
+        item_fields = [
+            f[len('values.'):]
+            for f in Client.fields_query(fields).split(',')
+            if f.startswith('values.')]
+        trimmed = dict(
+            (k, v) for (k, v) in page.items() if k != 'values')
+        trimmed['values'] = [trim(v, item_fields) for v in page['values']]
+        for name, data in (('all', page), ('fields', trimmed)):
+            content = json.dumps(data).encode('utf-8')
+
+            def decode():
+                for item in client.codec.loads(content)['values']:
+                    client.convert_to_object(item)
+
+            rows.append(('{0} {1}'.format(filename, name), (
+                '{0:6d}KB {1:8.1f}us').format(
+                    len(content) // 1024, best_of(decode, number=20))))
+    report(
+        'a page of {0} items: size, decode and convert'.format(PAGELEN),
+        rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Measures a cold import of pybitbucket in a fresh interpreter,
+as a short-lived command line job would pay for it,
+and counts the HTTP sessions created while importing.
+"""
+
+import subprocess
+import sys
+
+from fixtures import report
+
+from os import path
+
+REPOSITORY_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+
+MEASURE = """
+import time
+import requests
+sessions = []
+original = requests.Session.__init__
+def counting(self, *args, **kwargs):
+    sessions.append(self)
+    original(self, *args, **kwargs)
+requests.Session.__init__ = counting
+start = time.perf_counter() if hasattr(time, 'perf_counter') else time.time()
+import {module}
+end = time.perf_counter() if hasattr(time, 'perf_counter') else time.time()
+print((end - start) * 1e3, len(sessions))
+"""
+
+
+def cold_import(module):
+    output = subprocess.check_output(
+        [sys.executable, '-c', MEASURE.format(module=module)],
+        cwd=REPOSITORY_DIR)
+    milliseconds, sessions = output.split()
+    return float(milliseconds), int(sessions)
+
+
+def main(runs=10):
+    rows = []
+    for module in (
+            'pybitbucket.bitbucket',
+            'pybitbucket.build',
+            'pybitbucket.snippet'):
+        results = [cold_import(module) for _ in range(runs)]
+        rows.append((module, '{0:8.1f}ms {1:4d}'.format(
+            min(ms for (ms, _) in results),
+            results[0][1])))
+    report(
+        'cold import, after requests, best of {0}: time, sessions'.format(
+            runs),
+        rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares the codecs of pybitbucket.codec on large pages,
+made by repeating the items of the PullRequest and Commit fixtures
+up to the largest pagelen that Bitbucket allows.
+Decoding is measured from the bytes of a response,
+and encoding with the enums that payloads hold.
+"""
+
+import json
+
+from fixtures import best_of, fixture_data, report
+
+from pybitbucket.bitbucket import RepositoryType
+from pybitbucket.codec import JSONCodec, OrjsonCodec
+
+PAGELEN = 100
+
+
+def large_page(filename):
+    page = fixture_data(filename)
+    values = page['values']
+    page['values'] = [
+        values[i % len(values)] for i in range(PAGELEN)]
+    page['pagelen'] = PAGELEN
+    return page
+
+
+def codecs():
+    codecs = [('json', JSONCodec())]
+    try:
+        codecs.append(('orjson', OrjsonCodec()))
+    except ImportError:
+        print('orjson is not installed: pip install pybitbucket_fork[orjson]')
+    return codecs
+
+
+def main():
+    rows = []
+    for filename in ('PullRequest_list.json', 'Commit_list.json'):
+        page = large_page(filename)
+        content = json.dumps(page).encode('utf-8')
+        payload = dict(page, scm=RepositoryType.GIT)
+        for name, codec in codecs():
+            decode = best_of(lambda: codec.loads(content), number=50)
+            encode = best_of(lambda: codec.encode(payload), number=50)
+            rows.append(('{0} {1}'.format(filename, name), (
+                '{0:8.1f}us {1:8.1f}us {2:5d}KB').format(
+                decode, encode, len(content) // 1024)))
+    report(
+        'a page of {0} items: decode, encode, size'.format(PAGELEN), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Measures queries answered by a Mirror from its SQLite indexes,
+for the pull requests of many repositories,
+made by repeating the items of the PullRequest fixture.
+"""
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from fixtures import best_of, fixture_data, report
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.mirror import Mirror
+
+REPOSITORIES = 100
+PULLREQUESTS = 200
+STATES = ('OPEN', 'MERGED', 'DECLINED')
+
+
+def pullrequests(template):
+    for i in range(PULLREQUESTS):
+        data = dict(template)
+        data['id'] = i
+        data['state'] = STATES[i % len(STATES)]
+        data['updated_on'] = '2017-{0:02d}-{1:02d}T00:00:00+00:00'.format(
+            1 + i % 12, 1 + i % 28)
+        yield data
+
+
+def main():
+    template = fixture_data('PullRequest_list.json')['values'][0]
+    directory = mkdtemp()
+    try:
+        mirror = Mirror(
+            os.path.join(directory, 'mirror.sqlite'), client=Client())
+        for r in range(REPOSITORIES):
+            mirror.store(
+                'pullrequest',
+                'teamsinspace',
+                'repository-{0}'.format(r),
+                pullrequests(template))
+        queries = (
+            ('open in one repository', dict(
+                owner='teamsinspace',
+                repository_name='repository-7',
+                state='OPEN')),
+            ('updated in one repository', dict(
+                owner='teamsinspace',
+                repository_name='repository-7',
+                since='2017-12-01')),
+        )
+        rows = []
+        for name, query in queries:
+            found = len(list(mirror.pullrequests(raw=True, **query)))
+
+            def raw():
+                list(mirror.pullrequests(raw=True, **query))
+
+            def objects():
+                list(mirror.pullrequests(**query))
+
+            rows.append((name, '{0:4d} found {1:8.1f}us {2:8.1f}us'.format(
+                found, best_of(raw, number=20), best_of(objects, number=20))))
+        report(
+            '{0} pull requests: found, raw, resources'.format(
+                REPOSITORIES * PULLREQUESTS),
+            rows)
+        mirror.close()
+    finally:
+        rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
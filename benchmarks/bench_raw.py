@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares the items per second that Client.remote_relationship generates
+as resources and, with raw=True, as the decoded json,
+for a page of each list fixture repeated up to the largest pagelen.
+Each page is decoded from its bytes, as it is from a response,
+so both modes pay for the same decoding.
+"""
+
+import json
+
+from fixtures import best_of, list_fixtures, report
+
+from pybitbucket.bitbucket import Client
+
+PAGELEN = 100
+
+
+class PageClient(Client):
+    """A client that answers every url with the same page."""
+
+    def __init__(self, content):
+        super(PageClient, self).__init__()
+        self.content = content
+
+    def get_page(self, url):
+        return self.codec.loads(self.content)
+
+
+def main():
+    rows = []
+    for name, values in list_fixtures().items():
+        if not values:
+            continue
+        page = {
+            'pagelen': PAGELEN,
+            'values': [values[i % len(values)] for i in range(PAGELEN)]}
+        client = PageClient(json.dumps(page).encode('utf-8'))
+        template = 'https://api.bitbucket.org/2.0/things'
+
+        def objects():
+            for _ in client.remote_relationship(template):
+                pass
+
+        def raw():
+            for _ in client.remote_relationship(template, raw=True):
+                pass
+
+        per_object = best_of(objects, number=20) / PAGELEN
+        per_raw = best_of(raw, number=20) / PAGELEN
+        rows.append((name, '{0:10.0f}/s {1:10.0f}/s {2:5.1f}x'.format(
+            1e6 / per_object, 1e6 / per_raw, per_object / per_raw)))
+    report('items per second: objects, raw, speedup', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares the peak memory and time of decoding a whole page
+with streaming its items through a ValuesParser,
+on a page of several megabytes made from the PullRequest fixtures,
+arriving in the chunks that Client.stream_pages reads.
+"""
+
+import json
+import tracemalloc
+
+from fixtures import best_of, fixture_data, report
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.streaming import ValuesParser
+
+ITEMS = 1000
+
+
+def large_page_chunks():
+    page = fixture_data('PullRequest_list.json')
+    values = page['values']
+    page['values'] = [values[i % len(values)] for i in range(ITEMS)]
+    content = json.dumps(page).encode('utf-8')
+    size = Client.stream_chunk_size
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+def whole(chunks):
+    # As response.json() does, after reading the body.
+    for item in json.loads(b''.join(chunks).decode('utf-8'))['values']:
+        pass
+
+
+def streamed(chunks):
+    parser = ValuesParser()
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            pass
+    for item in parser.feed(b'', final=True):
+        pass
+    parser.close()
+
+
+def peak_memory(read, chunks):
+    tracemalloc.start()
+    read(chunks)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    chunks = large_page_chunks()
+    rows = []
+    for name, read in (('whole page', whole), ('streamed', streamed)):
+        elapsed = best_of(lambda: read(chunks), number=5)
+        peak = peak_memory(read, chunks)
+        rows.append((name, '{0:8.1f}ms {1:8.0f}KB'.format(
+            elapsed / 1e3, peak / 1024.0)))
+    report(
+        'a page of {0} items, {1}KB: time, peak memory'.format(
+            ITEMS, sum(len(c) for c in chunks) // 1024),
+        rows)
+
+
+if __name__ == '__main__':
+    main()
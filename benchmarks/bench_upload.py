@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares the peak memory of a multipart snippet upload
+built by requests, which reads every file into the body up front,
+with a MultipartUpload, which reads each file as it is sent,
+in the blocks that http.client sends a body in.
+"""
+
+import os
+import tempfile
+import tracemalloc
+
+from requests.models import RequestEncodingMixin
+
+from fixtures import report
+
+from pybitbucket.multipart import MultipartUpload
+
+FILES = 4
+FILE_SIZE = 16 * 1024 * 1024
+BLOCK_SIZE = 8192
+
+
+def make_files(directory):
+    paths = []
+    for n in range(FILES):
+        name = os.path.join(directory, 'artifact{0}.log'.format(n))
+        with open(name, 'wb') as f:
+            for _ in range(FILE_SIZE // (1024 * 1024)):
+                f.write(os.urandom(1024 * 1024))
+        paths.append(name)
+    return paths
+
+
+def built_by_requests(paths):
+    handles = [open(p, 'rb') for p in paths]
+    try:
+        body, _ = RequestEncodingMixin._encode_files(
+            [('file', (p, f)) for (p, f) in zip(paths, handles)],
+            {'title': 'Artifacts'})
+        for start in range(0, len(body), BLOCK_SIZE):
+            body[start:start + BLOCK_SIZE]
+    finally:
+        for f in handles:
+            f.close()
+
+
+def streamed(paths):
+    upload = MultipartUpload({'title': 'Artifacts'}, paths)
+    for block in iter(lambda: upload.read(BLOCK_SIZE), b''):
+        pass
+
+
+def peak_memory(send, paths):
+    tracemalloc.start()
+    send(paths)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    paths = make_files(directory)
+    try:
+        rows = [
+            (name, '{0:8.0f}KB'.format(peak_memory(send, paths) / 1024.0))
+            for (name, send)
+            in (('built by requests', built_by_requests),
+                ('MultipartUpload', streamed))]
+        report(
+            'uploading {0} files of {1}MB: peak memory'.format(
+                FILES, FILE_SIZE // (1024 * 1024)),
+            rows)
+    finally:
+        for p in paths:
+            os.remove(p)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
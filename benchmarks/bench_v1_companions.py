@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Compares building 2.0 repositories and users with their 1.0 companions,
+as every one of them used to be, with building them on their own,
+now that the companions are only built when first used.
+"""
+
+from fixtures import best_of, list_fixtures, report
+
+from pybitbucket.bitbucket import Client
+
+
+def main():
+    client = Client()
+    fixtures = list_fixtures()
+    rows = []
+    for name in ('Repository_list.json', 'User_list.json'):
+        page = fixtures[name]
+
+        def deferred():
+            return [client.convert_to_object(item) for item in page]
+
+        def with_v1():
+            resources = deferred()
+            for resource in resources:
+                resource.v1
+            return resources
+
+        eager_time = best_of(with_v1, number=200) / len(page)
+        deferred_time = best_of(deferred, number=200) / len(page)
+        rows.append((name, '{0:8.1f}us {1:8.1f}us {2:5.1f}x'.format(
+            eager_time,
+            deferred_time,
+            eager_time / deferred_time)))
+    report(
+        'building one resource: with v1, deferred v1, speedup', rows)
+
+
+if __name__ == '__main__':
+    main()
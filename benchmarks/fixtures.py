@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals, print_function
+
+"""
+Helpers shared by the benchmark scripts.
+
+The benchmarks reuse the sample data from the tests directory
+and are meant to be run directly, for example:
+
+    python benchmarks/bench_convert_to_object.py
+"""
+
+import json
+import sys
+from glob import glob
+from os import path
+from timeit import repeat
+
+if sys.version_info < (3, 0):
+    import io
+    open = io.open
+
+BENCHMARK_DIR = path.dirname(path.abspath(__file__))
+TESTS_DIR = path.join(path.dirname(BENCHMARK_DIR), 'tests')
+sys.path.insert(0, path.dirname(BENCHMARK_DIR))
+
+
+def fixture_text(filename):
+    with open(path.join(TESTS_DIR, filename), encoding='utf-8') as f:
+        return f.read()
+
+
+def fixture_data(filename):
+    return json.loads(fixture_text(filename))
+
+
+def list_fixtures():
+    """Map the name of each non-empty *_list.json fixture to its items."""
+    fixtures = {}
+    for filename in sorted(glob(path.join(TESTS_DIR, '*_list.json'))):
+        name = path.basename(filename)
+        text = fixture_text(name)
+        if not text:
+            continue
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get('values', [])
+        fixtures[name] = data
+    return fixtures
+
+
+def best_of(stmt, number=1000, repetitions=5):
+    """Best time in microseconds for a single run of stmt."""
+    return min(repeat(stmt, number=number, repeat=repetitions)) / number * 1e6
+
+
+def report(title, rows):
+    print(title)
+    for row in rows:
+        print('  {0:<36} {1}'.format(*row))
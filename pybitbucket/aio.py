@@ -0,0 +1,619 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for communicating with the Bitbucket API from asyncio.
+
+The resource classes work the same with an AsyncClient as with a Client,
+except that relationships are async generators,
+and the finders of a single resource, the methods that read a body,
+like PullRequest.diff and Snippet.content,
+and the methods that change resources are coroutines:
+
+    async with AsyncClient(AsyncBasicAuthenticator(...)) as client:
+        repository = await Repository.find_repository_by_name_and_owner(
+            'testing', owner='pybitbucket', client=client)
+        async for pullrequest in repository.pullrequests():
+            await pullrequest.approve()
+
+Responses are neither cached nor streamed:
+downloads, like Snippet.download_all, are written once each body
+has arrived, and the methods that stream a body, like
+PullRequest.diff_files, need a Client, and raise NotImplementedError.
+
+This module requires Python 3.6 or later, for async generators,
+and aiohttp, which can be installed with the async extra of pybitbucket.
+
+Classes:
+- AsyncAuthenticator: parent class for asyncio authentication
+- AsyncAnonymous: no authentication
+- AsyncBasicAuthenticator: username and password authentication
+- AsyncOAuth2Authenticator: OAuth 2.0 authentication
+- AsyncResponse: a read response that looks like a requests Response
+- AsyncClient: abstraction over asyncio HTTP requests to Bitbucket API
+"""
+
+import asyncio
+from base64 import b64encode
+from collections import deque
+from functools import partial
+from itertools import islice
+from json import dumps, loads
+
+import aiohttp
+from oauthlib.oauth2 import WebApplicationClient
+from requests.exceptions import HTTPError
+from requests_oauthlib import OAuth2Session
+from uritemplate import expand
+
+from pybitbucket.auth import Authenticator
+from pybitbucket.bitbucket import Client, FetchResult
+from pybitbucket.codec import JSONCodec, JSONEncoder
+from pybitbucket.multipart import LazyFile
+
+
+def basic_authorization(username, password):
+    """The value of an Authorization header for HTTP Basic auth."""
+    credentials = '{0}:{1}'.format(username, password).encode('latin1')
+    return 'Basic {0}'.format(b64encode(credentials).decode('ascii'))
+
+
+class AsyncAuthenticator(object):
+    headers = staticmethod(Authenticator.headers)
+
+    async def start_http_session(self, session=None):
+        session = session or aiohttp.ClientSession(
+            json_serialize=partial(dumps, cls=JSONEncoder))
+        if not isinstance(session, aiohttp.ClientSession):
+            raise TypeError('session argument shall be of ClientSession type')
+        session.headers.update(self.headers())
+        self.session = session
+        return session
+
+    def request_options(self):
+        """Options added to every request made with this authenticator."""
+        return {}
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    def get_username(self):
+        return ""
+
+    def get_identity(self):
+        return '{0} {1}'.format(self.server_base_uri, self.get_username())
+
+    def get_principal(self):
+        return '{0} {1}'.format(
+            self.server_base_uri, getattr(self, 'username', None) or '')
+
+    async def who_am_i(self):
+        async with self.session.get(
+                self.who_am_i_url,
+                **self.request_options()) as response:
+            response.raise_for_status()
+            return (await response.json())['username']
+
+    def __init__(self, server_base_uri=None, session=None):
+        self.server_base_uri = server_base_uri or 'https://api.bitbucket.org'
+        self.who_am_i_url = expand(
+            '{+server_base_uri}/2.0/user',
+            {'server_base_uri': self.server_base_uri})
+        # The session is started by the AsyncClient,
+        # because aiohttp sessions belong to a running event loop.
+        self.session = session
+
+
+class AsyncAnonymous(AsyncAuthenticator):
+    pass
+
+
+class AsyncBasicAuthenticator(AsyncAuthenticator):
+
+    async def start_http_session(self, session=None):
+        session = await super(
+            AsyncBasicAuthenticator, self).start_http_session(session)
+        session.headers.update(self.headers(email=self.client_email))
+        return session
+
+    def request_options(self):
+        return {'headers': {
+            'Authorization': basic_authorization(
+                self.username,
+                self.password)}}
+
+    def get_username(self):
+        return self.username
+
+    def __init__(
+            self,
+            username,
+            password,
+            client_email,
+            server_base_uri=None,
+            session=None):
+        self.username = username
+        self.password = password
+        self.client_email = client_email
+        super(AsyncBasicAuthenticator, self).__init__(
+                server_base_uri=server_base_uri,
+                session=session
+        )
+
+
+class AsyncOAuth2Authenticator(AsyncAuthenticator):
+    def __init__(
+            self,
+            client_id,
+            client_secret,
+            client_email,
+            grant,
+            redirect_uris=None,
+            server_base_uri=None,
+            redirect_response=None,
+            client_name=None,
+            client_description=None,
+            auth_uri=None,
+            token_uri=None,
+            token=None,
+            session=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.client_email = client_email
+        self.grant = grant
+        self.redirect_uris = redirect_uris
+        self.client_name = client_name
+        self.client_description = client_description
+        self.redirect_response = redirect_response
+        self.token = token
+        self.username = None
+        self.server_base_uri = server_base_uri or 'https://api.bitbucket.org'
+        self.auth_uri = (
+            auth_uri or expand(
+                '{+server_base_uri}/site/oauth2/authorize',
+                {'server_base_uri': self.server_base_uri}))
+        self.token_uri = (
+            token_uri or expand(
+                '{+server_base_uri}/site/oauth2/access_token',
+                {'server_base_uri': self.server_base_uri}))
+        super(AsyncOAuth2Authenticator, self).__init__(
+                server_base_uri=server_base_uri,
+                session=session
+        )
+
+    async def fetch_token(self):
+        oauth_client = WebApplicationClient(self.client_id)
+        if not self.redirect_response:
+            # The grant only uses the session to build the authorization URL,
+            # which needs no I/O.
+            self.redirect_response = self.grant.obtain_authorization(
+                OAuth2Session(self.client_id, client=oauth_client),
+                self.auth_uri)
+        oauth_client.parse_request_uri_response(self.redirect_response)
+        body = oauth_client.prepare_request_body(code=oauth_client.code)
+        async with self.session.post(
+                self.token_uri,
+                data=body,
+                headers={
+                    'Authorization': basic_authorization(
+                        self.client_id,
+                        self.client_secret),
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                }) as response:
+            response.raise_for_status()
+            return oauth_client.parse_request_body_response(
+                await response.text())
+
+    async def start_http_session(self, session=None):
+        session = await super(
+            AsyncOAuth2Authenticator, self).start_http_session(session)
+        session.headers.update(self.headers(email=self.client_email))
+        if not self.token:
+            self.token = await self.fetch_token()
+        # Unlike the blocking authenticator,
+        # get_username cannot make a request when it is called.
+        self.username = await self.who_am_i()
+        return session
+
+    def request_options(self):
+        return {'headers': {
+            'Authorization': 'Bearer {0}'.format(
+                self.token['access_token'])}}
+
+    def get_username(self):
+        return self.username
+
+    def get_principal(self):
+        return '{0} {1}'.format(self.server_base_uri, self.client_id)
+
+
+class AsyncResponse(object):
+    """
+    The body and status of an aiohttp response
+    in the shape of a requests Response,
+    so that Client.expect_ok and the Bitbucket errors can use it.
+    """
+
+    def __init__(self, response, content):
+        self.url = str(response.url)
+        self.status_code = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.encoding = response.get_encoding()
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self):
+        return loads(self.text)
+
+    def raise_for_status(self):
+        if 400 <= self.status_code:
+            raise HTTPError(
+                '{0} {1} for url: {2}'.format(
+                    self.status_code,
+                    self.reason,
+                    self.url),
+                response=self)
+
+
+class AsyncClient(Client):
+    """
+    A Client whose requests are made with aiohttp.
+
+    The session is started on the first request,
+    or explicitly with start or by using the client as
+    an async context manager, which also closes it.
+    """
+
+    @property
+    def session(self):
+        return self.config.session
+
+    async def start(self):
+        if self.started:
+            return self
+        # Concurrent first requests wait for one session to start,
+        # since an authorization code can only be exchanged once.
+        if self.starting is None:
+            self.starting = asyncio.Lock()
+        async with self.starting:
+            if not self.started:
+                await self.config.start_http_session(self.config.session)
+                self.started = True
+        return self
+
+    async def close(self):
+        await self.config.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def request(self, method, url, **kwargs):
+        """
+        Make a request, retrying it if the client has a retry policy.
+        Waiting before a retry does not block the event loop.
+        """
+        retry = 0
+        while True:
+            try:
+                response = await self.request_once(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                wait = self.retry and self.retry.wait_before_retry(
+                    method, retry)
+                if wait is None:
+                    raise
+            else:
+                wait = self.retry and self.retry.wait_before_retry(
+                    method, retry, response)
+                if wait is None:
+                    return response
+            await asyncio.sleep(wait)
+            retry += 1
+
+    async def request_once(self, method, url, files=None, **kwargs):
+        await self.start()
+        if files:
+            # Like requests, send the data and files as multipart form.
+            form = aiohttp.FormData()
+            for name, value in (kwargs.pop('data', None) or {}).items():
+                form.add_field(name, value)
+            for name, (filename, fileobj) in files:
+                if isinstance(fileobj, LazyFile):
+                    # aiohttp closes the file once it has been sent.
+                    fileobj = open(fileobj.name, 'rb')
+                form.add_field(name, fileobj, filename=filename)
+            kwargs['data'] = form
+            kwargs.pop('json', None)
+            # aiohttp streams the form, but does not report progress.
+            kwargs.pop('progress', None)
+        else:
+            kwargs = self.json_options(kwargs.pop('json', None), kwargs)
+        options = self.config.request_options()
+        if kwargs.get('headers') and options.get('headers'):
+            headers = dict(options.pop('headers'))
+            headers.update(kwargs.pop('headers'))
+            options['headers'] = headers
+        options.update(kwargs)
+        if self.rate_limiter is not None:
+            # A bucket may block on its database, so not in the event loop.
+            loop = asyncio.get_event_loop()
+            key = self.config.get_principal()
+            await asyncio.sleep(await loop.run_in_executor(
+                None, self.rate_limiter.reserve, key))
+        async with self.session.request(method, url, **options) as response:
+            response = AsyncResponse(response, await response.read())
+        if self.rate_limiter is not None:
+            await loop.run_in_executor(
+                None, self.rate_limiter.observe, key, response)
+        return response
+
+    async def get(self, url):
+        return await self.request('GET', url)
+
+    async def get_page(self, url):
+        response = await self.get(url)
+        self.expect_ok(response)
+        return self.json_from(response)
+
+    async def get_object(self, url):
+        """Get the resource at a URL."""
+        return self.convert_to_object(await self.get_page(url))
+
+    async def find_object(self, url, build=None, raw=False):
+        """
+        Get the resource at a URL, or None when it is not found.
+        Takes the same arguments as Client.find_object.
+        """
+        response = await self.get(url)
+        if 404 == response.status_code:
+            return None
+        self.expect_ok(response)
+        json_data = self.json_from(response)
+        if raw:
+            return json_data
+        return (build or self.convert_to_object)(json_data)
+
+    async def get_content(self, url):
+        """The body of the response to a GET of a URL, as bytes."""
+        response = await self.get(url)
+        self.expect_ok(response)
+        return response.content
+
+    @staticmethod
+    async def first(items):
+        """The first item generated by a relationship."""
+        try:
+            return await items.__anext__()
+        finally:
+            await items.aclose()
+
+    async def read_new(
+            self, listing, identify, known=frozenset(), since=None, save=None):
+        """
+        Generate the items of a listing, newest first,
+        until one that was already read.
+        Takes the same arguments as Client.read_new.
+        """
+        newest = None
+        while True:
+            items = listing(since)
+            try:
+                async for item in items:
+                    key = identify(item)
+                    if key in known:
+                        break
+                    newest = newest or key
+                    yield item
+                break
+            except HTTPError as e:
+                if not (since and newest is None and self.is_gone(e)):
+                    raise
+                since = None
+            finally:
+                await items.aclose()
+        if save and newest is not None:
+            save(newest)
+
+    def stream_content(self, url, chunk_size=None):
+        raise NotImplementedError(
+            'An AsyncClient does not stream responses, '
+            'use get_content or a Client instead.')
+
+    async def download(self, url, destination):
+        """
+        Write the body of the response to a GET of a URL,
+        once all of it has arrived.
+        Takes the same arguments as Client.download.
+        """
+        return self.write_chunks(
+            url, [await self.get_content(url)], destination)
+
+    async def download_one(self, url, destination):
+        try:
+            if callable(destination):
+                destination = destination()
+            await self.download(url, destination)
+            return FetchResult(url, destination, None)
+        except Exception as e:
+            return FetchResult(url, None, e)
+
+    def spool(self, url):
+        self.stream_content(url)
+
+    async def fetch_one(self, url, raw=False, fields=None):
+        try:
+            data = await self.get_page(
+                self.set_fields(url, fields) if fields else url)
+            return FetchResult(
+                url, data if raw else self.convert_to_object(data), None)
+        except Exception as e:
+            return FetchResult(url, None, e)
+
+    async def fetch_many(
+            self,
+            requests,
+            max_workers=8,
+            fetch=None,
+            raw=False,
+            fields=None):
+        """
+        Get many independent resources concurrently,
+        and generate them as they arrive.
+        Takes the same arguments as Client.fetch_many,
+        except that fetch is a coroutine function.
+        """
+        fetch = fetch or partial(self.fetch_one, raw=raw, fields=fields)
+        urls = self.urls_from(requests)
+        pending = set(
+            asyncio.ensure_future(fetch(url))
+            for url
+            in islice(urls, max_workers))
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    return_when=asyncio.FIRST_COMPLETED)
+                for url in islice(urls, len(done)):
+                    pending.add(asyncio.ensure_future(fetch(url)))
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def paginate(self, url, prefetch=0, max_items=None):
+        """
+        Generate the json items found at a URL,
+        following the pagination of 2.0 collections.
+        """
+        while url:
+            json_data = await self.get_page(url)
+            if isinstance(json_data, list):
+                for item in json_data:
+                    yield item
+                url = None
+            elif 'values' in json_data:
+                later_page_urls = iter(
+                    self.pages_to_prefetch(json_data, max_items)
+                    if prefetch else [])
+                pending = deque(
+                    asyncio.ensure_future(self.get_page(u))
+                    for u
+                    in islice(later_page_urls, prefetch))
+                try:
+                    for item in json_data['values']:
+                        yield item
+                    while pending:
+                        json_data = await pending.popleft()
+                        # Keep the window full while the caller
+                        # works on this page.
+                        for u in islice(later_page_urls, 1):
+                            pending.append(
+                                asyncio.ensure_future(self.get_page(u)))
+                        for item in json_data.get('values', []):
+                            yield item
+                finally:
+                    for task in pending:
+                        task.cancel()
+                # If the collection grew while it was being fetched,
+                # the last page links to the rest of it.
+                url = json_data.get('next')
+            else:
+                yield json_data
+                url = None
+
+    async def remote_relationship(
+            self,
+            template,
+            prefetch=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None,
+            q=None,
+            sort=None,
+            **keywords):
+        """
+        Navigate a relationship and generate the resources found there,
+        following the pagination of 2.0 collections.
+        Takes the same arguments as Client.remote_relationship,
+        except stream, since each page is read whole.
+        """
+        prefetch = self.prefetch if prefetch is None else prefetch
+        pagelen = self.pagelen if pagelen is None else pagelen
+        url = self.expand(template, keywords)
+        if pagelen:
+            url = self.set_query_parameter(url, 'pagelen', pagelen)
+        if fields:
+            url = self.set_fields(url, fields)
+        url = self.set_query(url, q, sort)
+        if (max_items is not None) and (max_items < 1):
+            return
+        count = 0
+        items = self.paginate(url, prefetch=prefetch, max_items=max_items)
+        try:
+            async for item in items:
+                yield item if raw else self.convert_to_object(item)
+                count += 1
+                # Stop without asking paginate for another page.
+                if (max_items is not None) and (count >= max_items):
+                    break
+        finally:
+            await items.aclose()
+
+    async def delete(self, url):
+        response = await self.request('DELETE', url)
+        # Deletes the resource and returns 204 (No Content).
+        self.expect_ok(response, 204)
+
+    async def put(self, url, json=None, **kwargs):
+        response = await self.request('PUT', url, json=json, **kwargs)
+        self.expect_ok(response)
+        return self.convert_to_object(self.json_from(response))
+
+    async def post(self, url, json=None, data=None, **kwargs):
+        if data:
+            response = await self.request('POST', url, data=data, **kwargs)
+        else:
+            response = await self.request('POST', url, json=json, **kwargs)
+        self.expect_ok(response)
+        return self.convert_to_object(self.json_from(response))
+
+    async def post_approval(self, url):
+        response = await self.request('POST', url)
+        self.expect_ok(response)
+        json_data = self.json_from(response)
+        return json_data.get('approved')
+
+    async def delete_approval(self, url):
+        response = await self.request('DELETE', url)
+        # Deletes the approval and returns 204 (No Content).
+        self.expect_ok(response, 204)
+        return True
+
+    def __init__(
+            self,
+            config=None,
+            prefetch=0,
+            pagelen=None,
+            retry=None,
+            rate_limiter=None,
+            codec=None):
+        self.config = config or AsyncAnonymous()
+        self.started = False
+        self.starting = None
+        self.cache = None
+        self.stream = False
+        self.prefetch = prefetch
+        self.pagelen = pagelen
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.codec = codec or JSONCodec()
@@ -9,7 +9,6 @@ Classes for abstracting over different forms of Bitbucket authentication.
 from requests.utils import default_user_agent
 from requests import Session
 from requests.auth import HTTPBasicAuth
-from requests_oauthlib import OAuth1Session, OAuth2Session
 from uritemplate import expand
 
 from pybitbucket import metadata
@@ -45,6 +44,23 @@ class Authenticator(object):
     def get_username(self):
         return ""
 
+    def get_identity(self):
+        """
+        Who the responses are for, without making a request.
+        Caches keep the responses for different identities apart.
+        """
+        return '{0} {1}'.format(self.server_base_uri, self.get_username())
+
+    def get_principal(self):
+        """
+        Who is making the requests, without any secret in it,
+        and without making a request,
+        so that it stays the same when a token is refreshed.
+        Rate limits are kept for each principal.
+        """
+        return '{0} {1}'.format(
+            self.server_base_uri, getattr(self, 'username', None) or '')
+
     def who_am_i(self):
         response = self.session.get(self.who_am_i_url)
         response.raise_for_status()
@@ -118,7 +134,18 @@ class OAuth1Authenticator(Authenticator):
             self.username = self.who_am_i()
         return self.username
 
+    def get_identity(self):
+        return '{0} {1} {2}'.format(
+            self.server_base_uri,
+            self.client_key,
+            self.access_token or '')
+
+    def get_principal(self):
+        return '{0} {1}'.format(self.server_base_uri, self.client_key)
+
     def start_http_session(self, session=None):
+        # requests_oauthlib is slow to import, and only OAuth needs it.
+        from requests_oauthlib import OAuth1Session
         session = session or OAuth1Session(
             self.client_key,
             client_secret=self.client_secret,
@@ -175,6 +202,7 @@ class OAuth2Authenticator(Authenticator):
         )
 
     def start_http_session(self, session=None):
+        from requests_oauthlib import OAuth2Session
         session = session or OAuth2Session(self.client_id)
         if not isinstance(session, OAuth2Session):
             raise TypeError('session argument shall be of OAuth2Session type instead of {}'.format(type(session)))
@@ -192,3 +220,12 @@ class OAuth2Authenticator(Authenticator):
         if not self.username:
             self.username = self.who_am_i()
         return self.username
+
+    def get_identity(self):
+        return '{0} {1} {2}'.format(
+            self.server_base_uri,
+            self.client_id,
+            (self.session.token or {}).get('access_token', ''))
+
+    def get_principal(self):
+        return '{0} {1}'.format(self.server_base_uri, self.client_id)
@@ -7,6 +7,9 @@ Core classes for communicating with the Bitbucket API.
 
 Classes:
 - Enumeration: abstraction for a set of enumerated values
+- BitbucketTypes: the set of resource classes, indexed by resource_type
+- PagePrefetcher: fetches pages of a collection ahead of the caller
+- FetchResult: the resource or the error found at a URL
 - Client: abstraction over HTTP requests to Bitbucket API
 - BitbucketSpecialAction: an enum of special actions to be handled by children
 - RepositoryType: an enum of repository types (Git, Hg)
@@ -17,17 +20,28 @@ Classes:
 - ServerError: exception wrapping server errors
 """
 
+from collections import deque, namedtuple
 from enum import Enum as EnumBase
-from json import loads, dumps, JSONEncoder as JSONEncoderBase
+from json import loads
 from functools import partial
-from requests import codes, models as requests_models
+from importlib import import_module
+from itertools import islice
+from requests import codes
 from requests.exceptions import HTTPError
-from uritemplate import expand
-from voluptuous import Schema
+from six import string_types, text_type
+from six.moves.urllib.parse import (
+    parse_qsl, urlencode, urlsplit, urlunsplit)
+from threading import RLock
 
-from pybitbucket.auth import Anonymous
+# JSONEncoder is still imported from here by older code.
+from pybitbucket.codec import JSONCodec, JSONEncoder  # noqa: F401
 from pybitbucket.entrypoints import entrypoints_json
 
+# The other modules that this one needs, like uritemplate, voluptuous,
+# concurrent.futures, and the authenticators with oauthlib,
+# are imported where they are used, so that a script that only
+# makes a few requests does not pay for importing all of them.
+
 
 # subclass Enum to make it behave the same way as the former custom Enum class
 class Enum(EnumBase):
@@ -35,19 +49,186 @@ class Enum(EnumBase):
         return self is o or self.__class__(o).value == self.value
 
 
-class JSONEncoder(JSONEncoderBase):
-    def default(self, obj):
-        if isinstance(obj, Enum):
-            return obj.value
-        return super(JSONEncoder, self).default(obj)
+class BitbucketTypes(set):
+    """
+    The set of resource classes that the Client can build from data.
+
+    Classes with a resource_type are categorized by the path of their
+    self link, so they are indexed by that resource_type. Other classes,
+    like the 1.0 resources, have their own way of recognizing data and
+    are kept as fallbacks to be checked one by one.
+
+    The modules of the resource classes are not imported up front.
+    Each is imported, and so registers its classes,
+    the first time data that it could claim is seen:
+    a resource_type in the path of a self link,
+    or a key that its fallback classes need to find in the data.
+    A module stays pending until its import has finished,
+    and other threads wait for it, so that none of them
+    can miss the classes it registers.
+    """
+
+    # The module registering the classes for each resource_type.
+    resource_modules = {
+        'users': 'pybitbucket.user',
+        'repositories': 'pybitbucket.repository',
+        'branch-restrictions': 'pybitbucket.branchrestriction',
+        'build': 'pybitbucket.build',
+        'comments': 'pybitbucket.comment',
+        'commit': 'pybitbucket.commit',
+        'hooks': 'pybitbucket.hook',
+        'pullrequests': 'pybitbucket.pullrequest',
+        'tags': 'pybitbucket.ref',
+        'branches': 'pybitbucket.ref',
+        'snippets': 'pybitbucket.snippet',
+        'teams': 'pybitbucket.team',
+    }
+
+    # The module registering the fallback classes that require each key.
+    fallback_modules = {
+        'resource_uri': 'pybitbucket.repository',
+        'user': 'pybitbucket.user',
+        'secret': 'pybitbucket.consumer',
+    }
+
+    def __init__(self, types=(), lazy=False):
+        super(BitbucketTypes, self).__init__()
+        self.by_resource_type = {}
+        self.fallbacks = []
+        self.pending_resource_types = dict(
+            self.resource_modules if lazy else {})
+        self.pending_fallback_keys = dict(
+            self.fallback_modules if lazy else {})
+        self.loading = RLock()
+        for t in types:
+            self.add(t)
+
+    def add(self, t):
+        if t in self:
+            return
+        super(BitbucketTypes, self).add(t)
+        resource_type = getattr(t, 'resource_type', None)
+        if resource_type:
+            self.by_resource_type.setdefault(resource_type, []).append(t)
+        else:
+            self.fallbacks.append(t)
+
+    def load(self, pending, key):
+        """Import the module still pending for a key, if any."""
+        with self.loading:
+            module = pending.get(key)
+            if module is not None:
+                import_module(module)
+                pending.pop(key, None)
+
+    def load_all(self):
+        """Import every pending module, so that all classes are known."""
+        for pending in (
+                self.pending_resource_types,
+                self.pending_fallback_keys):
+            for key in list(pending):
+                self.load(pending, key)
+
+    def type_of(self, data):
+        """
+        Find the resource class for the data, if any.
+
+        The self link is split only once and each part of its path
+        is looked up in the index. Only the indexed classes that share
+        a resource_type with the path are asked to confirm the match.
+        """
+        url_path = BitbucketBase.self_url_path(data)
+        if url_path is not None:
+            t = self.indexed_type_of(data, url_path)
+            if t is not None:
+                return t
+        return self.fallback_type_of(data)
+
+    def indexed_type_of(self, data, url_path):
+        """Find the indexed class for the path of the self link, if any."""
+        # Start looking from the end of the path,
+        # which is where the resource_type is most likely found.
+        for part in reversed(url_path):
+            if part in self.pending_resource_types:
+                self.load(self.pending_resource_types, part)
+            for t in self.by_resource_type.get(part, ()):
+                if t.has_v2_self_url(data, url_path):
+                    return t
+        return None
+
+    def fallback_type_of(self, data):
+        """Find the fallback class that recognizes the data, if any."""
+        if self.pending_fallback_keys:
+            for key in list(self.pending_fallback_keys):
+                if key in data:
+                    self.load(self.pending_fallback_keys, key)
+        for t in self.fallbacks:
+            if t.is_type(data):
+                return t
+        return None
+
+
+class PagePrefetcher(object):
+    """
+    Fetches the pages of a collection concurrently
+    and iterates over their json in order.
+    No more than prefetch pages are requested ahead of the caller.
+    """
+
+    def __init__(self, client, urls, prefetch):
+        from concurrent.futures import ThreadPoolExecutor
+        self.client = client
+        self.urls = iter(urls)
+        self.pending = deque()
+        self.executor = ThreadPoolExecutor(max_workers=prefetch)
+        for url in islice(self.urls, prefetch):
+            self.pending.append(self.executor.submit(client.get_page, url))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.pending:
+            self.close()
+            raise StopIteration
+        future = self.pending.popleft()
+        # Keep the window full while the caller works on this page.
+        for url in islice(self.urls, 1):
+            self.pending.append(
+                self.executor.submit(self.client.get_page, url))
+        return future.result()
+
+    next = __next__
+
+    def close(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=False)
 
 
-# monkey patch request's json handler
-requests_models.complexjson.dumps = partial(dumps, cls=JSONEncoder)
+class FetchResult(namedtuple('FetchResult', ['url', 'resource', 'error'])):
+    """
+    The resource found at a URL,
+    or the error raised while fetching it.
+    """
+
+    @property
+    def ok(self):
+        return self.error is None
 
 
 class Client(object):
-    bitbucket_types = set()
+    bitbucket_types = BitbucketTypes(lazy=True)
+    # The bytes read at a time from a streamed response.
+    stream_chunk_size = 64 * 1024
+    # The fields kept in a response trimmed by a list of fields to include:
+    # those that pagination needs, and those that recognize each item
+    # as a resource, its self link and the id_attribute of its type.
+    paging_fields = ('next', 'page', 'pagelen', 'size')
+    identifying_fields = (
+        'links.self', 'full_name', 'hash', 'id', 'key', 'name', 'username',
+        'uuid')
 
     @staticmethod
     def expect_ok(response, code=codes.ok):
@@ -63,38 +244,766 @@ class Client(object):
     def convert_to_object(self, data):
         if isinstance(data, Enum):
             return data.value()
-        for t in Client.bitbucket_types:
-            if t.is_type(data):
-                return t(data, client=self)
+        t = Client.bitbucket_types.type_of(data)
+        if t is not None:
+            return t(data, client=self)
         return data
 
-    def remote_relationship(self, template, **keywords):
-        url = expand(template, keywords)
-        while url:
-            response = self.session.get(url)
+    def get(self, url):
+        """
+        GET a URL with the session of the client.
+        If the client has a cache, a cached response is reused
+        while it is fresh, or revalidated
+        and reused when Bitbucket answers 304 (Not Modified).
+        """
+        if self.cache is None:
+            return self.send('GET', partial(self.session.get, url))
+        return self.send('GET', partial(
+            self.cache.fetch,
+            self.session,
+            url,
+            identity=self.config.get_identity()))
+
+    def send(self, method, request):
+        """
+        Make a request, retrying it if the client has a retry policy.
+
+        :param method: the HTTP method of the request.
+        :type method: str
+        :param request: makes the request and returns its response.
+        :type request: callable
+        :returns: the response.
+        """
+        if self.retry is None:
+            return request()
+        return self.retry.call(method, request)
+
+    def json_from(self, response):
+        """
+        Decode a response with the codec of the client,
+        reusing the json of a cached response.
+        """
+        cache_entry = getattr(response, 'cache_entry', None)
+        if cache_entry is not None:
+            return cache_entry.json(response, decode=self.codec.decode)
+        return self.codec.decode(response)
+
+    def get_page(self, url):
+        response = self.get(url)
+        self.expect_ok(response)
+        return self.json_from(response)
+
+    def get_object(self, url):
+        """Get the resource at a URL."""
+        return self.convert_to_object(self.get_page(url))
+
+    def find_object(self, url, build=None, raw=False):
+        """
+        Get the resource at a URL, or None when it is not found.
+
+        :param build: makes the resource from the json.
+            If not provided, uses convert_to_object.
+        :type build: callable
+        :param raw: whether to give the json instead of the resource.
+        :type raw: bool
+        """
+        response = self.get(url)
+        if 404 == response.status_code:
+            return None
+        self.expect_ok(response)
+        json_data = self.json_from(response)
+        if raw:
+            return json_data
+        return (build or self.convert_to_object)(json_data)
+
+    def get_content(self, url):
+        """The body of the response to a GET of a URL, as bytes."""
+        response = self.get(url)
+        self.expect_ok(response)
+        return response.content
+
+    @staticmethod
+    def first(items):
+        """The first item generated by a relationship."""
+        return next(items)
+
+    @staticmethod
+    def is_gone(error):
+        """Whether an HTTPError is a 404 (Not Found)."""
+        return (
+            error.response is not None and
+            404 == error.response.status_code)
+
+    def read_new(
+            self, listing, identify, known=frozenset(), since=None, save=None):
+        """
+        Generate the items of a listing, newest first,
+        until one that was already read.
+
+        :param listing: makes the relationship of the items
+            not reachable from since, or of all of them, given None.
+        :type listing: callable
+        :param identify: gives the key of an item.
+        :type identify: callable
+        :param known: the keys of the items that were already read.
+        :type known: set
+        :param since: the key of the newest item read last time.
+            When it is gone, as after a force push,
+            all the items are listed, until a known one.
+        :param save: called with the key of the newest item,
+            once all the new items have been generated.
+        :type save: callable
+        :returns: an iterator over the new items.
+        :rtype: iterator
+        """
+        newest = None
+        while True:
+            try:
+                for item in listing(since):
+                    key = identify(item)
+                    if key in known:
+                        break
+                    newest = newest or key
+                    yield item
+                break
+            except HTTPError as e:
+                if not (since and newest is None and self.is_gone(e)):
+                    raise
+                since = None
+        if save and newest is not None:
+            save(newest)
+
+    @property
+    def root(self):
+        """The Bitbucket root resource for this client, made once."""
+        root = self.__dict__.get('bitbucket_root')
+        if root is None:
+            root = self.bitbucket_root = Bitbucket(client=self)
+        return root
+
+    @staticmethod
+    def expand(template, values):
+        """Expand a uri template, which may already be compiled."""
+        from uritemplate import URITemplate, expand
+        if isinstance(template, URITemplate):
+            return template.expand(values)
+        return expand(template, values)
+
+    @staticmethod
+    def urls_from(requests):
+        """
+        The URLs for a mix of URLs
+        and (template, values) pairs of uri templates.
+        """
+        for request in requests:
+            if isinstance(request, string_types):
+                yield request
+            else:
+                template, values = request
+                yield Client.expand(template, values)
+
+    def fetch_one(self, url, raw=False, fields=None):
+        try:
+            data = self.get_page(
+                self.set_fields(url, fields) if fields else url)
+            return FetchResult(
+                url, data if raw else self.convert_to_object(data), None)
+        except Exception as e:
+            return FetchResult(url, None, e)
+
+    def fetch_many(
+            self,
+            requests,
+            max_workers=8,
+            fetch=None,
+            raw=False,
+            fields=None):
+        """
+        Get many independent resources concurrently,
+        and generate them as they arrive.
+
+        An error fetching one resource, like a 404 (Not Found),
+        is kept in its result instead of being raised,
+        so the rest of the batch goes on.
+
+        :param requests: URLs, or (template, values) pairs
+            of uri templates and the values for their variables.
+        :type requests: iterable
+        :param max_workers: the most requests to make at once.
+        :type max_workers: int
+        :param fetch: fetches a URL and returns its FetchResult.
+            If not provided, gets the resource at the URL.
+        :type fetch: callable
+        :param raw: whether the results hold the decoded json
+            instead of resources made from it.
+        :type raw: bool
+        :param fields: the fields to include or exclude
+            from each response, as for remote_relationship.
+        :type fields: str or list
+        :returns: an iterator over the results, in the order they arrive.
+        :rtype: iterator of FetchResult
+        """
+        from concurrent.futures import (
+            FIRST_COMPLETED, ThreadPoolExecutor, wait)
+        fetch = fetch or partial(self.fetch_one, raw=raw, fields=fields)
+        urls = self.urls_from(requests)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        # Only keep a few requests waiting for a worker,
+        # so that a long iterable of requests is not read up front.
+        pending = set(
+            executor.submit(fetch, url)
+            for url
+            in islice(urls, 2 * max_workers))
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for url in islice(urls, len(done)):
+                    pending.add(executor.submit(fetch, url))
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def set_query_parameter(url, name, value):
+        """Add or replace a parameter in the query of a URL."""
+        scheme, netloc, path, query, fragment = urlsplit(url)
+        params = [
+            (k, v)
+            for (k, v)
+            in parse_qsl(query, keep_blank_values=True)]
+        if name in dict(params):
+            params = [
+                (k, str(value) if k == name else v)
+                for (k, v)
+                in params]
+        else:
+            params.append((name, str(value)))
+        return urlunsplit((scheme, netloc, path, urlencode(params), fragment))
+
+    @classmethod
+    def fields_query(cls, fields):
+        """
+        The value of the fields parameter that trims a response.
+
+        Fields starting with + or - are added to or removed from
+        the fields that Bitbucket gives by default.
+        Any other field replaces the defaults with only the fields listed,
+        so the fields that pagination needs and those that recognize
+        each item as a resource are kept as well;
+        an item that is still not recognized is given as its json.
+        Among such fields, a field starting with + is listed like the others,
+        and one starting with - is taken out of those listed and kept,
+        or, when it is within one of them, sent as it is.
+
+        :param fields: the fields, as a list or separated by commas,
+            with a values. prefix for the items of a collection,
+            like 'values.full_name' or '-values.owner'.
+        :type fields: str or list
+        :returns: the fields, separated by commas.
+        :rtype: str
+        """
+        if isinstance(fields, string_types):
+            fields = fields.split(',')
+        fields = [f.strip() for f in fields if f.strip()]
+        if all(f[0] in '+-' for f in fields):
+            return ','.join(fields)
+        removed = [f[1:] for f in fields if f[0] == '-']
+        listed = [f.lstrip('+') for f in fields if f[0] != '-']
+        if any(f.startswith('values.') for f in listed):
+            kept = list(cls.paging_fields) + [
+                'values.' + f for f in cls.identifying_fields]
+        else:
+            kept = list(cls.identifying_fields)
+        listed += [f for f in kept if f not in listed]
+        return ','.join(
+            [f for f in listed if f not in removed] +
+            ['-' + f for f in removed if f not in listed])
+
+    def set_fields(self, url, fields):
+        """Add the fields parameter to a URL, to trim its response."""
+        return self.set_query_parameter(
+            url, 'fields', self.fields_query(fields))
+
+    def set_query(self, url, q=None, sort=None):
+        """Add the q and sort parameters to a URL, when given."""
+        if q is not None:
+            url = self.set_query_parameter(url, 'q', text_type(q))
+        if sort:
+            url = self.set_query_parameter(url, 'sort', sort)
+        return url
+
+    @staticmethod
+    def later_page_urls(json_data):
+        """
+        Build the URLs of all the pages after a 2.0 paginated response
+        from its page, size, and pagelen fields.
+        Not every collection reports its size,
+        in which case the pages can only be found by following next.
+        """
+        if not json_data.get('next'):
+            return []
+        try:
+            page = int(json_data['page'])
+            size = int(json_data['size'])
+            pagelen = int(json_data['pagelen'])
+        except (KeyError, TypeError, ValueError):
+            return []
+        if pagelen < 1:
+            return []
+        last_page = (size + pagelen - 1) // pagelen
+        return [
+            Client.set_query_parameter(json_data['next'], 'page', p)
+            for p
+            in range(page + 1, last_page + 1)]
+
+    @staticmethod
+    def pages_to_prefetch(json_data, max_items=None):
+        """
+        The URLs of the later pages of a 2.0 paginated response,
+        leaving out the pages beyond the last item wanted.
+        """
+        later_page_urls = Client.later_page_urls(json_data)
+        if later_page_urls and (max_items is not None):
+            remaining = max_items - len(json_data['values'])
+            pagelen = int(json_data['pagelen'])
+            later_page_urls = later_page_urls[
+                :max(0, (remaining + pagelen - 1) // pagelen)]
+        return later_page_urls
+
+    def get_stream(self, url):
+        """
+        GET a URL without reading the body of the response,
+        unless the client has a cache, which keeps all of it.
+        """
+        if self.cache is None:
+            return self.send(
+                'GET', partial(self.session.get, url, stream=True))
+        return self.get(url)
+
+    def stream_content(self, url, chunk_size=None):
+        """
+        Generate the body of the response to a GET of a URL in chunks,
+        without holding all of it in memory.
+
+        :param url: the URL to get.
+        :type url: str
+        :param chunk_size: the most bytes in a chunk.
+            If not provided, uses the stream_chunk_size of the client.
+        :type chunk_size: int
+        :returns: the chunks of the body.
+        :rtype: iterator of bytes
+        """
+        response = self.get_stream(url)
+        try:
             self.expect_ok(response)
-            json_data = response.json()
+            for chunk in response.iter_content(
+                    chunk_size or self.stream_chunk_size):
+                yield chunk
+        finally:
+            response.close()
+
+    def download(self, url, destination):
+        """
+        Write the body of the response to a GET of a URL,
+        one chunk at a time, as it arrives.
+
+        :param url: the URL to get.
+        :type url: str
+        :param destination: a path, a file object open for writing,
+            or a writable buffer, like a bytearray or a memoryview,
+            which is filled from its start.
+        :returns: the number of bytes written.
+        :rtype: int
+        :raises: ValueError when the body does not fit in the buffer.
+        """
+        return self.write_chunks(url, self.stream_content(url), destination)
+
+    @classmethod
+    def write_chunks(cls, url, chunks, destination):
+        """
+        Write the chunks of the body of the response to a GET of a URL
+        to a destination, as for download.
+        """
+        if isinstance(destination, string_types):
+            with open(destination, 'wb') as f:
+                return cls.write_chunks(url, chunks, f)
+        size = 0
+        if hasattr(destination, 'write'):
+            for chunk in chunks:
+                destination.write(chunk)
+                size += len(chunk)
+            return size
+        buffer = memoryview(destination)
+        for chunk in chunks:
+            if size + len(chunk) > len(buffer):
+                raise ValueError(
+                    'The body of {0} does not fit in {1} bytes.'.format(
+                        url, len(buffer)))
+            buffer[size:size + len(chunk)] = chunk
+            size += len(chunk)
+        return size
+
+    def download_one(self, url, destination):
+        try:
+            if callable(destination):
+                destination = destination()
+            self.download(url, destination)
+            return FetchResult(url, destination, None)
+        except Exception as e:
+            return FetchResult(url, None, e)
+
+    def download_many(self, downloads, max_workers=8):
+        """
+        Write the bodies of the responses to GETs of many URLs
+        concurrently, and generate the results as they are written.
+
+        An error writing one body is kept in its result
+        instead of being raised, so the rest go on.
+
+        :param downloads: (url, destination) pairs,
+            where each destination is as for download,
+            or a callable that gives it just before it is written.
+        :type downloads: iterable
+        :param max_workers: the most bodies to write at once.
+        :type max_workers: int
+        :returns: the results, with the destination of each body.
+        :rtype: iterator of FetchResult
+        """
+        destinations = dict(downloads)
+        return self.fetch_many(
+            list(destinations),
+            max_workers=max_workers,
+            fetch=lambda url: self.download_one(url, destinations[url]))
+
+    def spool(self, url):
+        """
+        Write the body of the response to a GET of a URL
+        to a temporary file, and map that file into memory,
+        so that the operating system pages it in as it is read.
+
+        :param url: the URL to get.
+        :type url: str
+        :returns: a read-only memory map of the body,
+            or empty bytes for an empty body, which cannot be mapped.
+        :rtype: mmap.mmap
+        """
+        from mmap import ACCESS_READ, mmap
+        from tempfile import TemporaryFile
+        with TemporaryFile() as f:
+            if not self.download(url, f):
+                return b''
+            f.flush()
+            return mmap(f.fileno(), 0, access=ACCESS_READ)
+
+    def stream_pages(self, url):
+        """
+        Generate the json items found at a URL,
+        following the pagination of 2.0 collections,
+        and decoding each item as soon as it has arrived.
+        Only one page is requested at a time.
+        """
+        from pybitbucket.streaming import ValuesParser
+        while url:
+            parser = ValuesParser()
+            for chunk in self.stream_content(url):
+                for item in parser.feed(chunk):
+                    yield item
+            for item in parser.feed(b'', final=True):
+                yield item
+            json_data = parser.close()
+            if isinstance(json_data, list):
+                for item in json_data:
+                    yield item
+                url = None
+            elif 'values' in json_data:
+                url = json_data.get('next')
+            else:
+                yield json_data
+                url = None
+
+    def prefetched_pages(self, json_data, prefetch=0, max_items=None):
+        """
+        Generate the json of a 2.0 paginated response
+        and then of the later pages that hold the items wanted,
+        which are fetched up to prefetch at a time
+        while the caller works on the pages before them.
+        """
+        later_page_urls = (
+            self.pages_to_prefetch(json_data, max_items)
+            if prefetch else [])
+        if not later_page_urls:
+            yield json_data
+            return
+        pages = PagePrefetcher(self, later_page_urls, prefetch)
+        try:
+            yield json_data
+            for json_data in pages:
+                yield json_data
+        finally:
+            pages.close()
+
+    def paginate(self, url, prefetch=0, max_items=None, stream=False):
+        """
+        Generate the json items found at a URL,
+        following the pagination of 2.0 collections.
+        """
+        if stream:
+            for item in self.stream_pages(url):
+                yield item
+            return
+        while url:
+            json_data = self.get_page(url)
             if isinstance(json_data, list):
                 for item in json_data:
-                    yield self.convert_to_object(item)
+                    yield item
                 url = None
-            elif json_data.get('values'):
-                for item in json_data['values']:
-                    yield self.convert_to_object(item)
+            elif 'values' in json_data:
+                for json_data in self.prefetched_pages(
+                        json_data, prefetch, max_items):
+                    for item in json_data.get('values', []):
+                        yield item
+                # If the collection grew while it was being fetched,
+                # the last page links to the rest of it.
                 url = json_data.get('next')
             else:
-                yield self.convert_to_object(json_data)
+                yield json_data
                 url = None
 
+    def remote_relationship(
+            self,
+            template,
+            prefetch=None,
+            pagelen=None,
+            max_items=None,
+            stream=None,
+            raw=False,
+            fields=None,
+            q=None,
+            sort=None,
+            **keywords):
+        """
+        Navigate a relationship and generate the resources found there,
+        following the pagination of 2.0 collections.
+
+        :param template: the uri template for the relationship.
+        :type template: str
+        :param prefetch: the number of pages to fetch concurrently
+            ahead of the page being consumed.
+            If not provided, uses the prefetch setting of the client.
+            Prefetching only applies to collections that report
+            their page, size, and pagelen.
+        :type prefetch: int
+        :param pagelen: the number of items to ask for on each page.
+            If not provided, uses the pagelen setting of the client,
+            or else the default of the server.
+        :type pagelen: int
+        :param max_items: the most items to generate.
+            No page is fetched after enough items have been found.
+            If not provided, generates every item.
+        :type max_items: int
+        :param stream: whether to decode each item of a page
+            as soon as it has arrived,
+            instead of waiting for the whole page and decoding it at once.
+            Then only about one item of a page is held in memory,
+            and pages are not prefetched.
+            If not provided, uses the stream setting of the client.
+        :type stream: bool
+        :param raw: whether to generate the decoded json of each item
+            instead of a resource made from it.
+            Skipping the resources is much faster
+            when only a few of their attributes are read.
+        :type raw: bool
+        :param fields: the fields to include or exclude from the response,
+            which Bitbucket leaves out of its body,
+            as a list or separated by commas,
+            like 'values.full_name,values.updated_on' or '-values.links'.
+            Resources made from them only have the fields given,
+            as attributes and relationships.
+            See fields_query for the fields that are always kept.
+        :type fields: str or list
+        :param q: the filter that the items must match,
+            which Bitbucket applies before paginating,
+            so that only the items that match are sent.
+        :type q: query.Filter or str
+        :param sort: the field to order the items by,
+            with a - prefix for descending order.
+        :type sort: str
+        :param keywords: values for the variables in the template.
+        :returns: an iterator over the resources.
+        :rtype: iterator
+
+        With a retry policy, each page is retried on its own,
+        so a failure in the middle of a collection does not start it over.
+        If a page still fails, the url of the error is where to resume.
+        """
+        prefetch = self.prefetch if prefetch is None else prefetch
+        pagelen = self.pagelen if pagelen is None else pagelen
+        stream = self.stream if stream is None else stream
+        url = self.expand(template, keywords)
+        if pagelen:
+            url = self.set_query_parameter(url, 'pagelen', pagelen)
+        if fields:
+            # The next links of the pages carry the fields along.
+            url = self.set_fields(url, fields)
+        url = self.set_query(url, q, sort)
+        items = self.paginate(
+            url,
+            prefetch=prefetch,
+            max_items=max_items,
+            stream=stream)
+        if max_items is not None:
+            # islice stops without asking paginate for another page.
+            items = islice(items, max_items)
+        if raw:
+            for item in items:
+                yield item
+            return
+        for item in items:
+            yield self.convert_to_object(item)
+
+    def delete(self, url):
+        response = self.send('DELETE', partial(self.session.delete, url))
+        # Deletes the resource and returns 204 (No Content).
+        self.expect_ok(response, 204)
+
+    def json_options(self, json, kwargs):
+        """
+        Encode the json of a request with the codec of the client,
+        instead of letting requests encode it.
+        When files are sent, the json is sent as form fields
+        of a multipart upload instead.
+        """
+        if kwargs.get('files'):
+            return self.multipart_options(json, kwargs)
+        if json is None:
+            return kwargs
+        options = dict(kwargs)
+        options.update(self.codec.request_options(
+            json,
+            headers=kwargs.get('headers')))
+        return options
+
+    @staticmethod
+    def multipart_options(fields, kwargs):
+        """
+        Send the files of a request as a multipart upload,
+        which streams each file from disk as it is sent,
+        and reports its progress to the progress option, if any.
+        """
+        from pybitbucket.multipart import MultipartUpload
+        options = dict(kwargs)
+        upload = MultipartUpload(
+            fields=fields,
+            files=options.pop('files'),
+            progress=options.pop('progress', None))
+        headers = dict(options.get('headers') or {})
+        headers['Content-Type'] = upload.content_type
+        options.update(data=upload, headers=headers)
+        return options
+
+    @staticmethod
+    def rewinding(request, options):
+        """
+        Start a multipart upload over before each attempt to send it,
+        so that a request retried after a partial send sends all of it.
+        """
+        from pybitbucket.multipart import MultipartUpload
+        upload = options.get('data')
+        if not isinstance(upload, MultipartUpload):
+            return request
+
+        def attempt():
+            upload.rewind()
+            return request()
+        return attempt
+
+    @staticmethod
+    def close_upload(options):
+        """Close the files of a multipart upload that are still open."""
+        from pybitbucket.multipart import MultipartUpload
+        upload = options.get('data')
+        if isinstance(upload, MultipartUpload):
+            upload.close()
+
+    def put(self, url, json=None, **kwargs):
+        options = self.json_options(json, kwargs)
+        try:
+            response = self.send('PUT', self.rewinding(partial(
+                self.session.put, url, **options), options))
+        finally:
+            self.close_upload(options)
+        self.expect_ok(response)
+        return self.convert_to_object(self.json_from(response))
+
+    def post(self, url, json=None, data=None, **kwargs):
+        if data:
+            options = dict(kwargs, data=data)
+        else:
+            options = self.json_options(json, kwargs)
+        try:
+            response = self.send('POST', self.rewinding(partial(
+                self.session.post, url, **options), options))
+        finally:
+            self.close_upload(options)
+        self.expect_ok(response)
+        return self.convert_to_object(self.json_from(response))
+
+    def post_approval(self, url):
+        response = self.send('POST', partial(self.session.post, url))
+        self.expect_ok(response)
+        json_data = self.json_from(response)
+        return json_data.get('approved')
+
+    def delete_approval(self, url):
+        response = self.send('DELETE', partial(self.session.delete, url))
+        # Deletes the approval and returns 204 (No Content).
+        self.expect_ok(response, 204)
+        return True
+
     def get_bitbucket_url(self):
         return self.config.server_base_uri
 
     def get_username(self):
         return self.config.get_username()
 
-    def __init__(self, config=None):
-        self.config = config or Anonymous()
+    def get_remaining_requests(self):
+        """
+        The number of requests that the rate limiter allows right now,
+        or None if the client has no rate limiter.
+        """
+        if self.rate_limiter is None:
+            return None
+        return self.rate_limiter.remaining(self.config.get_principal())
+
+    def __init__(
+            self,
+            config=None,
+            prefetch=0,
+            pagelen=None,
+            cache=None,
+            retry=None,
+            rate_limiter=None,
+            codec=None,
+            stream=False):
+        if config is None:
+            from pybitbucket.auth import Anonymous
+            config = Anonymous()
+        self.config = config
         self.session = self.config.session
+        self.prefetch = prefetch
+        self.pagelen = pagelen
+        self.cache = cache
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.codec = codec or JSONCodec()
+        self.stream = stream
+        if rate_limiter is not None:
+            # Every request made with the session takes a token,
+            # including those made by the authenticator.
+            rate_limiter.mount(self.session, self.config.get_principal)
 
 
 class BitbucketSpecialAction(Enum):
@@ -111,6 +1020,8 @@ class RepositoryType(Enum):
 
 class BitbucketBase(object):
     id_attribute = 'id'
+    # The parsed links_json of 1.0 API resources.
+    compiled_link_templates = {}
 
     @staticmethod
     def expect_bool(name, value):
@@ -140,16 +1051,22 @@ class BitbucketBase(object):
                         yield (name, url)
 
     @staticmethod
-    def _has_v2_self_url(data, resource_type, id_attribute):
+    def self_url_path(data):
         if (
                 (data.get('links') is None) or
                 (data['links'].get('self') is None) or
-                (data['links']['self'].get('href') is None) or
-                (data.get(id_attribute) is None)):
+                (data['links']['self'].get('href') is None)):
+            return None
+        return data['links']['self']['href'].split('/')
+
+    @staticmethod
+    def _has_v2_self_url(data, resource_type, id_attribute, url_path=None):
+        if url_path is None:
+            url_path = BitbucketBase.self_url_path(data)
+        if (url_path is None) or (data.get(id_attribute) is None):
             return False
         # Since the structure is right, assume it is v2.
         is_v2 = True
-        url_path = data['links']['self']['href'].split('/')
         # Start looking from the end of the path.
         position = -1
         # Since repos have a slash in the full_name,
@@ -164,8 +1081,9 @@ class BitbucketBase(object):
         return is_v2
 
     @classmethod
-    def has_v2_self_url(cls, data):
-        return cls._has_v2_self_url(data, cls.resource_type, cls.id_attribute)
+    def has_v2_self_url(cls, data, url_path=None):
+        return cls._has_v2_self_url(
+            data, cls.resource_type, cls.id_attribute, url_path)
 
     def add_remote_relationship_methods(self, data):
         for name, url in BitbucketBase.links_from(data):
@@ -174,32 +1092,101 @@ class BitbucketBase(object):
                     self.client.remote_relationship,
                     template=url))
 
+    @staticmethod
+    def is_commit_author(body):
+        # For Commits, author has a raw part and a full User resource.
+        # For PullRequests, author is just a User resource.
+        return bool(
+            isinstance(body, dict) and
+            body.get('raw') and
+            body.get('user'))
+
     def add_inline_resources(self, data):
+        """
+        Set aside the attributes that may hold embedded resources.
+        They are built the first time they are used,
+        since most of them never are.
+        """
         for name, body in data.items():
-            # author is not treated the same on all resources
-            if name == 'author':
-                # For Commits, author has a raw part and
-                # a full User resource.
-                if (body.get('raw') and body.get('user')):
-                    setattr(self, 'raw_author', body['raw'])
-                    setattr(self, 'author', self.client.convert_to_object(
-                        body['user']))
-                # For PullRequests, author is just a User resource.
-                else:
-                    setattr(self, name, self.client.convert_to_object(body))
             # If an attribute has a dictionary for a body,
-            # then descend to check for embedded resources.
-            elif isinstance(body, dict):
-                setattr(self, name, self.client.convert_to_object(body))
-            # If an attribute has a list for a body,
-            # then descend into the array to check for embedded resources.
-            elif isinstance(body, list):
-                if (body and isinstance(body[0], dict)):
-                    setattr(self, name, [
-                        self.client.convert_to_object(i)
-                        for i in body])
-                else:
-                    setattr(self, name, body)
+            # or a list of them,
+            # then it may have embedded resources.
+            if isinstance(body, dict) or (
+                    isinstance(body, list) and
+                    body and
+                    isinstance(body[0], dict)):
+                self.defer(name, BitbucketBase.inline_resource)
+            if (name == 'author') and self.is_commit_author(body):
+                self.defer('raw_author', BitbucketBase.inline_resource)
+
+    def defer(self, name, build):
+        """
+        Build an attribute the first time it is used.
+
+        :param name: the name of the attribute.
+        :type name: str
+        :param build: builds the value of the attribute,
+            given this resource and the name.
+        :type build: callable
+        """
+        self.__dict__.pop(name, None)
+        self.__dict__.setdefault('pending_resources', {})[name] = build
+
+    def inline_resource(self, name):
+        """Build the embedded resources of an attribute."""
+        if name in ('author', 'raw_author'):
+            body = self.data['author']
+            if self.is_commit_author(body):
+                if name == 'raw_author':
+                    return body['raw']
+                return self.client.convert_to_object(body['user'])
+        body = self.data[name]
+        if isinstance(body, list):
+            return [self.client.convert_to_object(i) for i in body]
+        return self.client.convert_to_object(body)
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set,
+        # which includes the deferred ones not yet built.
+        pending = self.__dict__.get('pending_resources', {})
+        build = pending.get(name)
+        if build is None:
+            # Another thread may have just built it.
+            if name in self.__dict__:
+                return self.__dict__[name]
+            raise AttributeError(
+                "'{0}' object has no attribute '{1}'".format(
+                    type(self).__name__,
+                    name))
+        # The builder stays pending until it has succeeded,
+        # and when threads build the same attribute, the first is kept.
+        value = self.__dict__.setdefault(name, build(self, name))
+        pending.pop(name, None)
+        return value
+
+    def __dir__(self):
+        return sorted(
+            set(dir(type(self))) |
+            set(self.__dict__) |
+            set(self.__dict__.get('pending_resources', {})))
+
+    @classmethod
+    def link_templates(cls):
+        """
+        A helper method for 1.0 API resources that gets the uri templates
+        found in links, by name.
+        The links_json of a class is only parsed once,
+        into compiled templates.
+        """
+        templates = BitbucketBase.compiled_link_templates.get(cls.links_json)
+        if templates is None:
+            from uritemplate import URITemplate
+            templates = {
+                name: URITemplate(url)
+                for (name, url)
+                in cls.links_from(loads(cls.links_json))}
+            BitbucketBase.compiled_link_templates[cls.links_json] = templates
+        return templates
 
     @classmethod
     def extract_templates_from_json(cls):
@@ -208,11 +1195,10 @@ class BitbucketBase(object):
         found in links into a template that would be found
         on a 2.0 API resource.
         """
-        links = loads(cls.links_json)
         return {
-            name: url
-            for (name, url)
-            in cls.links_from(links)}
+            name: template.uri
+            for (name, template)
+            in cls.link_templates().items()}
 
     @classmethod
     def expand_link_urls(cls, **kwargs):
@@ -221,11 +1207,18 @@ class BitbucketBase(object):
         found in links into a fully navigable URL as would be found
         with a HAL-JSON resource.
         """
-        links = loads(cls.links_json)
         return {'_links': {
-            name: {'href': expand(template, kwargs)}
+            name: {'href': template.expand(kwargs)}
             for (name, template)
-            in cls.links_from(links)}}
+            in cls.link_templates().items()}}
+
+    @classmethod
+    def expand_link_url(cls, name, **kwargs):
+        """
+        A helper method for 1.0 API resources that expands the uri template
+        for a specific link.
+        """
+        return cls.link_templates()[name].expand(kwargs)
 
     @classmethod
     def get_link_template(cls, name):
@@ -233,11 +1226,10 @@ class BitbucketBase(object):
         A helper method for 1.0 API resources that gets the raw uri template
         for a specific link.
         """
-        links = loads(cls.links_json)
-        templates = [v for k, v in cls.links_from(links) if k == name]
-        return templates[0]
+        return cls.link_templates()[name].uri
 
-    def __init__(self, data, client=Client()):
+    def __init__(self, data, client=None):
+        client = client or Client()
         self.data = data
         self.client = client
         self.__dict__.update(data)
@@ -245,38 +1237,21 @@ class BitbucketBase(object):
         self.add_inline_resources(data)
 
     def delete(self):
-        url = self.links['self']['href']
-        response = self.client.session.delete(url)
-        # Deletes the resource and returns 204 (No Content).
-        Client.expect_ok(response, 204)
-        return
+        return self.client.delete(self.links['self']['href'])
 
     def put(self, json=None, **kwargs):
-        url = self.links['self']['href']
-        response = self.client.session.put(url, json=json, **kwargs)
-        Client.expect_ok(response)
-        return self.client.convert_to_object(response.json())
+        return self.client.put(self.links['self']['href'], json=json, **kwargs)
 
     @staticmethod
-    def post(url, json=None, data=None, client=Client(), **kwargs):
-        if data:
-            response = client.session.post(url, data=data, **kwargs)
-        else:
-            response = client.session.post(url, json=json, **kwargs)
-        Client.expect_ok(response)
-        return client.convert_to_object(response.json())
+    def post(url, json=None, data=None, client=None, **kwargs):
+        client = client or Client()
+        return client.post(url, json=json, data=data, **kwargs)
 
     def post_approval(self, template):
-        response = self.client.session.post(template)
-        Client.expect_ok(response)
-        json_data = response.json()
-        return json_data.get('approved')
+        return self.client.post_approval(template)
 
     def delete_approval(self, template):
-        response = self.client.session.delete(template)
-        # Deletes the approval and returns 204 (No Content).
-        Client.expect_ok(response, 204)
-        return True
+        return self.client.delete_approval(template)
 
     def attributes(self):
         return list(self.data.keys())
@@ -299,7 +1274,9 @@ class BitbucketBase(object):
 
 
 class PayloadBuilder(object):
-    schema = Schema({})
+    # The voluptuous Schema that the payload must match.
+    # If not set, it must be empty.
+    schema = None
 
     def __init__(self, payload=None):
         self._payload = payload or {}
@@ -314,15 +1291,57 @@ class PayloadBuilder(object):
         return payload
 
     def validate(self):
-        self.schema(self._payload)
+        schema = self.schema
+        if schema is None:
+            from voluptuous import Schema
+            schema = Schema({})
+        schema(self._payload)
         return self
 
 
 class Bitbucket(BitbucketBase):
-    def __init__(self, client=Client()):
-        self.data = loads(entrypoints_json)
+    """
+    The root resource, whose relationships are the entrypoints
+    to the Bitbucket API.
+
+    The entrypoints are parsed once, into compiled templates
+    shared by every root, and each relationship method is only
+    made when it is first used.
+    A Client keeps one root, as Client.root.
+    """
+    parsed_entrypoints = None
+
+    @classmethod
+    def entrypoints(cls):
+        """The data of the entrypoints, and their templates by name."""
+        if cls.parsed_entrypoints is None:
+            from uritemplate import URITemplate
+            data = loads(entrypoints_json)
+            cls.parsed_entrypoints = (data, {
+                name: URITemplate(url)
+                for (name, url)
+                in cls.links_from(data)})
+        return cls.parsed_entrypoints
+
+    def __init__(self, client=None):
+        client = client or Client()
+        self.data, self.templates = self.entrypoints()
         self.client = client
-        self.add_remote_relationship_methods(self.data)
+
+    def __getattr__(self, name):
+        template = self.__dict__.get('templates', {}).get(name)
+        if template is None:
+            return super(Bitbucket, self).__getattr__(name)
+        relationship = partial(
+            self.client.remote_relationship,
+            template=template)
+        setattr(self, name, relationship)
+        return relationship
+
+    def __dir__(self):
+        return sorted(
+            set(super(Bitbucket, self).__dir__()) |
+            set(self.__dict__.get('templates', {})))
 
 
 class BitbucketError(HTTPError):
@@ -369,15 +1388,34 @@ class ServerError(BitbucketError):
     def __init__(self, response):
         super(ServerError, self).__init__(response)
 
-from pybitbucket.repository import Repository
-from pybitbucket.branchrestriction import BranchRestriction
-from pybitbucket.build import BuildStatus
-from pybitbucket.comment import Comment
-from pybitbucket.commit import Commit
-from pybitbucket.consumer import Consumer
-from pybitbucket.hook import Hook
-from pybitbucket.pullrequest import PullRequest
-from pybitbucket.ref import Ref
-from pybitbucket.snippet import Snippet
-from pybitbucket.team import Team
-from pybitbucket.user import User
+
+# The resource classes that were imported at the end of this module
+# before their modules were loaded on demand, by the module of each.
+reexported_resources = {
+    'Repository': 'pybitbucket.repository',
+    'BranchRestriction': 'pybitbucket.branchrestriction',
+    'BuildStatus': 'pybitbucket.build',
+    'Comment': 'pybitbucket.comment',
+    'Commit': 'pybitbucket.commit',
+    'Consumer': 'pybitbucket.consumer',
+    'Hook': 'pybitbucket.hook',
+    'PullRequest': 'pybitbucket.pullrequest',
+    'Ref': 'pybitbucket.ref',
+    'Snippet': 'pybitbucket.snippet',
+    'Team': 'pybitbucket.team',
+    'User': 'pybitbucket.user',
+}
+
+
+def __getattr__(name):
+    """
+    Import a resource class that older code imports from this module
+    from its own module, the first time it is asked for.
+    Only Python 3.7 and later look up module attributes this way,
+    so older Pythons need the class imported from its own module.
+    """
+    module = reexported_resources.get(name)
+    if module is None:
+        raise AttributeError(
+            'module {0!r} has no attribute {1!r}'.format(__name__, name))
+    return getattr(import_module(module), name)
@@ -16,7 +16,7 @@ from uritemplate import expand
 from voluptuous import Schema, Required, Optional, In, Invalid
 
 from pybitbucket.bitbucket import (
-    Bitbucket, BitbucketBase, Client, PayloadBuilder, Enum)
+    BitbucketBase, Client, PayloadBuilder, Enum)
 
 
 class BranchRestrictionKind(Enum):
@@ -196,23 +196,33 @@ class BranchRestriction(BitbucketBase):
     def find_branchrestrictions_for_repository(
             repository_name,
             owner=None,
-            client=None):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding branch-restrictions for a repository.
         The method is a generator BranchRestriction objects.
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return Bitbucket(client=client).repositoryBranchRestrictions(
+        return client.root.repositoryBranchRestrictions(
             owner=owner,
-            repository_name=repository_name)
+            repository_name=repository_name,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields)
 
     @staticmethod
     def find_branchrestriction_for_repository_by_id(
             repository_name,
             restriction_id,
             owner=None,
-            client=None):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific branch-restriction.
         In contrast to the pure hypermedia driven method on the Bitbucket
@@ -221,12 +231,13 @@ class BranchRestriction(BitbucketBase):
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return next(
-            Bitbucket(
-                client=client).repositoryBranchRestrictionByRestrictionId(
-                    owner=owner,
-                    repository_name=repository_name,
-                    restriction_id=restriction_id))
+        return client.first(
+            client.root.repositoryBranchRestrictionByRestrictionId(
+                owner=owner,
+                repository_name=repository_name,
+                restriction_id=restriction_id,
+                raw=raw,
+                fields=fields))
 
 
 Client.bitbucket_types.add(BranchRestriction)
@@ -16,7 +16,7 @@ from uritemplate import expand
 from voluptuous import Schema, Required, Optional, In, Url
 
 from pybitbucket.bitbucket import (
-    Bitbucket, BitbucketBase, Client, PayloadBuilder, Enum)
+    BitbucketBase, Client, PayloadBuilder, Enum)
 
 
 class BuildStatusStates(Enum):
@@ -204,7 +204,9 @@ class BuildStatus(BitbucketBase):
             revision,
             key,
             owner=None,
-            client=None):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific build status.
         In contrast to the pure hypermedia driven method on the Bitbucket
@@ -213,19 +215,25 @@ class BuildStatus(BitbucketBase):
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return next(
-            Bitbucket(client=client).repositoryCommitBuildStatusByKey(
+        return client.first(
+            client.root.repositoryCommitBuildStatusByKey(
                 owner=owner,
                 repository_name=repository_name,
                 revision=revision,
-                key=key))
+                key=key,
+                raw=raw,
+                fields=fields))
 
     @staticmethod
     def find_buildstatuses_for_repository_commit(
             repository_name,
             revision,
             owner=None,
-            client=None):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding build statuses
         for a repository's commit.
@@ -233,10 +241,14 @@ class BuildStatus(BitbucketBase):
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return Bitbucket(client=client).repositoryCommitBuildStatuses(
+        return client.root.repositoryCommitBuildStatuses(
             owner=owner,
             repository_name=repository_name,
-            revision=revision)
+            revision=revision,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields)
 
 
 Client.bitbucket_types.add(BuildStatus)
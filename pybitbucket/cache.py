@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for caching responses from the Bitbucket API.
+
+A cached response is revalidated with a conditional request.
+When Bitbucket answers 304 (Not Modified),
+the cached body is reused, along with a copy of its decoded json.
+
+Responses can also be kept fresh for a time to live (TTL),
+set per endpoint with a uri template,
+during which they are reused without any request.
+
+Functions:
+- copy_json: a copy of decoded json that shares none of its containers
+
+Classes:
+- CacheEntry: a cached response with its validators
+- ResponseCache: an in-memory store of cache entries with counters
+- SQLiteResponseCache: a store of cache entries in a SQLite database,
+    which can be shared by many processes
+"""
+
+import marshal
+import re
+import sqlite3
+from collections import OrderedDict
+from copy import deepcopy
+from hashlib import sha256
+from json import dumps, loads
+from threading import Lock
+from time import time
+
+from requests import Response, codes
+from requests.structures import CaseInsensitiveDict
+
+from pybitbucket.sqlite import Database
+
+
+def template_pattern(template):
+    """
+    Compile a uri template into a regular expression
+    that matches the URLs it expands to, ignoring their query.
+    """
+    pattern = ''
+    position = 0
+    for match in re.finditer(r'{([+/?&#]?)([^}]*)}', template):
+        pattern += re.escape(template[position:match.start()])
+        position = match.end()
+        operator, variables = match.groups()
+        if operator == '+':
+            pattern += '.*?'
+        elif operator == '/':
+            pattern += '(?:/[^/?#]*){{0,{0}}}'.format(
+                len(variables.split(',')))
+        elif operator == '':
+            pattern += '[^/?#]*'
+        # Query and fragment expressions are not part of the path.
+    pattern += re.escape(template[position:])
+    return re.compile(pattern + '$')
+
+
+def copy_json(value):
+    """
+    A copy of decoded json that shares none of its dicts and lists,
+    made by marshal, which is about as fast as decoding it again,
+    or by deepcopy for values that marshal cannot write.
+    """
+    try:
+        return marshal.loads(marshal.dumps(value))
+    except ValueError:
+        return deepcopy(value)
+
+
+class CacheEntry(object):
+    """A cached response with its ETag and Last-Modified validators."""
+
+    def __init__(
+            self,
+            url,
+            content,
+            encoding=None,
+            headers=None,
+            etag=None,
+            last_modified=None,
+            stored_at=None):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.headers = headers or {}
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time() if stored_at is None else stored_at
+        self.decoded = None
+
+    @classmethod
+    def from_response(cls, response, ttl=0):
+        """
+        Make an entry from a response,
+        if it can be revalidated or kept fresh for a while.
+        """
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if (response.status_code != codes.ok) or not (
+                etag or last_modified or ttl):
+            return None
+        return cls(
+            response.url,
+            response.content,
+            encoding=response.encoding,
+            headers=dict(response.headers),
+            etag=etag,
+            last_modified=last_modified)
+
+    def is_fresh(self, ttl):
+        return time() < self.stored_at + ttl
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        """Rebuild a 200 (OK) response from the cached body."""
+        response = Response()
+        response.status_code = codes.ok
+        response.url = self.url
+        response.encoding = self.encoding
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response._content_consumed = True
+        response.cache_entry = self
+        return response
+
+    def json(self, response=None, decode=None):
+        """
+        The decoded json of the body, which is decoded only once,
+        with decode if given.
+        Each call gives its own copy, so that a caller changing it
+        does not change what later hits give.
+        """
+        if self.decoded is None:
+            if response is None:
+                response = self.to_response()
+            if decode is None:
+                decoded = response.json()
+            else:
+                decoded = decode(response)
+            # Keep a pristine copy, and give away the one decoded.
+            self.decoded = copy_json(decoded)
+            return decoded
+        return copy_json(self.decoded)
+
+
+class ResponseCache(object):
+    """
+    An in-memory store of responses, keyed by URL and auth identity.
+    The least recently used entries are evicted
+    once there are more than max_entries.
+
+    The ttls map uri templates to the number of seconds
+    that a response from a matching URL is reused without revalidation.
+
+    The counters track how the cache has been used:
+    - hits: responses reused from the cache
+    - misses: requests that downloaded a full body
+    - revalidations: conditional requests sent for cached entries
+    """
+
+    def __init__(self, max_entries=1024, ttls=None):
+        self.max_entries = max_entries
+        self.ttls = [
+            (template_pattern(template), ttl)
+            for (template, ttl)
+            in (ttls or {}).items()]
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @staticmethod
+    def key(url, identity=''):
+        """
+        The key for a URL as seen by an auth identity.
+        The identity is hashed so credentials are never stored.
+        """
+        if not identity:
+            return url
+        digest = sha256(identity.encode('utf-8')).hexdigest()[:32]
+        return '{0} {1}'.format(digest, url)
+
+    def ttl_for(self, url):
+        path = url.split('?', 1)[0].split('#', 1)[0]
+        for pattern, ttl in self.ttls:
+            if pattern.match(path):
+                return ttl
+        return 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.entries[key] = entry
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def renew(self, key, entry):
+        """Start a new time to live for an entry that was revalidated."""
+        entry.stored_at = time()
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, hits=0, misses=0, revalidations=0):
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            self.revalidations += revalidations
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidations': self.revalidations,
+        }
+
+    def fetch(self, session, url, identity=''):
+        """
+        GET a URL with the session,
+        reusing or revalidating the cached response if there is one.
+        """
+        key = self.key(url, identity)
+        ttl = self.ttl_for(url)
+        entry = self.get(key)
+        if entry is None:
+            response = session.get(url)
+        elif ttl and entry.is_fresh(ttl):
+            self.count(hits=1)
+            return entry.to_response()
+        elif entry.etag or entry.last_modified:
+            self.count(revalidations=1)
+            response = session.get(url, headers=entry.conditional_headers())
+            if response.status_code == codes.not_modified:
+                self.count(hits=1)
+                self.renew(key, entry)
+                return entry.to_response()
+        else:
+            response = session.get(url)
+        self.count(misses=1)
+        new_entry = CacheEntry.from_response(response, ttl)
+        if new_entry is not None:
+            response.cache_entry = new_entry
+            self.set(key, new_entry)
+        elif response.status_code in (codes.ok, codes.not_found, codes.gone):
+            # The cached response is out of date and cannot be replaced.
+            self.delete(key)
+        return response
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    A store of responses in a SQLite database in WAL mode,
+    so that many processes on a host can share it.
+    The least recently used entries are evicted once there are
+    more than max_entries, or their bodies add up to more than max_bytes.
+
+    So that reading an entry seldom needs to write, when it was last used
+    is only recorded once touch_interval seconds have passed since then;
+    the least recently used are told apart to within that interval.
+
+    The number of entries and the size of their bodies are kept up to date
+    by triggers, so that checking whether to evict is a one-row read.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            content BLOB NOT NULL,
+            encoding TEXT,
+            headers TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            stored_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_by_access
+            ON responses (accessed_at);
+        CREATE TABLE IF NOT EXISTS response_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            entries INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS response_inserted
+            AFTER INSERT ON responses
+        BEGIN
+            UPDATE response_totals
+                SET entries = entries + 1, size = size + NEW.size;
+        END;
+        CREATE TRIGGER IF NOT EXISTS response_deleted
+            AFTER DELETE ON responses
+        BEGIN
+            UPDATE response_totals
+                SET entries = entries - 1, size = size - OLD.size;
+        END;
+        INSERT OR IGNORE INTO response_totals (id, entries, size)
+            SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM responses
+            WHERE NOT EXISTS (SELECT 1 FROM response_totals);
+    """
+
+    def __init__(
+            self,
+            path,
+            max_entries=100000,
+            max_bytes=None,
+            ttls=None,
+            timeout=30,
+            touch_interval=60):
+        super(SQLiteResponseCache, self).__init__(
+            max_entries=max_entries,
+            ttls=ttls)
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.database = Database(path, schema=self.schema, timeout=timeout)
+
+    @property
+    def path(self):
+        return self.database.path
+
+    def close(self):
+        self.database.close()
+
+    def get(self, key):
+        row = self.database.execute(
+            'SELECT url, content, encoding, headers, etag, last_modified,'
+            ' stored_at, accessed_at FROM responses WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return None
+        (url, content, encoding, headers, etag, last_modified, stored_at,
+         accessed_at) = row
+        now = time()
+        if now - accessed_at >= self.touch_interval:
+            self.database.execute(
+                'UPDATE responses SET accessed_at = ? WHERE key = ?',
+                (now, key))
+        return CacheEntry(
+            url,
+            bytes(content),
+            encoding=encoding,
+            headers=loads(headers),
+            etag=etag,
+            last_modified=last_modified,
+            stored_at=stored_at)
+
+    def set(self, key, entry):
+        with self.database.transaction() as connection:
+            # Replacing a row would not fire the delete trigger.
+            connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+            connection.execute(
+                'INSERT INTO responses'
+                ' (key, url, content, encoding, headers, etag, last_modified,'
+                ' stored_at, accessed_at, size)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    key,
+                    entry.url,
+                    sqlite3.Binary(entry.content),
+                    entry.encoding,
+                    dumps(entry.headers),
+                    entry.etag,
+                    entry.last_modified,
+                    entry.stored_at,
+                    time(),
+                    len(entry.content)))
+            self.evict(connection)
+
+    def evict(self, connection):
+        entries, size = connection.execute(
+            'SELECT entries, size FROM response_totals').fetchone()
+        excess_entries = entries - self.max_entries
+        excess_size = (
+            0 if self.max_bytes is None else size - self.max_bytes)
+        if excess_entries <= 0 and excess_size <= 0:
+            return
+        # Walk the least recently used entries, in the order of the index,
+        # only as far as the ones to evict.
+        evicted = 0
+        for (entry_size,) in connection.execute(
+                'SELECT size FROM responses ORDER BY accessed_at'):
+            if evicted >= excess_entries and excess_size <= 0:
+                break
+            evicted += 1
+            excess_size -= entry_size
+        connection.execute(
+            'DELETE FROM responses WHERE key IN ('
+            ' SELECT key FROM responses'
+            ' ORDER BY accessed_at LIMIT ?)',
+            (evicted,))
+
+    def renew(self, key, entry):
+        entry.stored_at = time()
+        self.database.execute(
+            'UPDATE responses SET stored_at = ? WHERE key = ?',
+            (entry.stored_at, key))
+
+    def delete(self, key):
+        self.database.execute('DELETE FROM responses WHERE key = ?', (key,))
+
+    def clear(self):
+        self.database.execute('DELETE FROM responses')
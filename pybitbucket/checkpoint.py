@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for remembering how far the commits of each branch have been read,
+so that the next sync only reads the commits pushed since.
+
+Classes:
+- CommitCheckpoints: the newest commit read on each branch, in memory
+- SQLiteCommitCheckpoints: the same, kept in a SQLite database
+"""
+
+import time
+
+from pybitbucket.sqlite import Database
+
+
+class CommitCheckpoints(object):
+    """
+    The newest commit read on each branch of each repository.
+    A branch of None is the main branch of the repository.
+    """
+
+    def __init__(self):
+        self.revisions = {}
+
+    def get(self, owner, repository_name, branch=None):
+        """The hash of the newest commit read on the branch, if any."""
+        return self.revisions.get((owner, repository_name, branch or ''))
+
+    def set(self, owner, repository_name, branch, revision):
+        self.revisions[(owner, repository_name, branch or '')] = revision
+
+    def close(self):
+        pass
+
+
+class SQLiteCommitCheckpoints(CommitCheckpoints):
+    """
+    The newest commit read on each branch of each repository,
+    kept in a SQLite database so that it survives restarts
+    and is shared by every process that opens the same file.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS commit_checkpoints (
+            owner TEXT NOT NULL,
+            repository_name TEXT NOT NULL,
+            branch TEXT NOT NULL,
+            revision TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (owner, repository_name, branch)
+        );
+    """
+
+    def __init__(self, path, timeout=30):
+        super(SQLiteCommitCheckpoints, self).__init__()
+        self.database = Database(path, schema=self.schema, timeout=timeout)
+
+    def get(self, owner, repository_name, branch=None):
+        row = self.database.execute(
+            'SELECT revision FROM commit_checkpoints'
+            ' WHERE owner = ? AND repository_name = ? AND branch = ?',
+            (owner, repository_name, branch or '')).fetchone()
+        return row[0] if row else None
+
+    def set(self, owner, repository_name, branch, revision):
+        self.database.execute(
+            'INSERT OR REPLACE INTO commit_checkpoints'
+            ' (owner, repository_name, branch, revision, updated_at)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            (owner, repository_name, branch or '', revision, time.time()))
+
+    def close(self):
+        self.database.close()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for encoding payloads to JSON and decoding responses from JSON.
+
+Each Client has its own codec, so a faster JSON library can be used
+without changing how requests encodes JSON for everyone else.
+
+Classes:
+- JSONEncoder: a json encoder for enums
+- JSONCodec: the json module of the standard library
+- OrjsonCodec: the orjson library, which can be installed with
+    the orjson extra of pybitbucket
+"""
+
+from enum import Enum
+from json import loads, dumps, JSONEncoder as JSONEncoderBase
+
+
+class JSONEncoder(JSONEncoderBase):
+    def default(self, obj):
+        if isinstance(obj, Enum):
+            return obj.value
+        return super(JSONEncoder, self).default(obj)
+
+
+class JSONCodec(object):
+    """
+    Encode and decode JSON with the json module of the standard library.
+    Enums are encoded as their value.
+    """
+    content_type = 'application/json'
+
+    def loads(self, content):
+        """Decode JSON text or UTF-8 bytes."""
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        return loads(content)
+
+    def dumps(self, obj):
+        """Encode an object as JSON text."""
+        return dumps(obj, cls=JSONEncoder)
+
+    def encode(self, obj):
+        """Encode an object as the UTF-8 bytes of a request body."""
+        return self.dumps(obj).encode('utf-8')
+
+    def decode(self, response):
+        """Decode the body of a response."""
+        # Let the response guess the encoding of its body.
+        return response.json()
+
+    def request_options(self, json, headers=None):
+        """
+        The options that send an object as the JSON body of a request,
+        in place of the json option of requests.
+
+        :param json: the object to send.
+        :param headers: other headers for the request.
+        :type headers: dict
+        :returns: the data and headers options.
+        :rtype: dict
+        """
+        headers = dict(headers or {})
+        headers['Content-Type'] = self.content_type
+        return {'data': self.encode(json), 'headers': headers}
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    Encode and decode JSON with orjson,
+    which decodes large pages several times faster.
+    Enums are encoded as their value by orjson itself.
+    """
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def loads(self, content):
+        return self.orjson.loads(content)
+
+    def dumps(self, obj):
+        return self.encode(obj).decode('utf-8')
+
+    def encode(self, obj):
+        return self.orjson.dumps(obj)
+
+    def decode(self, response):
+        # Bitbucket sends UTF-8, which orjson decodes from bytes.
+        return self.orjson.loads(response.content)
@@ -7,7 +7,7 @@ Provides classes for manipulating Comment resources.
 """
 from uritemplate import expand
 
-from pybitbucket.bitbucket import Bitbucket, BitbucketBase, Client
+from pybitbucket.bitbucket import BitbucketBase, Client
 
 
 class Comment(BitbucketBase):
@@ -28,7 +28,8 @@ class Comment(BitbucketBase):
             content,
             snippet_id,
             username=None,
-            client=Client()):
+            client=None):
+        client = client or Client()
         if username is None:
             username = client.get_username()
         template = (
@@ -42,28 +43,31 @@ class Comment(BitbucketBase):
                 'snippet_id': snippet_id,
             })
         payload = Comment.make_payload(content)
-        response = client.session.post(api_url, data=payload)
-        Client.expect_ok(response)
-        return Comment(response.json(), client=client)
+        return Comment.post(api_url, json=payload, client=client)
 
     @staticmethod
     def find_comment_for_snippet_by_id(
             snippet_id,
             comment_id,
             username=None,
-            client=Client()):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific comment on a snippet.
         In contrast to the pure hypermedia driven method on the Bitbucket
         class, this method returns a Comment object, instead of the
         generator.
         """
+        client = client or Client()
         if username is None:
             username = client.get_username()
-        return next(Bitbucket(client=client).snippetCommentByCommentId(
+        return client.first(client.root.snippetCommentByCommentId(
             username=username,
             snippet_id=snippet_id,
-            comment_id=comment_id))
+            comment_id=comment_id,
+            raw=raw,
+            fields=fields))
 
     @staticmethod
     def find_comment_for_repository_commit_by_id(
@@ -71,19 +75,24 @@ class Comment(BitbucketBase):
             repository_name,
             revision,
             comment_id,
-            client=Client()):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific comment on a commit.
         In contrast to the pure hypermedia driven method on the Bitbucket
         class, this method returns a Comment object, instead of the
         generator.
         """
-        return next(
-            Bitbucket(client=client).repositoryCommitCommentByCommentId(
+        client = client or Client()
+        return client.first(
+            client.root.repositoryCommitCommentByCommentId(
                 owner=owner,
                 repository_name=repository_name,
                 revision=revision,
-                comment_id=comment_id))
+                comment_id=comment_id,
+                raw=raw,
+                fields=fields))
 
     @staticmethod
     def find_comment_for_repository_pullrequest_by_id(
@@ -91,19 +100,24 @@ class Comment(BitbucketBase):
             repository_name,
             pullrequest_id,
             comment_id,
-            client=Client()):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific comment on a pull request.
         In contrast to the pure hypermedia driven method on the Bitbucket
         class, this method returns a Comment object, instead of the
         generator.
         """
-        return next(
-            Bitbucket(client=client).repositoryPullRequestCommentsByCommentId(
+        client = client or Client()
+        return client.first(
+            client.root.repositoryPullRequestCommentsByCommentId(
                 owner=owner,
                 repository_name=repository_name,
                 pullrequest_id=pullrequest_id,
-                comment_id=comment_id))
+                comment_id=comment_id,
+                raw=raw,
+                fields=fields))
 
 
 Client.bitbucket_types.add(Comment)
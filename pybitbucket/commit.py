@@ -23,7 +23,8 @@ class Commit(BitbucketBase):
         return (Commit.has_v2_self_url(data))
 
     # Must override base constructor to account for approve and unapprove
-    def __init__(self, data, client=Client()):
+    def __init__(self, data, client=None):
+        client = client or Client()
         super(Commit, self).__init__(data, client=client)
         # approve and unapprove are just different verbs for same url
         if data.get('links', {}).get('approve', {}).get('href', {}):
@@ -38,7 +39,10 @@ class Commit(BitbucketBase):
             username,
             repository_name,
             revision,
-            client=Client()):
+            client=None,
+            raw=False,
+            fields=None):
+        client = client or Client()
         template = (
             '{+bitbucket_url}' +
             '/2.0/repositories/{username}/{repository_name}' +
@@ -51,17 +55,51 @@ class Commit(BitbucketBase):
                 'repository_name': repository_name,
                 'revision': revision
             })
-        response = client.session.get(url)
-        if 404 == response.status_code:
-            return
-        Client.expect_ok(response)
-        return Commit(response.json(), client=client)
+        if fields:
+            url = client.set_fields(url, fields)
+        return client.find_object(
+            url, build=partial(Commit, client=client), raw=raw)
+
+    @staticmethod
+    def find_commits_by_revisions(
+            username,
+            repository_name,
+            revisions,
+            client=None,
+            max_workers=8,
+            raw=False,
+            fields=None):
+        """
+        Find many commits in a repository concurrently.
+        Generates a FetchResult for each revision, as they arrive;
+        a revision that is not found has an error instead of a commit.
+        """
+        client = client or Client()
+        template = (
+            '{+bitbucket_url}' +
+            '/2.0/repositories/{username}/{repository_name}' +
+            '/commit/{revision}')
+        return client.fetch_many(
+            (
+                (template, {
+                    'bitbucket_url': client.get_bitbucket_url(),
+                    'username': username,
+                    'repository_name': repository_name,
+                    'revision': revision
+                })
+                for revision in revisions),
+            max_workers=max_workers,
+            raw=raw,
+            fields=fields)
 
     @staticmethod
     def find_commit_in_repository_full_name_by_revision(
             repository_full_name,
             revision,
-            client=Client()):
+            client=None,
+            raw=False,
+            fields=None):
+        client = client or Client()
         if '/' not in repository_full_name:
             raise NameError(
                 "Repository full name must be in the form: username/name")
@@ -70,7 +108,9 @@ class Commit(BitbucketBase):
             username,
             repository_name,
             revision,
-            client=client)
+            client=client,
+            raw=raw,
+            fields=fields)
 
     @staticmethod
     def find_commits_in_repository(
@@ -79,7 +119,12 @@ class Commit(BitbucketBase):
             branch=None,
             include=None,
             exclude=None,
-            client=Client()):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None):
+        client = client or Client()
         include = include or []
         exclude = exclude or []
         template = (
@@ -96,8 +141,12 @@ class Commit(BitbucketBase):
                 'include': include,
                 'exclude': exclude
             })
-        for commit in client.remote_relationship(url):
-            yield commit
+        return client.remote_relationship(
+            url,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields)
 
     @staticmethod
     def find_commits_in_repository_full_name(
@@ -105,20 +154,101 @@ class Commit(BitbucketBase):
             branch=None,
             include=None,
             exclude=None,
-            client=Client()):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None):
+        client = client or Client()
         include = include or []
         exclude = exclude or []
         if '/' not in repository_full_name:
             raise NameError(
                 "Repository full name must be in the form: username/name")
         username, repository_name = repository_full_name.split('/')
-        yield Commit.find_commits_in_repository(
+        return Commit.find_commits_in_repository(
             username,
             repository_name,
             branch=branch,
             include=include,
             exclude=exclude,
-            client=client)
+            client=client,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields)
+
+    @staticmethod
+    def find_new_commits_in_repository(
+            username,
+            repository_name,
+            branch=None,
+            known=None,
+            checkpoints=None,
+            client=None,
+            pagelen=None,
+            raw=False,
+            fields=None):
+        """
+        A convenience method for reading only the commits
+        pushed to a branch since it was last read.
+        The method gives an iterator over the new commits, newest first.
+
+        The newest commit read on the branch is kept in the checkpoints,
+        once the new commits have all been generated,
+        and is excluded the next time, so that Bitbucket only lists
+        the commits that are not reachable from it.
+        Pagination also stops as soon as a known commit is listed.
+        So each sync costs a page or two, instead of the whole history.
+
+        :param username: the owner of the repository.
+        :type username: str
+        :param repository_name: the name of the repository.
+        :type repository_name: str
+        :param branch: the branch, or tag, or commit to start from.
+            If not provided, starts from the main branch.
+        :type branch: str
+        :param known: the hashes of commits that were already read.
+        :type known: set
+        :param checkpoints: where the newest commit read on each branch
+            is kept between syncs, like a SQLiteCommitCheckpoints.
+            If not provided, only known commits are excluded.
+        :type checkpoints: checkpoint.CommitCheckpoints
+        :param client: the configured connection to Bitbucket.
+            If not provided, assumes an Anonymous connection.
+        :type client: bitbucket.Client
+        :param pagelen: the number of commits to fetch on each page.
+            If not provided, uses the pagelen setting of the client.
+        :type pagelen: int
+        :param raw: whether to give the decoded json
+            instead of the resources made from it.
+        :type raw: bool
+        :param fields: the fields to include or exclude from the response,
+            as for Client.remote_relationship.
+        :type fields: str or list
+        :returns: an iterator over the new commits.
+        :rtype: iterator
+        """
+        client = client or Client()
+        since = None
+        save = None
+        if checkpoints is not None:
+            since = checkpoints.get(username, repository_name, branch)
+            save = partial(checkpoints.set, username, repository_name, branch)
+        return client.read_new(
+            lambda checkpoint: Commit.find_commits_in_repository(
+                username,
+                repository_name,
+                branch=branch,
+                exclude=[checkpoint] if checkpoint else [],
+                client=client,
+                pagelen=pagelen,
+                raw=raw,
+                fields=fields),
+            (lambda c: c['hash']) if raw else (lambda c: c.hash),
+            known=known or frozenset(),
+            since=since,
+            save=save)
 
 
 Client.bitbucket_types.add(Commit)
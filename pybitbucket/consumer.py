@@ -12,7 +12,6 @@ Classes:
 - Consumer: represents an OAuth consumer.
 """
 
-from uritemplate import expand
 from voluptuous import Schema, Required, Optional, In
 
 from pybitbucket.bitbucket import BitbucketBase, Client, PayloadBuilder, Enum
@@ -198,12 +197,10 @@ class Consumer(BitbucketBase):
         if not owner:
             raise ValueError('owner is required')
         data = payload.validate().build()
-        templates = cls.extract_templates_from_json()
-        api_url = expand(
-            templates['create'], {
-                'bitbucket_url': client.get_bitbucket_url(),
-                'username': owner
-            })
+        api_url = cls.expand_link_url(
+            'create',
+            bitbucket_url=client.get_bitbucket_url(),
+            username=owner)
         # Note: This Bitbucket API expects a urlencoded-form, not json.
         # Hence, use `data` instead of `json`.
         return cls.post(api_url, data=data, client=client)
@@ -224,30 +221,35 @@ class Consumer(BitbucketBase):
         return self.put(data=payload.validate().build())
 
     @staticmethod
-    def find_consumers(client=Client()):
+    def find_consumers(client=None, max_items=None, raw=False, fields=None):
         """
         Find consumers for the authenticated user.
         The method is a generator Consumer objects.
         """
-        url = expand(
-            Consumer.get_link_template('consumers'), {
-                'bitbucket_url': client.get_bitbucket_url(),
-                'username': client.get_username()
-            })
-        return client.remote_relationship(url)
+        client = client or Client()
+        url = Consumer.expand_link_url(
+            'consumers',
+            bitbucket_url=client.get_bitbucket_url(),
+            username=client.get_username())
+        return client.remote_relationship(
+            url,
+            max_items=max_items,
+            raw=raw,
+            fields=fields)
 
     @staticmethod
-    def find_consumer_by_id(consumer_id, client=Client()):
+    def find_consumer_by_id(consumer_id, client=None, raw=False, fields=None):
         """
         Finding a specific consumer by id for the authenticated user.
         """
-        url = expand(
-            Consumer.get_link_template('self'), {
-                'bitbucket_url': client.get_bitbucket_url(),
-                'username': client.get_username(),
-                'consumer_id': consumer_id,
-            })
-        return next(client.remote_relationship(url))
+        client = client or Client()
+        url = Consumer.expand_link_url(
+            'self',
+            bitbucket_url=client.get_bitbucket_url(),
+            username=client.get_username(),
+            consumer_id=consumer_id)
+        return client.first(
+            client.remote_relationship(url, raw=raw, fields=fields))
 
 
 Client.bitbucket_types.add(Consumer)
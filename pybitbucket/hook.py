@@ -16,7 +16,7 @@ from uritemplate import expand
 from voluptuous import Schema, Required, Optional, In
 
 from pybitbucket.bitbucket import (
-    Bitbucket, BitbucketBase, Client, PayloadBuilder, Enum)
+    BitbucketBase, Client, PayloadBuilder, Enum)
 
 
 class HookEvent(Enum):
@@ -241,7 +241,9 @@ class Hook(BitbucketBase):
             uuid,
             repository_name,
             owner=None,
-            client=None):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific hook.
         In contrast to the pure hypermedia driven method on the Bitbucket
@@ -250,17 +252,25 @@ class Hook(BitbucketBase):
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return next(
-            Bitbucket(client=client).repositoryHookById(
+        return client.first(
+            client.root.repositoryHookById(
                 owner=owner,
                 repository_name=repository_name,
-                uuid=uuid))
+                uuid=uuid,
+                raw=raw,
+                fields=fields))
 
     @staticmethod
     def find_hooks_for_repository(
             repository_name,
             owner=None,
-            client=None):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None,
+            q=None,
+            sort=None):
         """
         A convenience method for finding hooks for a repository.
         The method is a generator Hooks objects.
@@ -268,9 +278,15 @@ class Hook(BitbucketBase):
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return Bitbucket(client=client).repositoryHooks(
+        return client.root.repositoryHooks(
             owner=owner,
-            repository_name=repository_name)
+            repository_name=repository_name,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields,
+            q=q,
+            sort=sort)
 
 
 Client.bitbucket_types.add(Hook)
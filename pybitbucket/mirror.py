@@ -0,0 +1,520 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for mirroring the repositories of some owners into SQLite,
+so that listings are answered locally instead of by the API.
+
+Classes:
+- RefreshResult: what was refreshed for a repository, or the error
+- Mirror: a SQLite store of repositories, pull requests,
+    branches, tags, and commits, refreshed incrementally
+- MirrorSchedule: refreshes a mirror at an interval in a thread
+"""
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from threading import Event, Thread
+import time
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.checkpoint import CommitCheckpoints, SQLiteCommitCheckpoints
+from pybitbucket.commit import Commit
+from pybitbucket.pullrequest import PullRequest, PullRequestState
+from pybitbucket.query import Field, Filter
+from pybitbucket.ref import Branch, Tag
+from pybitbucket.repository import Repository
+from pybitbucket.sqlite import Database
+
+
+class RefreshResult(namedtuple('RefreshResult', [
+        'owner', 'repository_name', 'counts', 'error'])):
+    """
+    What was refreshed for a repository:
+    the number of items stored for each kind,
+    or the error raised while refreshing it.
+    """
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class Mirror(object):
+    """
+    A local copy of the repositories of some owners,
+    with their pull requests, branches, tags,
+    and the commits of some of their branches,
+    kept in a SQLite database.
+
+    Each refresh only asks for what changed since the last one:
+    repositories and pull requests updated since the newest seen,
+    and commits pushed since the last commit read on each branch.
+    Branches and tags are listed again in full, since they are few,
+    but only for the repositories updated since they were last listed,
+    as a push updates its repository.
+    The repositories of an owner are refreshed concurrently.
+
+    The resources are kept as their json, and are made again
+    from it by the queries, without a request.
+
+    :param path: the path of the SQLite database.
+    :type path: str
+    :param owners: the owners whose repositories are mirrored.
+    :type owners: list
+    :param client: the configured connection to Bitbucket.
+        If not provided, assumes an Anonymous connection.
+    :type client: bitbucket.Client
+    :param commit_branches: the branches whose commits are mirrored,
+        where None is the main branch of each repository.
+    :type commit_branches: list
+    :param max_workers: the most repositories to refresh at once.
+    :type max_workers: int
+    :param timeout: seconds to wait for another process
+        writing to the database.
+    :type timeout: float
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS mirror_resources (
+            kind TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            repository_name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            state TEXT,
+            updated_on TEXT,
+            data TEXT NOT NULL,
+            PRIMARY KEY (kind, owner, repository_name, key)
+        );
+        CREATE INDEX IF NOT EXISTS mirror_resources_by_updated_on
+            ON mirror_resources (kind, owner, repository_name, updated_on);
+        CREATE INDEX IF NOT EXISTS mirror_resources_by_state
+            ON mirror_resources (
+                kind, owner, repository_name, state, updated_on);
+        CREATE TABLE IF NOT EXISTS mirror_cursors (
+            kind TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            repository_name TEXT NOT NULL,
+            updated_on TEXT NOT NULL,
+            PRIMARY KEY (kind, owner, repository_name)
+        );
+    """
+
+    # The fields of the json that the rows are indexed by, for each kind:
+    # the key, the state, and when it was last updated.
+    indexed_fields = {
+        'repository': ('full_name', None, 'updated_on'),
+        'pullrequest': ('id', 'state', 'updated_on'),
+        'branch': ('name', None, 'target.date'),
+        'tag': ('name', None, 'target.date'),
+        'commit': ('hash', None, 'date'),
+    }
+
+    def __init__(
+            self,
+            path,
+            owners=(),
+            client=None,
+            commit_branches=(None,),
+            max_workers=4,
+            timeout=30):
+        self.client = client or Client()
+        self.owners = list(owners)
+        self.commit_branches = list(commit_branches)
+        self.max_workers = max_workers
+        self.database = Database(path, schema=self.schema, timeout=timeout)
+        self.checkpoints = SQLiteCommitCheckpoints(path, timeout=timeout)
+
+    @staticmethod
+    def value_of(data, field):
+        """The value of a dotted field of the json, if any."""
+        if field is None:
+            return None
+        for name in field.split('.'):
+            if not isinstance(data, dict):
+                return None
+            data = data.get(name)
+        return data
+
+    def row(self, kind, owner, repository_name, data):
+        key, state, updated_on = (
+            self.value_of(data, field)
+            for field in self.indexed_fields[kind])
+        if kind == 'repository':
+            repository_name = key.split('/', 1)[-1]
+        return (
+            kind,
+            owner,
+            repository_name,
+            '{0}'.format(key),
+            state,
+            updated_on,
+            self.client.codec.dumps(data))
+
+    def store(self, kind, owner, repository_name, items, replace=False):
+        """
+        Store the json of items of a kind,
+        and return the newest updated_on among them.
+
+        :param replace: whether the items are all there are,
+            so that the stored items not among them are removed.
+        :type replace: bool
+        """
+        rows = [
+            self.row(kind, owner, repository_name, data) for data in items]
+        scope = (kind, owner, repository_name)
+        where = 'kind = ? AND owner = ? AND repository_name = ?'
+        if kind == 'repository':
+            # Every repository of the owner is listed at once.
+            scope, where = (kind, owner), 'kind = ? AND owner = ?'
+        with self.database.transaction() as connection:
+            if replace:
+                connection.execute(
+                    'DELETE FROM mirror_resources WHERE ' + where, scope)
+            connection.executemany(
+                'INSERT OR REPLACE INTO mirror_resources'
+                ' (kind, owner, repository_name, key, state, updated_on,'
+                ' data) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows)
+        updated = [r[5] for r in rows if r[5]]
+        return max(updated) if updated else None
+
+    def cursor(self, kind, owner, repository_name=''):
+        """The newest updated_on stored for a kind, if any."""
+        row = self.database.execute(
+            'SELECT updated_on FROM mirror_cursors'
+            ' WHERE kind = ? AND owner = ? AND repository_name = ?',
+            (kind, owner, repository_name)).fetchone()
+        return row[0] if row else None
+
+    def move_cursor(self, kind, owner, repository_name, updated_on):
+        if updated_on is None:
+            return
+        self.database.execute(
+            'INSERT OR REPLACE INTO mirror_cursors'
+            ' (kind, owner, repository_name, updated_on)'
+            ' SELECT ?, ?, ?, MAX(?, COALESCE(('
+            '     SELECT updated_on FROM mirror_cursors'
+            '     WHERE kind = ? AND owner = ? AND repository_name = ?'
+            ' ), ?))',
+            (kind, owner, repository_name, updated_on,
+             kind, owner, repository_name, updated_on))
+
+    @staticmethod
+    def updated_since(cursor):
+        """The filter for what was updated after the cursor, if any."""
+        if cursor is None:
+            return None
+        # Bitbucket compares datetimes written as they are sent.
+        return Filter('updated_on > {0}'.format(cursor))
+
+    def refresh_repositories(self, owner, full=False):
+        """
+        Store the repositories of an owner updated since the last refresh,
+        or all of them, removing those that are gone, when full.
+
+        :returns: the names of the repositories of the owner.
+        :rtype: list
+        """
+        cursor = None if full else self.cursor('repository', owner)
+        items = list(Repository.find_repositories_by_owner_and_role(
+            owner=owner,
+            role=None,
+            client=self.client,
+            raw=True,
+            q=self.updated_since(cursor),
+            sort=Field('updated_on').descending()))
+        updated_on = self.store(
+            'repository', owner, '', items, replace=cursor is None)
+        self.move_cursor('repository', owner, '', updated_on)
+        if cursor is None:
+            # Forget what belonged to the repositories that are gone.
+            self.database.execute(
+                'DELETE FROM mirror_resources'
+                ' WHERE owner = ? AND kind != ? AND repository_name NOT IN ('
+                '     SELECT repository_name FROM mirror_resources'
+                '     WHERE owner = ? AND kind = ?)',
+                (owner, 'repository', owner, 'repository'))
+        return [
+            repository_name
+            for (repository_name,)
+            in self.database.execute(
+                'SELECT repository_name FROM mirror_resources'
+                ' WHERE kind = ? AND owner = ? ORDER BY repository_name',
+                ('repository', owner))]
+
+    def refresh_pullrequests(self, owner, repository_name, full=False):
+        cursor = None if full else self.cursor(
+            'pullrequest', owner, repository_name)
+        items = []
+        # Bitbucket only lists open pull requests unless asked for a state.
+        for state in PullRequestState:
+            items.extend(PullRequest.find_pullrequests_for_repository_by_state(
+                repository_name,
+                owner=owner,
+                state=state.value,
+                client=self.client,
+                raw=True,
+                q=self.updated_since(cursor),
+                sort=Field('updated_on').descending()))
+        # Listing every state at once also finds what was deleted.
+        updated_on = self.store(
+            'pullrequest', owner, repository_name, items,
+            replace=cursor is None)
+        self.move_cursor('pullrequest', owner, repository_name, updated_on)
+        return len(items)
+
+    def repository_updated_on(self, owner, repository_name):
+        """When a stored repository was last updated, if known."""
+        row = self.database.execute(
+            'SELECT updated_on FROM mirror_resources'
+            ' WHERE kind = ? AND owner = ? AND repository_name = ?',
+            ('repository', owner, repository_name)).fetchone()
+        return row[0] if row else None
+
+    def refresh_refs(self, kind, owner, repository_name, full=False):
+        """
+        Store every branch or tag of a repository,
+        unless the repository was not updated since they were last listed.
+
+        :returns: the number of refs stored.
+        :rtype: int
+        """
+        updated_on = self.repository_updated_on(owner, repository_name)
+        cursor = None if full else self.cursor(kind, owner, repository_name)
+        if None not in (cursor, updated_on) and updated_on <= cursor:
+            return 0
+        find = {
+            'branch': Branch.find_branches_in_repository,
+            'tag': Tag.find_tags_in_repository,
+        }[kind]
+        items = list(find(
+            repository_name,
+            owner=owner,
+            client=self.client,
+            raw=True))
+        self.store(kind, owner, repository_name, items, replace=True)
+        self.move_cursor(kind, owner, repository_name, updated_on)
+        return len(items)
+
+    def refresh_commits(self, owner, repository_name):
+        count = 0
+        for branch in self.commit_branches:
+            # The checkpoint only moves once the commits are stored,
+            # so that commits that failed to be stored are read again.
+            pending = CommitCheckpoints()
+            checkpoint = self.checkpoints.get(owner, repository_name, branch)
+            if checkpoint:
+                pending.set(owner, repository_name, branch, checkpoint)
+            items = list(Commit.find_new_commits_in_repository(
+                owner,
+                repository_name,
+                branch=branch,
+                checkpoints=pending,
+                client=self.client,
+                raw=True))
+            self.store('commit', owner, repository_name, items)
+            revision = pending.get(owner, repository_name, branch)
+            if revision != checkpoint:
+                self.checkpoints.set(
+                    owner, repository_name, branch, revision)
+            count += len(items)
+        return count
+
+    def refresh_repository(self, owner, repository_name, full=False):
+        """
+        Refresh the pull requests, branches, tags, and commits
+        of a repository.
+
+        :returns: what was refreshed, or the error.
+        :rtype: RefreshResult
+        """
+        try:
+            counts = {
+                'pullrequest': self.refresh_pullrequests(
+                    owner, repository_name, full=full),
+                'branch': self.refresh_refs(
+                    'branch', owner, repository_name, full=full),
+                'tag': self.refresh_refs(
+                    'tag', owner, repository_name, full=full),
+                'commit': self.refresh_commits(owner, repository_name),
+            }
+            return RefreshResult(owner, repository_name, counts, None)
+        except Exception as e:
+            return RefreshResult(owner, repository_name, None, e)
+
+    def refresh(self, owners=None, full=False):
+        """
+        Refresh the repositories of the owners,
+        and then each of them concurrently.
+
+        An error refreshing one repository is kept in its result
+        instead of being raised, so the rest are still refreshed.
+
+        :param owners: the owners to refresh.
+            If not provided, refreshes the owners of the mirror.
+        :type owners: list
+        :param full: whether to list everything again,
+            instead of only what was updated,
+            so that the repositories and pull requests
+            deleted on Bitbucket are removed.
+            Branches and tags are replaced by every refresh,
+            and commits are never removed.
+        :type full: bool
+        :returns: the result for each repository.
+        :rtype: list of RefreshResult
+        """
+        repositories = [
+            (owner, repository_name)
+            for owner in (owners or self.owners)
+            for repository_name in self.refresh_repositories(owner, full)]
+        if not repositories:
+            return []
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            return list(executor.map(
+                lambda r: self.refresh_repository(r[0], r[1], full=full),
+                repositories))
+        finally:
+            executor.shutdown(wait=True)
+
+    def schedule(self, interval, owners=None, on_refresh=None):
+        """
+        Refresh the mirror now, and then every interval seconds,
+        in a thread, until the schedule is stopped.
+
+        :param interval: the seconds from the start of a refresh
+            to the start of the next one.
+        :type interval: float
+        :param on_refresh: called with the results of each refresh.
+        :type on_refresh: callable
+        :returns: the running schedule.
+        :rtype: MirrorSchedule
+        """
+        schedule = MirrorSchedule(self, interval, owners, on_refresh)
+        schedule.start()
+        return schedule
+
+    def query(
+            self,
+            kind,
+            owner=None,
+            repository_name=None,
+            state=None,
+            since=None,
+            raw=False):
+        """
+        Generate the stored items of a kind, newest first,
+        as resources made from their json, without a request.
+
+        :param kind: repository, pullrequest, branch, tag, or commit.
+        :type kind: str
+        :param since: only the items updated after this,
+            as a datetime or as Bitbucket writes it.
+        :type since: datetime or str
+        :param raw: whether to give the stored json
+            instead of the resources made from it.
+        :type raw: bool
+        """
+        conditions, parameters = ['kind = ?'], [kind]
+        for column, value in (
+                ('owner', owner),
+                ('repository_name', repository_name),
+                ('state', getattr(state, 'value', state))):
+            if value is not None:
+                conditions.append('{0} = ?'.format(column))
+                parameters.append(value)
+        if since is not None:
+            if isinstance(since, (datetime, date)):
+                since = since.isoformat()
+            conditions.append('updated_on > ?')
+            parameters.append(since)
+        rows = self.database.execute(
+            'SELECT data FROM mirror_resources WHERE ' +
+            ' AND '.join(conditions) +
+            ' ORDER BY updated_on DESC, key',
+            parameters)
+        for (data,) in rows:
+            data = self.client.codec.loads(data)
+            yield data if raw else self.client.convert_to_object(data)
+
+    def repositories(self, owner=None, since=None, raw=False):
+        return self.query(
+            'repository', owner=owner, since=since, raw=raw)
+
+    def pullrequests(
+            self,
+            owner=None,
+            repository_name=None,
+            state=None,
+            since=None,
+            raw=False):
+        return self.query(
+            'pullrequest',
+            owner=owner,
+            repository_name=repository_name,
+            state=state,
+            since=since,
+            raw=raw)
+
+    def branches(self, owner, repository_name, raw=False):
+        return self.query(
+            'branch', owner=owner, repository_name=repository_name, raw=raw)
+
+    def tags(self, owner, repository_name, raw=False):
+        return self.query(
+            'tag', owner=owner, repository_name=repository_name, raw=raw)
+
+    def commits(self, owner, repository_name, since=None, raw=False):
+        return self.query(
+            'commit',
+            owner=owner,
+            repository_name=repository_name,
+            since=since,
+            raw=raw)
+
+    def close(self):
+        self.database.close()
+        self.checkpoints.close()
+
+
+class MirrorSchedule(Thread):
+    """
+    Refreshes a mirror at an interval, in a daemon thread.
+    The results of the last refresh are kept in last_results,
+    and an error that stops a refresh in last_error.
+    """
+
+    def __init__(self, mirror, interval, owners=None, on_refresh=None):
+        super(MirrorSchedule, self).__init__()
+        self.daemon = True
+        self.mirror = mirror
+        self.interval = interval
+        self.owners = owners
+        self.on_refresh = on_refresh
+        self.stopped = Event()
+        self.refreshed = Event()
+        self.last_results = None
+        self.last_error = None
+
+    def run(self):
+        while not self.stopped.is_set():
+            started = time.time()
+            try:
+                self.last_results = self.mirror.refresh(self.owners)
+                self.last_error = None
+                if self.on_refresh is not None:
+                    self.on_refresh(self.last_results)
+            except Exception as e:
+                # Try again at the next interval, like Bitbucket was down.
+                self.last_error = e
+            self.refreshed.set()
+            self.stopped.wait(
+                max(0, self.interval - (time.time() - started)))
+
+    def stop(self, timeout=None):
+        """Stop refreshing, and wait for a refresh under way."""
+        self.stopped.set()
+        self.join(timeout)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for uploading files as multipart form data
+without reading all of them into memory.
+
+Classes:
+- LazyFile: a file that is only open while it is being read
+- MultipartUpload: a multipart/form-data body that is read in chunks
+"""
+
+import os
+from binascii import hexlify
+from enum import Enum
+
+from requests.utils import super_len
+from six import string_types
+
+
+class LazyFile(object):
+    """
+    A file that is opened when it is first read,
+    and closed as soon as it has been read to its end,
+    so that uploading many files does not hold a descriptor for each.
+    Reading it again after its end reads it again from its start.
+    """
+
+    def __init__(self, path):
+        self.name = path
+        self.file = None
+
+    def __len__(self):
+        return os.path.getsize(self.name)
+
+    def read(self, size=-1):
+        if self.file is None:
+            self.file = open(self.name, 'rb')
+        data = self.file.read(size)
+        if not data or size is None or size < 0:
+            self.close()
+        return data
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class MultipartUpload(object):
+    """
+    A multipart/form-data body for requests,
+    which reads its files one chunk at a time as it is sent,
+    so that an upload takes the same memory however large its files are.
+
+    The length of the body is known up front,
+    so it is sent with a Content-Length instead of chunked.
+    Reading it again after its end starts it over,
+    and rewinding it starts it over from wherever it was left,
+    so that a retried request sends the whole body again.
+
+    :param fields: form fields, sent before the files.
+        Enums are sent as their value, booleans as true or false,
+        and fields that are not scalars are left out.
+    :type fields: dict
+    :param files: (name, (filename, file object)) pairs, as for requests,
+        or paths, which are sent as files named file.
+        Each file object is read from where it is positioned,
+        and must have a known size, like a file on disk;
+        paths are only opened while they are being sent.
+    :type files: list
+    :param progress: called with the bytes sent so far
+        and the length of the body, after each chunk.
+    :type progress: callable
+    :param chunk_size: the most bytes read from a file at a time.
+    :type chunk_size: int
+    """
+
+    def __init__(
+            self,
+            fields=None,
+            files=(),
+            progress=None,
+            chunk_size=64 * 1024):
+        self.boundary = hexlify(os.urandom(16)).decode('ascii')
+        self.progress = progress
+        self.chunk_size = chunk_size
+        self.parts = []
+        for name, value in sorted((fields or {}).items()):
+            value = self.field_value(value)
+            if value is not None:
+                self.parts.append(
+                    (self.part_header(name), value.encode('utf-8')))
+        for entry in files:
+            if isinstance(entry, string_types):
+                entry = ('file', (entry, LazyFile(entry)))
+            name, (filename, fileobj) = entry
+            self.parts.append((self.part_header(name, filename), fileobj))
+        self.ending = '--{0}--\r\n'.format(self.boundary).encode('ascii')
+        # Where each file object starts, to start it over on a retry.
+        self.starts = [
+            self.position_of(source) for (_, source) in self.parts]
+        self.length = len(self.ending) + sum(
+            len(header) + super_len(source) + len(b'\r\n')
+            for (header, source) in self.parts)
+        self.chunks = None
+        self.chunk = b''
+        self.offset = 0
+        self.sent = 0
+
+    @staticmethod
+    def field_value(value):
+        if isinstance(value, Enum):
+            value = value.value
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (string_types, int, float)):
+            return '{0}'.format(value)
+        return None
+
+    @staticmethod
+    def position_of(source):
+        if isinstance(source, (bytes, LazyFile)):
+            return None
+        try:
+            return source.tell()
+        except (AttributeError, IOError, OSError):
+            return None
+
+    def part_header(self, name, filename=None):
+        disposition = 'form-data; name="{0}"'.format(name)
+        lines = ['--{0}'.format(self.boundary)]
+        if filename is None:
+            lines.append('Content-Disposition: {0}'.format(disposition))
+        else:
+            lines.append('Content-Disposition: {0}; filename="{1}"'.format(
+                disposition, os.path.basename(filename)))
+            lines.append('Content-Type: application/octet-stream')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+
+    @property
+    def content_type(self):
+        return 'multipart/form-data; boundary={0}'.format(self.boundary)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        """Generate the chunks of the body from its start."""
+        for (header, source), start in zip(self.parts, self.starts):
+            yield header
+            if isinstance(source, bytes):
+                yield source
+            else:
+                if start is not None:
+                    source.seek(start)
+                for chunk in iter(
+                        lambda: source.read(self.chunk_size), b''):
+                    yield chunk
+            yield b'\r\n'
+        yield self.ending
+
+    def read(self, size=-1):
+        """Read the next bytes of the body, as the file object of a body."""
+        if self.chunks is None:
+            self.chunks = iter(self)
+            self.sent = 0
+        whole = size is None or size < 0
+        pieces = []
+        while whole or size > 0:
+            if self.offset == len(self.chunk):
+                self.chunk, self.offset = next(self.chunks, None), 0
+                if self.chunk is None:
+                    self.chunk = b''
+                    break
+                continue
+            end = len(self.chunk) if whole else min(
+                len(self.chunk), self.offset + size)
+            pieces.append(self.chunk[self.offset:end])
+            if not whole:
+                size -= end - self.offset
+            self.offset = end
+        data = b''.join(pieces)
+        if not data:
+            # Start over if the body is read again.
+            self.chunks = None
+            return data
+        self.sent += len(data)
+        if self.progress is not None:
+            self.progress(self.sent, self.length)
+        return data
+
+    def rewind(self):
+        """
+        Start the body over, even if it was only partly read,
+        as before each attempt to send it.
+        """
+        self.chunks = None
+        self.chunk = b''
+        self.offset = 0
+        self.sent = 0
+        self.close()
+
+    def close(self):
+        """Close the files that are still open."""
+        for _, source in self.parts:
+            if isinstance(source, LazyFile):
+                source.close()
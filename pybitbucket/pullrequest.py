@@ -17,7 +17,8 @@ from uritemplate import expand
 from voluptuous import Schema, Required, Optional
 
 from pybitbucket.bitbucket import (
-        Bitbucket, BitbucketBase, Client, PayloadBuilder, Enum)
+        BitbucketBase, Client, PayloadBuilder, Enum)
+from pybitbucket.streaming import parse_diff
 
 
 class PullRequestState(Enum):
@@ -248,13 +249,13 @@ class PullRequest(BitbucketBase):
 
     def attr_from_subchild(self, target_attribute, child, child_object):
         if self.data.get(child, {}).get(child_object, {}):
-            setattr(
-                self,
+            self.defer(
                 target_attribute,
-                self.client.convert_to_object(
-                    self.data[child][child_object]))
+                lambda pullrequest, name: pullrequest.client.convert_to_object(
+                    pullrequest.data[child][child_object]))
 
-    def __init__(self, data, client=Client()):
+    def __init__(self, data, client=None):
+        client = client or Client()
         super(PullRequest, self).__init__(data, client=client)
         self.attr_from_subchild(
             'source_commit', 'source', 'commit')
@@ -288,11 +289,32 @@ class PullRequest(BitbucketBase):
             # Diff returns plain text
             setattr(self, 'diff', partial(
                 self.content, url=url))
+            # Large diffs can be read without holding all of them
+            setattr(self, 'diff_files', partial(
+                self.files_in_diff, url=url))
+            setattr(self, 'download_diff', partial(
+                self.client.download, url))
+            setattr(self, 'spool_diff', partial(
+                self.client.spool, url))
 
     def content(self, url):
-        response = self.client.session.get(url)
-        Client.expect_ok(response)
-        return response.content
+        return self.client.get_content(url)
+
+    def files_in_diff(self, url):
+        """
+        Generate the diff of each file in a unified diff,
+        parsed from the response as it arrives,
+        so only the diff of one file is held at a time.
+        Parsing takes several times longer than reading the whole diff
+        with diff, so this is for diffs too large to hold.
+
+        :param url: the URL of the diff.
+        :type url: str
+        :returns: the diffs of the files, with their paths,
+            hunks, and the number of lines added and removed.
+        :rtype: iterator of pybitbucket.streaming.FileDiff
+        """
+        return parse_diff(self.client.stream_content(url))
 
     @classmethod
     def create(
@@ -341,7 +363,9 @@ class PullRequest(BitbucketBase):
             pullrequest_id,
             repository_name,
             owner=None,
-            client=None):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific pull request.
         In contrast to the pure hypermedia driven method on the Bitbucket
@@ -350,18 +374,26 @@ class PullRequest(BitbucketBase):
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return next(
-            Bitbucket(client=client).repositoryPullRequestByPullRequestId(
+        return client.first(
+            client.root.repositoryPullRequestByPullRequestId(
                 owner=owner,
                 repository_name=repository_name,
-                pullrequest_id=pullrequest_id))
+                pullrequest_id=pullrequest_id,
+                raw=raw,
+                fields=fields))
 
     @staticmethod
     def find_pullrequests_for_repository_by_state(
             repository_name,
             owner=None,
             state=None,
-            client=None):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None,
+            q=None,
+            sort=None):
         """
         A convenience method for finding pull requests for a repository.
         The method is a generator PullRequest objects.
@@ -372,10 +404,16 @@ class PullRequest(BitbucketBase):
         owner = owner or client.get_username()
         if (state is not None):
             PullRequestState(state)
-        return Bitbucket(client=client).repositoryPullRequestsInState(
+        return client.root.repositoryPullRequestsInState(
             owner=owner,
             repository_name=repository_name,
-            state=state)
+            state=state,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields,
+            q=q,
+            sort=sort)
 
 
 Client.bitbucket_types.add(PullRequest)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for building the q and sort parameters of 2.0 collections,
+so that Bitbucket filters and orders a collection
+and only the items that match are sent.
+
+Classes:
+- Field: a field of the items of a collection, compared to a value
+- Filter: a condition on the items, in the filter language of q
+
+Functions:
+- ascending: the sort parameter for a field in ascending order
+- descending: the sort parameter for a field in descending order
+"""
+
+from datetime import date, datetime
+from enum import Enum
+
+from six import python_2_unicode_compatible, string_types
+
+
+@python_2_unicode_compatible
+class Filter(object):
+    """
+    A condition on the items of a collection,
+    which is given as the q parameter by its text.
+    Filters are combined with & (AND) and | (OR).
+    """
+
+    def __init__(self, text, operator=None, operands=()):
+        self.text = text
+        # AND or OR, for a filter combining others.
+        self.operator = operator
+        self.operands = operands
+
+    @classmethod
+    def combine(cls, operator, filters):
+        operands = []
+        for f in filters:
+            # Flatten a AND (b AND c) into a AND b AND c.
+            operands.extend(f.operands if f.operator == operator else [f])
+        text = ' {0} '.format(operator).join(
+            '({0})'.format(f) if f.operator else '{0}'.format(f)
+            for f in operands)
+        return cls(text, operator, tuple(operands))
+
+    def __and__(self, other):
+        return Filter.combine('AND', (self, other))
+
+    def __or__(self, other):
+        return Filter.combine('OR', (self, other))
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return 'Filter({0!r})'.format(self.text)
+
+
+class Field(object):
+    """
+    A field of the items of a collection,
+    which may be a path like source.branch.name.
+    Comparing it to a value makes a Filter:
+
+    ::
+
+        recent = Field('updated_on') >= datetime(2017, 1, 1)
+        open_to_master = (
+            (Field('state') == 'OPEN') &
+            (Field('destination.branch.name') == 'master'))
+
+    Strings are quoted, datetimes and dates are in ISO 8601,
+    booleans are true or false, None is null, and enums are their value.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    @staticmethod
+    def literal(value):
+        """The value in the filter language."""
+        if isinstance(value, Enum):
+            value = value.value
+        if value is None:
+            return 'null'
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, string_types):
+            return '"{0}"'.format(
+                value.replace('\\', '\\\\').replace('"', '\\"'))
+        return '{0}'.format(value)
+
+    def compare(self, operator, value):
+        return Filter('{0} {1} {2}'.format(
+            self.name, operator, self.literal(value)))
+
+    def __eq__(self, value):
+        return self.compare('=', value)
+
+    def __ne__(self, value):
+        return self.compare('!=', value)
+
+    def __lt__(self, value):
+        return self.compare('<', value)
+
+    def __le__(self, value):
+        return self.compare('<=', value)
+
+    def __gt__(self, value):
+        return self.compare('>', value)
+
+    def __ge__(self, value):
+        return self.compare('>=', value)
+
+    # Comparisons make filters, so fields cannot be in sets or dicts.
+    __hash__ = None
+
+    def contains(self, value):
+        """The field contains the text, ignoring case."""
+        return self.compare('~', value)
+
+    def does_not_contain(self, value):
+        """The field does not contain the text, ignoring case."""
+        return self.compare('!~', value)
+
+    def is_in(self, values):
+        """The field equals one of the values."""
+        if not values:
+            raise ValueError('A field cannot be in no values.')
+        return Filter.combine('OR', [self == value for value in values])
+
+    def ascending(self):
+        return ascending(self.name)
+
+    def descending(self):
+        return descending(self.name)
+
+
+def ascending(name):
+    """The sort parameter for a field, with the least value first."""
+    return name
+
+
+def descending(name):
+    """The sort parameter for a field, with the greatest value first."""
+    return '-{0}'.format(name)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for staying within the rate limits of the Bitbucket API.
+
+A token bucket holds up to a budget of requests for each credential,
+and is refilled at the rate of the budget over its window.
+When the bucket is empty, a request waits for its token
+instead of being throttled by Bitbucket.
+
+Classes:
+- TokenBucket: a budget of requests shared by the threads of a process
+- SQLiteTokenBucket: a budget of requests shared by the processes on a host
+- RateLimitedAdapter: wraps a transport adapter to take a token per request
+"""
+
+import time
+from hashlib import sha256
+from threading import Lock
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from pybitbucket.retry import RetryPolicy
+from pybitbucket.sqlite import Database
+
+
+class TokenBucket(object):
+    """
+    A budget of requests for each credential,
+    shared by the threads of a process.
+
+    A request that finds the bucket empty reserves a later token,
+    so waiting requests are served in order without polling.
+
+    The bucket also learns from the responses:
+    - X-RateLimit-Remaining lowers the tokens to what Bitbucket counts
+    - X-RateLimit-NearLimit lowers the tokens to a fifth of the budget
+    - 429 (Too Many Requests) empties the bucket
+        for as long as Retry-After asks
+
+    The buckets are kept for each principal, like the client ID
+    of an OAuth consumer, rather than for each token,
+    so that refreshing a token does not start a new budget.
+
+    :param budget: the number of requests allowed in each window.
+    :type budget: int
+    :param window: the length of a window, in seconds.
+    :type window: float
+    """
+    NEAR_LIMIT = 0.2
+
+    def __init__(self, budget=1000, window=3600, sleep=time.sleep):
+        self.budget = budget
+        self.window = window
+        self.sleep = sleep
+        self.buckets = {}
+        self.lock = Lock()
+
+    @property
+    def rate(self):
+        """The number of tokens added to a bucket each second."""
+        return float(self.budget) / self.window
+
+    def refilled(self, tokens, updated_at, now):
+        if tokens is None:
+            return float(self.budget)
+        return min(
+            float(self.budget),
+            tokens + (now - updated_at) * self.rate)
+
+    def update(self, key, change):
+        """
+        Change the tokens in the bucket for a key,
+        with a function of the refilled tokens,
+        and return the new tokens.
+        """
+        with self.lock:
+            now = time.time()
+            tokens, updated_at = self.buckets.get(key, (None, now))
+            tokens = change(self.refilled(tokens, updated_at, now))
+            self.buckets[key] = (tokens, now)
+            return tokens
+
+    def reserve(self, key):
+        """
+        Take a token from the bucket for a key,
+        and return how many seconds to wait before using it.
+        """
+        tokens = self.update(key, lambda tokens: tokens - 1)
+        return max(0.0, -tokens / self.rate)
+
+    def acquire(self, key):
+        """Take a token from the bucket for a key, waiting if need be."""
+        wait = self.reserve(key)
+        if wait:
+            self.sleep(wait)
+
+    def remaining(self, key):
+        """The number of requests that can be made now for a key."""
+        return max(0, int(self.update(key, lambda tokens: tokens)))
+
+    def observe(self, key, response):
+        """Adapt the bucket for a key to the rate limit a response reports."""
+        limit = None
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is not None:
+            try:
+                limit = float(remaining)
+            except ValueError:
+                pass
+        near_limit = response.headers.get('X-RateLimit-NearLimit')
+        if (near_limit or '').lower() == 'true':
+            limit = min(
+                self.budget * self.NEAR_LIMIT,
+                self.budget if limit is None else limit)
+        if response.status_code == 429:
+            retry_after = RetryPolicy.retry_after(response) or 0.0
+            limit = -retry_after * self.rate
+        if limit is not None:
+            self.update(key, lambda tokens: min(tokens, limit))
+
+    def mount(self, session, key):
+        """
+        Take a token for every request made with the session.
+
+        The adapters already mounted on the session are wrapped,
+        so that their retries, pools, and certificates are kept.
+
+        :param session: the session to limit.
+        :type session: requests.Session
+        :param key: returns the credential of a request.
+        :type key: callable
+        """
+        for prefix, adapter in list(session.adapters.items()):
+            if isinstance(adapter, RateLimitedAdapter):
+                adapter = adapter.adapter
+            session.mount(prefix, RateLimitedAdapter(self, key, adapter))
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    A budget of requests for each credential,
+    kept in a SQLite database so the processes on a host can share it.
+    The keys are hashed, so that no credential is written to disk.
+    """
+
+    schema = """
+        CREATE TABLE IF NOT EXISTS buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(
+            self,
+            path,
+            budget=1000,
+            window=3600,
+            sleep=time.sleep,
+            timeout=30):
+        super(SQLiteTokenBucket, self).__init__(
+            budget=budget,
+            window=window,
+            sleep=sleep)
+        self.database = Database(path, schema=self.schema, timeout=timeout)
+
+    @staticmethod
+    def hashed(key):
+        return sha256(key.encode('utf-8')).hexdigest()[:32]
+
+    def update(self, key, change):
+        key = self.hashed(key)
+        with self.database.transaction() as connection:
+            now = time.time()
+            row = connection.execute(
+                'SELECT tokens, updated_at FROM buckets WHERE key = ?',
+                (key,)).fetchone()
+            tokens, updated_at = row or (None, now)
+            tokens = change(self.refilled(tokens, updated_at, now))
+            connection.execute(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated_at)'
+                ' VALUES (?, ?, ?)',
+                (key, tokens, now))
+            return tokens
+
+    def close(self):
+        self.database.close()
+
+
+class RateLimitedAdapter(BaseAdapter):
+    """
+    A transport adapter that takes a token from a bucket
+    before another adapter sends each request,
+    and adapts the bucket to the rate limit of each response.
+
+    :param adapter: the adapter that sends the requests.
+        If not provided, uses a new HTTPAdapter.
+    :type adapter: requests.adapters.BaseAdapter
+    """
+
+    def __init__(self, bucket, key, adapter=None):
+        super(RateLimitedAdapter, self).__init__()
+        self.bucket = bucket
+        self.key = key
+        self.adapter = adapter or HTTPAdapter()
+
+    def __getattr__(self, name):
+        # Settings like max_retries are those of the wrapped adapter.
+        if name == 'adapter':
+            raise AttributeError(name)
+        return getattr(self.adapter, name)
+
+    def send(self, request, **kwargs):
+        key = self.key()
+        self.bucket.acquire(key)
+        response = self.adapter.send(request, **kwargs)
+        self.bucket.observe(key, response)
+        return response
+
+    def close(self):
+        self.adapter.close()
@@ -11,7 +11,7 @@ Classes:
 - Tag: represents the tag resource that references a specific commit
 - Branch: represents the branch resource that references a set of commits
 """
-from pybitbucket.bitbucket import Bitbucket, BitbucketBase, Client
+from pybitbucket.bitbucket import BitbucketBase, Client
 
 
 class Ref(BitbucketBase):
@@ -26,14 +26,23 @@ class Ref(BitbucketBase):
     def find_refs_in_repository(
             owner,
             repository_name,
-            client=Client()):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding refs in a repository.
         The method is a generator Ref subtypes of Tag and Branch.
         """
-        return Bitbucket(client=client).repositoryRefs(
+        client = client or Client()
+        return client.root.repositoryRefs(
             owner=owner,
-            repository_name=repository_name)
+            repository_name=repository_name,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields)
 
 
 class Tag(Ref):
@@ -47,33 +56,51 @@ class Tag(Ref):
     def find_tags_in_repository(
             repository_name,
             owner=None,
-            client=Client()):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None,
+            q=None,
+            sort=None):
         """
         A convenience method for finding tags in a repository.
         The method is a generator Tag objects.
         """
+        client = client or Client()
         owner = owner or client.get_username()
-        return Bitbucket(client=client).repositoryTags(
+        return client.root.repositoryTags(
             owner=owner,
-            repository_name=repository_name)
+            repository_name=repository_name,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields,
+            q=q,
+            sort=sort)
 
     @staticmethod
     def find_tag_by_ref_name_in_repository(
             ref_name,
             repository_name,
             owner=None,
-            client=Client()):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific tag.
         In contrast to the pure hypermedia driven method on the Bitbucket
         class, this method returns a Tag object, instead of the
         generator.
         """
+        client = client or Client()
         owner = owner or client.get_username()
-        return next(Bitbucket(client=client).repositoryTagByName(
+        return client.first(client.root.repositoryTagByName(
             owner=owner,
             repository_name=repository_name,
-            ref_name=ref_name))
+            ref_name=ref_name,
+            raw=raw,
+            fields=fields))
 
 
 class Branch(Ref):
@@ -87,33 +114,51 @@ class Branch(Ref):
     def find_branches_in_repository(
             repository_name,
             owner=None,
-            client=Client()):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None,
+            q=None,
+            sort=None):
         """
         A convenience method for finding branches in a repository.
         The method is a generator Branch objects.
         """
+        client = client or Client()
         owner = owner or client.get_username()
-        return Bitbucket(client=client).repositoryBranches(
+        return client.root.repositoryBranches(
             owner=owner,
-            repository_name=repository_name)
+            repository_name=repository_name,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields,
+            q=q,
+            sort=sort)
 
     @staticmethod
     def find_branch_by_ref_name_in_repository(
             ref_name,
             repository_name,
             owner=None,
-            client=Client()):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific branch.
         In contrast to the pure hypermedia driven method on the Bitbucket
         class, this method returns a Branch object, instead of the
         generator.
         """
+        client = client or Client()
         owner = owner or client.get_username()
-        return next(Bitbucket(client=client).repositoryBranchByName(
+        return client.first(client.root.repositoryBranchByName(
             owner=owner,
             repository_name=repository_name,
-            ref_name=ref_name))
+            ref_name=ref_name,
+            raw=raw,
+            fields=fields))
 
 
 Client.bitbucket_types.add(Ref)
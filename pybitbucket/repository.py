@@ -19,7 +19,7 @@ from uritemplate import expand
 from voluptuous import Schema, Required, Optional, In
 
 from pybitbucket.bitbucket import (
-    Bitbucket, BitbucketBase, Client, PayloadBuilder, RepositoryType, Enum)
+    BitbucketBase, Client, PayloadBuilder, RepositoryType, Enum)
 from pybitbucket.user import User
 
 
@@ -168,8 +168,12 @@ class Repository(BitbucketBase):
                 for clone_method
                 in data['links']['clone']}
         # Some relationships are only available via the 1.0 API.
-        # Create a "mock" RepositoryV1 for those links.
-        self.v1 = RepositoryV1(data, client)
+        # A "mock" RepositoryV1 for those links is built when first used.
+        self.defer(
+            'v1',
+            lambda repository, name: RepositoryV1(
+                repository.data,
+                repository.client))
 
     @classmethod
     def create(
@@ -251,7 +255,9 @@ class Repository(BitbucketBase):
     def find_repository_by_name_and_owner(
             repository_name,
             owner=None,
-            client=None):
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific repository.
         In contrast to the pure hypermedia driven method on the Bitbucket
@@ -267,18 +273,30 @@ class Repository(BitbucketBase):
         :param client: the configured connection to Bitbucket.
             If not provided, assumes an Anonymous connection.
         :type client: bitbucket.Client
+        :param raw: whether to give the decoded json
+            instead of the resource made from it.
+        :type raw: bool
+        :param fields: the fields to include or exclude from the response,
+            as for Client.remote_relationship.
+        :type fields: str or list
         :returns: the specific repository object.
         :rtype: Repository
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return next(
-            Bitbucket(client=client).repositoryByOwnerAndRepositoryName(
+        return client.first(
+            client.root.repositoryByOwnerAndRepositoryName(
                 owner=owner,
-                repository_name=repository_name))
+                repository_name=repository_name,
+                raw=raw,
+                fields=fields))
 
     @staticmethod
-    def find_repository_by_full_name(full_name, client=None):
+    def find_repository_by_full_name(
+            full_name,
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific repository.
         In contrast to the pure hypermedia driven method on the Bitbucket
@@ -291,6 +309,12 @@ class Repository(BitbucketBase):
         :param client: the configured connection to Bitbucket.
             If not provided, assumes an Anonymous connection.
         :type client: bitbucket.Client
+        :param raw: whether to give the decoded json
+            instead of the resource made from it.
+        :type raw: bool
+        :param fields: the fields to include or exclude from the response,
+            as for Client.remote_relationship.
+        :type fields: str or list
         :returns: the specific repository object.
         :rtype: Repository
         :raises: TypeError
@@ -303,10 +327,19 @@ class Repository(BitbucketBase):
         return Repository.find_repository_by_name_and_owner(
             owner=owner,
             repository_name=repository_name,
-            client=client)
+            client=client,
+            raw=raw,
+            fields=fields)
 
     @staticmethod
-    def find_public_repositories(client=None):
+    def find_public_repositories(
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None,
+            q=None,
+            sort=None):
         """
         A convenience method for finding public repositories.
         The method is a generator Repository objects.
@@ -314,17 +347,47 @@ class Repository(BitbucketBase):
         :param client: the configured connection to Bitbucket.
             If not provided, assumes an Anonymous connection.
         :type client: bitbucket.Client
+        :param pagelen: the number of repositories to fetch on each page.
+            If not provided, uses the pagelen setting of the client.
+        :type pagelen: int
+        :param max_items: the most repositories to return.
+            If not provided, returns all of them.
+        :type max_items: int
+        :param raw: whether to give the decoded json
+            instead of the resources made from it.
+        :type raw: bool
+        :param fields: the fields to include or exclude from the response,
+            as for Client.remote_relationship.
+        :type fields: str or list
+        :param q: the filter that the repositories must match,
+            applied by Bitbucket, as for Client.remote_relationship.
+        :type q: query.Filter or str
+        :param sort: the field to order the repositories by,
+            with a - prefix for descending order.
+        :type sort: str
         :returns: an iterator over all public repositories.
         :rtype: iterator
         """
         client = client or Client()
-        return Bitbucket(client=client).repositoriesThatArePublic()
+        return client.root.repositoriesThatArePublic(
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields,
+            q=q,
+            sort=sort)
 
     @staticmethod
     def find_repositories_by_owner_and_role(
             owner=None,
             role=RepositoryRole.OWNER,
-            client=None):
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None,
+            q=None,
+            sort=None):
         """
         A convenience method for finding a user's repositories.
         The method is a generator Repository objects.
@@ -335,19 +398,46 @@ class Repository(BitbucketBase):
         :type owner: str
         :param role: the role of the current user on the repositories.
             If not provided, assumes the relationship owner.
+            If None, finds every repository of the owner
+            that the current user can see.
         :type role: RepositoryRole
         :param client: the configured connection to Bitbucket.
             If not provided, assumes an Anonymous connection.
         :type client: bitbucket.Client
+        :param pagelen: the number of repositories to fetch on each page.
+            If not provided, uses the pagelen setting of the client.
+        :type pagelen: int
+        :param max_items: the most repositories to return.
+            If not provided, returns all of them.
+        :type max_items: int
+        :param raw: whether to give the decoded json
+            instead of the resources made from it.
+        :type raw: bool
+        :param fields: the fields to include or exclude from the response,
+            as for Client.remote_relationship.
+        :type fields: str or list
+        :param q: the filter that the repositories must match,
+            applied by Bitbucket, as for Client.remote_relationship.
+        :type q: query.Filter or str
+        :param sort: the field to order the repositories by,
+            with a - prefix for descending order.
+        :type sort: str
         :returns: an iterator over all public repositories.
         :rtype: iterator
         """
         client = client or Client()
         owner = owner or client.get_username()
-        RepositoryRole(role)
-        return Bitbucket(client=client).repositoriesByOwnerAndRole(
+        if role is not None:
+            role = RepositoryRole(role).value
+        return client.root.repositoriesByOwnerAndRole(
             owner=owner,
-            role=role)
+            role=role,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields,
+            q=q,
+            sort=sort)
 
 
 class RepositoryAdapter(object):
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for retrying requests that Bitbucket could not answer.
+
+Responses like 429 (Too Many Requests) and 503 (Service Unavailable),
+and connection errors, are often over after a short wait.
+A retry policy waits longer after each attempt, with random jitter,
+unless the response says how long to wait with Retry-After.
+
+Classes:
+- RetryPolicy: when and how long to wait before trying a request again
+"""
+
+import random
+import time
+from calendar import timegm
+from email.utils import parsedate
+
+from requests.exceptions import ConnectionError, Timeout
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before trying a request again.
+
+    Only idempotent methods are retried by default,
+    because a POST that timed out may still have been applied.
+
+    :param max_retries: the most times to retry a request.
+    :type max_retries: int
+    :param backoff_factor: the longest wait, in seconds, before the first
+        retry. The longest wait doubles with every retry.
+        The actual wait is a random time up to the longest wait.
+    :type backoff_factor: float
+    :param max_backoff: the longest wait, in seconds, between attempts
+        when the response does not give a Retry-After.
+    :type max_backoff: float
+    :param max_retry_after: the longest Retry-After, in seconds,
+        that is worth waiting for. When Bitbucket asks for a longer wait,
+        the response is returned as it is.
+    :type max_retry_after: float
+    :param statuses: the status codes of responses worth retrying.
+    :type statuses: iterable
+    :param methods: the HTTP methods that are retried.
+    :type methods: iterable
+    """
+    IDEMPOTENT_METHODS = frozenset(
+        ['DELETE', 'GET', 'HEAD', 'OPTIONS', 'PUT', 'TRACE'])
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(
+            self,
+            max_retries=5,
+            backoff_factor=0.5,
+            max_backoff=60,
+            max_retry_after=300,
+            statuses=RETRY_STATUSES,
+            methods=IDEMPOTENT_METHODS,
+            sleep=time.sleep):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(m.upper() for m in methods)
+        self.sleep = sleep
+
+    @staticmethod
+    def retry_after(response):
+        """
+        The number of seconds to wait given by the Retry-After header,
+        as either seconds or an HTTP date, or None.
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        parsed = parsedate(value)
+        if parsed is None:
+            return None
+        return max(0.0, timegm(parsed) - time.time())
+
+    def backoff(self, retry):
+        """A random wait before the retry, which counts from 0."""
+        longest = min(self.max_backoff, self.backoff_factor * (2 ** retry))
+        return random.uniform(0, longest)
+
+    def wait_before_retry(self, method, retry, response=None):
+        """
+        How long to wait before the retry, which counts from 0,
+        of a request that got the response, or None to give up.
+        The response is None when the request raised an error.
+        """
+        if (method.upper() not in self.methods) or \
+                (retry >= self.max_retries):
+            return None
+        if response is None:
+            return self.backoff(retry)
+        if response.status_code not in self.statuses:
+            return None
+        retry_after = self.retry_after(response)
+        if retry_after is None:
+            return self.backoff(retry)
+        if retry_after > self.max_retry_after:
+            return None
+        return retry_after
+
+    def call(self, method, request):
+        """
+        Make a request, retrying it while the policy allows.
+
+        :param method: the HTTP method of the request.
+        :type method: str
+        :param request: makes the request and returns its response.
+        :type request: callable
+        :returns: the last response.
+        """
+        retry = 0
+        while True:
+            try:
+                response = request()
+            except (ConnectionError, Timeout):
+                wait = self.wait_before_retry(method, retry)
+                if wait is None:
+                    raise
+            else:
+                wait = self.wait_before_retry(method, retry, response)
+                if wait is None:
+                    return response
+                # A streamed response holds its connection until closed.
+                response.close()
+            self.sleep(wait)
+            retry += 1
@@ -11,17 +11,27 @@ Classes:
 - Snippet: represents a snippet
 """
 
+import os
+from functools import partial
+
 from uritemplate import expand
 from voluptuous import Schema, Optional, In
 
 from pybitbucket.bitbucket import (
-    Bitbucket, BitbucketBase, Client, PayloadBuilder, RepositoryType, Enum)
+    BitbucketBase, Client, PayloadBuilder, RepositoryType,
+    Enum)
+from pybitbucket.multipart import LazyFile
 
 
 def open_files(filelist):
+    """
+    The files to upload to a snippet.
+    Each file is only opened while it is being uploaded,
+    and is closed once it has been sent.
+    """
     files = []
     for filename in filelist:
-        files.append(('file', (filename, open(filename, 'rb'))))
+        files.append(('file', (filename, LazyFile(filename))))
     return files
 
 
@@ -92,47 +102,56 @@ class Snippet(BitbucketBase):
 
     @staticmethod
     def is_type(data):
+        return (Snippet.has_v2_self_url(data))
+
+    @classmethod
+    def has_v2_self_url(cls, data, url_path=None):
         # Snippet URLs look like this:
         # https://api.bitbucket.org/2.0/snippets/pybitbucket/Xqoz8
         # Which doesn't follow the pattern of:
         # resource_type/id_attribute
-        # So we can't use `has_v2_self_url` to categorize.
-        if (
-                (data.get('links') is None) or
-                (data['links'].get('self') is None) or
-                (data['links']['self'].get('href') is None) or
-                (data.get(Snippet.id_attribute) is None)):
+        # So we can't use the base categorization.
+        if url_path is None:
+            url_path = cls.self_url_path(data)
+        if (url_path is None) or (data.get(cls.id_attribute) is None):
             return False
         # Since the structure is right, assume it is v2.
         is_v2 = True
-        url_path = data['links']['self']['href'].split('/')
         # Start looking from the end of the path.
         position = -1
-        is_v2 = is_v2 and (data[Snippet.id_attribute] == url_path[position])
+        is_v2 = is_v2 and (data[cls.id_attribute] == url_path[position])
         # After matching the id_attribute,
         # skip a position for the account name.
         # The resource_type should be the preceding part of the path.
         position -= 2
-        is_v2 = (Snippet.resource_type == url_path[position])
+        is_v2 = (cls.resource_type == url_path[position])
         return is_v2
 
-    def __init__(self, data, client=Client()):
+    def __init__(self, data, client=None):
+        client = client or Client()
         super(Snippet, self).__init__(data, client=client)
         if data.get('files'):
             self.filenames = [str(f) for f in data['files']]
         # TODO: Snippet has patch & diff links but I don't know what they do.
 
     @classmethod
-    def create(cls, files, payload=None, client=None):
+    def create(cls, files, payload=None, client=None, progress=None):
         """Create a new snippet.
 
-        :param files:
-        :type files:
+        The files are streamed from disk as they are uploaded,
+        so uploading large files takes little memory.
+
+        :param files: the files of the new snippet,
+            as paths or as made by open_files.
+        :type files: list
         :param payload: the options for creating the new snippet.
         :type payload: SnippetPayload
         :param client: the configured connection to Bitbucket.
             If not provided, assumes an Anonymous connection.
         :type client: bitbucket.Client
+        :param progress: called with the bytes uploaded so far
+            and the size of the upload, as the upload goes on.
+        :type progress: callable
         :returns: the new build status object.
         :rtype: BuildStatus
         :raises: ValueError
@@ -144,33 +163,159 @@ class Snippet(BitbucketBase):
             cls.templates['create'], {
                 'bitbucket_url': client.get_bitbucket_url(),
             })
-        return cls.post(api_url, json=json, files=files, client=client)
-
-    def modify(self, files=None, payload=None):
+        return cls.post(
+            api_url,
+            json=json,
+            files=files,
+            client=client,
+            **cls.progress_option(progress))
+
+    def modify(self, files=None, payload=None, progress=None):
         """
         A convenience method for changing the current snippet.
         The parameters make it easier to know what can be changed
         and allow references with file names instead of File objects.
+        Files are streamed from disk as they are uploaded,
+        and progress is called as for create.
         """
         files = files or open_files([])
         payload = payload or SnippetPayload()
         json = payload.validate().build()
-        return self.put(json=json, files=files)
+        return self.put(
+            json=json,
+            files=files,
+            **self.progress_option(progress))
+
+    @staticmethod
+    def progress_option(progress):
+        # Only a client that streams uploads takes a progress option.
+        return {} if progress is None else {'progress': progress}
+
+    def file_url(self, filename):
+        """
+        The URL of the contents of a file on a snippet,
+        or None if the filename is not on the snippet.
+        """
+        files = self.data.get('files') or {}
+        if not files.get(filename):
+            return
+        return files[filename]['links']['self']['href']
 
     def content(self, filename):
         """
         A method for obtaining the contents of a file on a snippet.
         If the filename is not on the snippet, no content is returned.
         """
-        if not self.files.get(filename):
+        url = self.file_url(filename)
+        if url is None:
+            return
+        return self.client.get_content(url)
+
+    def stream(self, filename, chunk_size=None):
+        """
+        Generate the contents of a file on a snippet in chunks,
+        as they arrive, without holding all of them in memory.
+        If the filename is not on the snippet, no content is returned.
+
+        :param filename: the name of the file on the snippet.
+        :type filename: str
+        :param chunk_size: the most bytes in a chunk.
+        :type chunk_size: int
+        :rtype: iterator of bytes
+        """
+        url = self.file_url(filename)
+        if url is None:
+            return
+        return self.client.stream_content(url, chunk_size=chunk_size)
+
+    def download(self, filename, destination):
+        """
+        Write the contents of a file on a snippet to a destination,
+        one chunk at a time, as they arrive.
+        If the filename is not on the snippet, nothing is written.
+
+        :param filename: the name of the file on the snippet.
+        :type filename: str
+        :param destination: a path, a file object open for writing,
+            or a writable buffer, like a bytearray or a memoryview.
+        :returns: the number of bytes written.
+        :rtype: int
+        """
+        url = self.file_url(filename)
+        if url is None:
             return
-        url = self.files[filename]['links']['self']['href']
-        response = self.client.session.get(url)
-        Client.expect_ok(response)
-        return response.content
+        return self.client.download(url, destination)
+
+    def download_all(self, directory, filenames=None, max_workers=8):
+        """
+        Write the files of a snippet to a directory concurrently,
+        and generate the result for each as it is written.
+
+        An error writing one file is kept in its result
+        instead of being raised, so the rest go on.
+
+        :param directory: where to write the files,
+            each at its filename, relative to the directory.
+            A filename that is absolute or that goes up with ..
+            is not written, and has an error in its result.
+        :type directory: str
+        :param filenames: the files to write.
+            If not provided, writes every file of the snippet,
+            getting the snippet again if it was found without them,
+            which needs a Client rather than an AsyncClient.
+        :type filenames: list of str
+        :param max_workers: the most files to write at once.
+        :type max_workers: int
+        :returns: the results, with the path of each file written.
+        :rtype: iterator of bitbucket.FetchResult
+        """
+        snippet = self
+        if 'files' not in self.data:
+            snippet = self.client.first(self.self())
+        if filenames is None:
+            filenames = list(snippet.data.get('files') or {})
+        downloads = []
+        for filename in filenames:
+            url = snippet.file_url(filename)
+            if url is not None:
+                downloads.append(
+                    (url, partial(self.destination, directory, filename)))
+        return self.client.download_many(downloads, max_workers=max_workers)
+
+    @staticmethod
+    def destination(directory, filename):
+        """
+        The path in a directory to write a file of a snippet to,
+        making the directories on the way there.
+
+        :raises: ValueError when the filename is absolute
+            or goes up out of the directory.
+        """
+        parts = filename.replace('\\', '/').split('/')
+        if os.path.isabs(filename) or (not parts[0]) or ('..' in parts):
+            raise ValueError(
+                'The snippet file {0} is outside of the directory.'.format(
+                    filename))
+        path = os.path.join(
+            directory, *[p for p in parts if p not in ('', '.')])
+        parent = os.path.dirname(path)
+        if not os.path.isdir(parent):
+            try:
+                os.makedirs(parent)
+            except OSError:
+                # Another download made it first.
+                if not os.path.isdir(parent):
+                    raise
+        return path
 
     @staticmethod
-    def find_snippets_for_role(role=SnippetRole.OWNER, client=None):
+    def find_snippets_for_role(
+            role=SnippetRole.OWNER,
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding snippets by the user's role.
         The method is a generator Snippet objects.
@@ -181,15 +326,37 @@ class Snippet(BitbucketBase):
         :param client: the configured connection to Bitbucket.
             If not provided, assumes an Anonymous connection.
         :type client: bitbucket.Client
+        :param pagelen: the number of snippets to fetch on each page.
+            If not provided, uses the pagelen setting of the client.
+        :type pagelen: int
+        :param max_items: the most snippets to return.
+            If not provided, returns all of them.
+        :type max_items: int
+        :param raw: whether to give the decoded json
+            instead of the resources made from it.
+        :type raw: bool
+        :param fields: the fields to include or exclude from the response,
+            as for Client.remote_relationship.
+        :type fields: str or list
         :returns: an iterator over the selected snippets.
         :rtype: iterator
         """
         client = client or Client()
         SnippetRole(role)
-        return Bitbucket(client=client).snippetsForRole(role=role)
+        return client.root.snippetsForRole(
+            role=role,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields)
 
     @staticmethod
-    def find_snippet_by_id_and_owner(id, owner=None, client=None):
+    def find_snippet_by_id_and_owner(
+            id,
+            owner=None,
+            client=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding a specific snippet.
         In contrast to the pure hypermedia driven method on the Bitbucket
@@ -204,14 +371,22 @@ class Snippet(BitbucketBase):
         :param client: the configured connection to Bitbucket.
             If not provided, assumes an Anonymous connection.
         :type client: bitbucket.Client
+        :param raw: whether to give the decoded json
+            instead of the resource made from it.
+        :type raw: bool
+        :param fields: the fields to include or exclude from the response,
+            as for Client.remote_relationship.
+        :type fields: str or list
         :returns: the snippet referenced by the id.
         :rtype: bitbucket.Snippet
         """
         client = client or Client()
         owner = owner or client.get_username()
-        return next(Bitbucket(client=client).snippetByOwnerAndSnippetId(
+        return client.first(client.root.snippetByOwnerAndSnippetId(
             owner=owner,
-            snippet_id=id))
+            snippet_id=id,
+            raw=raw,
+            fields=fields))
 
 
 Client.bitbucket_types.add(Snippet)
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Helpers for keeping state in SQLite databases shared by many processes.
+
+Classes:
+- Connection: a SQLite connection that can be weakly referenced
+- Database: a SQLite database in WAL mode, with one connection per thread
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from threading import Lock, local
+from weakref import WeakSet
+
+
+class Connection(sqlite3.Connection):
+    """
+    A SQLite connection, which unlike the built-in one
+    can be weakly referenced.
+    """
+
+
+class Database(object):
+    """
+    A SQLite database in WAL mode,
+    so that readers and a writer in different processes
+    do not block each other.
+    Each thread uses its own connection, which is in autocommit mode,
+    with transactions for the writes that must happen together.
+    The connection of a thread is closed when the thread ends,
+    or when the database is closed.
+    """
+
+    def __init__(self, path, schema='', timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self.local = local()
+        # The open connections of every thread, for close.
+        self.connections = WeakSet()
+        self.lock = Lock()
+        if schema:
+            self.connection.executescript(schema)
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or connection not in self.connections:
+            # Only this thread uses it, but close may be called
+            # from another thread.
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+                factory=Connection)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with self.lock:
+                self.connections.add(connection)
+            self.local.connection = connection
+        return connection
+
+    def execute(self, sql, parameters=()):
+        return self.connection.execute(sql, parameters)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Hold the write lock of the database, so that
+        what is read in the transaction cannot change before it commits.
+        """
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def close(self):
+        """
+        Close the connections of every thread,
+        which must not be in use.
+        A thread that uses the database again opens a new connection.
+        """
+        with self.lock:
+            connections = list(self.connections)
+            self.connections.clear()
+        for connection in connections:
+            connection.close()
+        self.local.connection = None
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+"""
+Classes for reading large responses as they arrive,
+instead of holding all of them in memory at once.
+
+Classes:
+- ValuesParser: parses the items of a page of a 2.0 collection
+    one at a time from the text of the page
+- DiffHunk: a hunk of the diff of a file
+- FileDiff: the diff of one file in a unified diff
+- DiffParser: parses a unified diff one file at a time
+
+Functions:
+- parse_diff: generates the files of a unified diff from its chunks
+"""
+
+import re
+from codecs import getincrementaldecoder
+from collections import namedtuple
+from json import JSONDecoder
+
+
+class ValuesParser(object):
+    """
+    Parse a page of a 2.0 collection incrementally,
+    giving each item of its values as soon as the item is complete.
+
+    Only the text of the item being parsed is held,
+    so parsing a page takes about as much memory as its largest item,
+    instead of the whole page and every item decoded from it.
+    The rest of the page, like next, page, and size,
+    is kept apart and decoded once the page is complete,
+    with an empty list for its values.
+
+    The items of values must be objects or arrays,
+    as they are in every collection of the 2.0 API.
+    They are decoded with the json module,
+    whose decoder also finds where each of them ends.
+    """
+
+    # Outside values, only brackets and strings change the state.
+    # A whole string is skipped at once, or else its opening quote
+    # when the rest of it has not arrived yet.
+    TOKENS = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}"]')
+    # Inside strings, only quotes and escapes do.
+    STRING_TOKENS = re.compile(r'["\\]')
+    VALUES_KEY = re.compile(r'"values"\s*:\s*$')
+    SEPARATORS = re.compile(r'[\s,]*')
+
+    def __init__(self):
+        self.decoder = getincrementaldecoder('utf-8')()
+        self.json_decoder = JSONDecoder()
+        self.buffer = ''
+        self.depth = 0
+        self.in_string = False
+        self.in_values = False
+        # How long the text of an incomplete item must grow
+        # before decoding it is tried again.
+        self.retry_length = 0
+        self.page = ''
+        self.kept = 0
+
+    def feed(self, chunk, final=False):
+        """
+        Parse the next chunk of the page,
+        and return the items that it completes.
+
+        :param chunk: the next bytes or text of the page.
+        :param final: whether this is the last chunk of the page.
+        :type final: bool
+        :returns: the decoded items.
+        :rtype: list
+        """
+        if isinstance(chunk, bytes):
+            chunk = self.decoder.decode(chunk, final)
+        buffer = self.buffer + chunk
+        i = 0
+        # The start of the text that belongs to the page, not to values.
+        self.kept = 0
+        items = []
+        more = True
+        while more:
+            if self.in_values:
+                i, more = self.read_item(buffer, i, final, items)
+            elif self.in_string:
+                i, more = self.skip_string(buffer, i)
+            else:
+                i, more = self.read_token(buffer, i)
+        if not self.in_values:
+            self.page += buffer[self.kept:i]
+        self.buffer = buffer[i:]
+        return items
+
+    # Each step of the parse returns where the next one starts,
+    # and whether it can be taken before the next chunk has arrived.
+
+    def read_item(self, buffer, i, final, items):
+        """Decode the next item of values, or leave values at its end."""
+        i = self.SEPARATORS.match(buffer, i).end()
+        if i == len(buffer):
+            return i, False
+        if buffer[i] == ']':
+            self.in_values = False
+            self.depth -= 1
+            self.kept = i
+            return i + 1, True
+        if len(buffer) - i < self.retry_length and not final:
+            return i, False
+        try:
+            item, i = self.json_decoder.raw_decode(buffer, i)
+        except ValueError:
+            # Wait until the item has arrived, trying again
+            # each time its text doubles, so that a large item
+            # is not decoded from the start for every chunk.
+            self.retry_length = 2 * (len(buffer) - i)
+            return i, False
+        self.retry_length = 0
+        items.append(item)
+        return i, True
+
+    def skip_string(self, buffer, i):
+        """Skip to the end of a string of the page."""
+        m = self.STRING_TOKENS.search(buffer, i)
+        if m is None:
+            return len(buffer), False
+        if m.group() == '\\':
+            return self.skip_escape(buffer, m)
+        self.in_string = False
+        return m.end(), True
+
+    @staticmethod
+    def skip_escape(buffer, m):
+        """Skip an escape in a string, with the character it escapes."""
+        if m.end() == len(buffer):
+            # Wait for the character that is escaped.
+            return m.start(), False
+        return m.end() + 1, True
+
+    def read_token(self, buffer, i):
+        """Follow the next string or bracket of the page."""
+        m = self.TOKENS.search(buffer, i)
+        if m is None:
+            return len(buffer), False
+        token = m.group()
+        if token[0] == '"':
+            self.in_string = len(token) == 1
+        elif token in '{[':
+            self.open_bracket(buffer, m)
+        else:
+            self.depth -= 1
+        return m.end(), True
+
+    def open_bracket(self, buffer, m):
+        """Go one level deeper, into values if this bracket opens it."""
+        if (m.group() == '[' and self.depth == 1 and
+                self.VALUES_KEY.search(
+                    self.page + buffer[self.kept:m.start()])):
+            self.page += buffer[self.kept:m.end()]
+            self.in_values = True
+        self.depth += 1
+
+    def close(self):
+        """
+        Finish parsing the page, after its final chunk,
+        and return the rest of it with an empty list for its values.
+        """
+        if self.in_values or self.buffer:
+            raise ValueError('The page ended before its values did.')
+        return self.json_decoder.decode(self.page)
+
+
+class DiffHunk(namedtuple('DiffHunk', [
+        'header', 'old_start', 'old_lines', 'new_start', 'new_lines',
+        'lines'])):
+    """
+    A hunk of the diff of a file: its @@ header, the ranges of lines
+    it covers in the old and new file, and its lines,
+    each starting with '+', '-', ' ', or '\\'.
+    """
+
+    @property
+    def added(self):
+        return sum(1 for line in self.lines if line.startswith('+'))
+
+    @property
+    def removed(self):
+        return sum(1 for line in self.lines if line.startswith('-'))
+
+
+class FileDiff(object):
+    """
+    The diff of one file in a unified diff, as made by git.
+
+    :ivar old_path: the path before the change, or None for a new file.
+    :ivar new_path: the path after the change, or None for a deleted file.
+    :ivar header: the lines from diff --git up to the first hunk.
+    :ivar hunks: the hunks of the diff.
+    :ivar added: the number of lines added.
+    :ivar removed: the number of lines removed.
+    """
+
+    def __init__(self, old_path, new_path):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.header = []
+        self.hunks = []
+        self.added = 0
+        self.removed = 0
+
+    @property
+    def path(self):
+        """The path after the change, or before it for a deleted file."""
+        return self.new_path or self.old_path
+
+    @property
+    def is_binary(self):
+        return any(line.startswith('Binary files') for line in self.header)
+
+    def __repr__(self):
+        return '<FileDiff {0} +{1} -{2}>'.format(
+            self.path, self.added, self.removed)
+
+
+class DiffParser(object):
+    """
+    Parse a unified diff incrementally,
+    giving the diff of each file as soon as the next one starts.
+    Only the diff of the file being parsed is held.
+    """
+
+    FILE_START = re.compile(r'^diff --git a/(.*) b/(.*)$')
+    HUNK_START = re.compile(
+        r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+    def __init__(self):
+        self.decoder = getincrementaldecoder('utf-8')(errors='replace')
+        self.buffer = ''
+        self.file = None
+        self.hunk = None
+        # The lines left in the old and new file of the current hunk.
+        self.old_left = self.new_left = 0
+
+    @staticmethod
+    def path_from(line):
+        path = line[4:].split('\t')[0]
+        if path == '/dev/null':
+            return None
+        if path[:2] in ('a/', 'b/'):
+            return path[2:]
+        return path
+
+    def feed(self, chunk, final=False):
+        """
+        Parse the next chunk of the diff,
+        and return the diffs of the files that it completes.
+
+        :param chunk: the next bytes of the diff.
+        :param final: whether this is the last chunk of the diff.
+        :type final: bool
+        :returns: the diffs of the files.
+        :rtype: list of FileDiff
+        """
+        lines = (self.buffer + self.decoder.decode(chunk, final)).split('\n')
+        # The last line is incomplete, or empty after the final newline.
+        self.buffer = lines.pop()
+        if final and self.buffer:
+            lines.append(self.buffer)
+            self.buffer = ''
+        files = []
+        for line in lines:
+            done = self.parse_line(line)
+            if done is not None:
+                files.append(done)
+        if final and self.file is not None:
+            files.append(self.file)
+            self.file = None
+        return files
+
+    def parse_line(self, line):
+        """Parse a line, returning the diff of a file it completes."""
+        if self.old_left > 0 or self.new_left > 0:
+            self.parse_hunk_line(line)
+            return None
+        done = None
+        match = self.FILE_START.match(line)
+        if match is not None:
+            done = self.file
+            self.file = FileDiff(*match.groups())
+            self.hunk = None
+        if self.file is None:
+            return None
+        match = self.HUNK_START.match(line)
+        if match is not None:
+            self.start_hunk(line, match)
+        elif self.hunk is not None and line.startswith('\\'):
+            # No newline at end of file, after the last line of a hunk.
+            self.hunk.lines.append(line)
+        else:
+            self.parse_header_line(line)
+        return done
+
+    def parse_hunk_line(self, line):
+        """Add a line to the current hunk, counting what it changes."""
+        self.hunk.lines.append(line)
+        if line.startswith('+'):
+            self.file.added += 1
+            self.new_left -= 1
+        elif line.startswith('-'):
+            self.file.removed += 1
+            self.old_left -= 1
+        elif not line.startswith('\\'):
+            self.old_left -= 1
+            self.new_left -= 1
+
+    def start_hunk(self, line, match):
+        """Start a hunk of the current file from its @@ header."""
+        old_start, old_lines, new_start, new_lines = match.groups()
+        self.hunk = DiffHunk(
+            line,
+            int(old_start),
+            int(1 if old_lines is None else old_lines),
+            int(new_start),
+            int(1 if new_lines is None else new_lines),
+            [])
+        self.old_left = self.hunk.old_lines
+        self.new_left = self.hunk.new_lines
+        self.file.hunks.append(self.hunk)
+
+    def parse_header_line(self, line):
+        """Add a line to the header of the current file, with its paths."""
+        self.file.header.append(line)
+        if line.startswith('--- '):
+            self.file.old_path = self.path_from(line)
+        elif line.startswith('+++ '):
+            self.file.new_path = self.path_from(line)
+        elif line.startswith('new file mode'):
+            self.file.old_path = None
+        elif line.startswith('deleted file mode'):
+            self.file.new_path = None
+        elif line.startswith('rename from '):
+            self.file.old_path = line[len('rename from '):]
+        elif line.startswith('rename to '):
+            self.file.new_path = line[len('rename to '):]
+
+
+def parse_diff(chunks):
+    """
+    Generate the diff of each file of a unified diff,
+    as soon as the diff of the next file starts.
+
+    :param chunks: the bytes of the diff, in chunks of any size.
+    :type chunks: iterable
+    :returns: the diffs of the files.
+    :rtype: iterator of FileDiff
+    """
+    parser = DiffParser()
+    for chunk in chunks:
+        for file_diff in parser.feed(chunk):
+            yield file_diff
+    for file_diff in parser.feed(b'', final=True):
+        yield file_diff
@@ -6,7 +6,7 @@ from __future__ import unicode_literals
 Provides a class for manipulating Team resources on Bitbucket.
 """
 
-from pybitbucket.bitbucket import Bitbucket, BitbucketBase, Client, Enum
+from pybitbucket.bitbucket import BitbucketBase, Client, Enum
 
 
 class TeamRole(Enum):
@@ -24,24 +24,39 @@ class Team(BitbucketBase):
         return (Team.has_v2_self_url(data))
 
     @staticmethod
-    def find_teams_for_role(role=TeamRole.ADMIN, client=Client()):
+    def find_teams_for_role(
+            role=TeamRole.ADMIN,
+            client=None,
+            pagelen=None,
+            max_items=None,
+            raw=False,
+            fields=None):
         """
         A convenience method for finding teams by the user's role.
         The method is a generator Team objects.
         """
+        client = client or Client()
         TeamRole(role)
-        return Bitbucket(client=client).teamsForRole(role=role)
+        return client.root.teamsForRole(
+            role=role,
+            pagelen=pagelen,
+            max_items=max_items,
+            raw=raw,
+            fields=fields)
 
     @staticmethod
-    def find_team_by_username(username, client=Client()):
+    def find_team_by_username(username, client=None, raw=False, fields=None):
         """
         A convenience method for finding a specific team.
         In contrast to the pure hypermedia driven method on the Bitbucket
         class, this method returns a User object, instead of the
         generator.
         """
-        return next(Bitbucket(client=client).teamByUsername(
-            username=username))
+        client = client or Client()
+        return client.first(client.root.teamByUsername(
+            username=username,
+            raw=raw,
+            fields=fields))
 
 
 Client.bitbucket_types.add(Team)
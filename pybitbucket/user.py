@@ -6,7 +6,7 @@ from __future__ import unicode_literals
 Provides a class for manipulating User resources on Bitbucket.
 """
 
-from pybitbucket.bitbucket import Bitbucket, BitbucketBase, Client
+from pybitbucket.bitbucket import BitbucketBase, Client
 
 
 class User(BitbucketBase):
@@ -17,36 +17,69 @@ class User(BitbucketBase):
     def is_type(data):
         return (User.has_v2_self_url(data))
 
-    def __init__(self, data, client=Client()):
+    def __init__(self, data, client=None):
+        client = client or Client()
         super(User, self).__init__(data, client=client)
         # Some relationships are only available via the 1.0 API.
-        # Create a "mock" UserV1 for those links.
-        self.v1 = UserV1(data, client)
+        # A "mock" UserV1 for those links is built when first used.
+        self.defer(
+            'v1',
+            lambda user, name: UserV1(user.data, user.client))
 
     @staticmethod
-    def find_current_user(client=Client()):
+    def find_current_user(client=None, raw=False, fields=None):
         """
         A convenience method for finding the current user.
         In contrast to the pure hypermedia driven method on the Bitbucket
         class, this method returns a User object, instead of the
         generator.
         """
-        return next(Bitbucket(client=client).userForMyself())
+        client = client or Client()
+        return client.first(client.root.userForMyself(raw=raw, fields=fields))
 
     @staticmethod
-    def find_user_by_username(username, client=Client()):
+    def find_user_by_username(username, client=None, raw=False, fields=None):
         """
         A convenience method for finding a specific user.
         In contrast to the pure hypermedia driven method on the Bitbucket
         class, this method returns a User object, instead of the
         generator.
         """
-        return next(Bitbucket(client=client).userByUsername(
-            username=username))
+        client = client or Client()
+        return client.first(client.root.userByUsername(
+            username=username,
+            raw=raw,
+            fields=fields))
+
+    @staticmethod
+    def find_users_by_usernames(
+            usernames,
+            client=None,
+            max_workers=8,
+            raw=False,
+            fields=None):
+        """
+        Find many users concurrently.
+        Generates a FetchResult for each username, as they arrive;
+        a user who is not found has an error instead of a User.
+        """
+        client = client or Client()
+        template = '{+bitbucket_url}/2.0/users/{username}'
+        return client.fetch_many(
+            (
+                (template, {
+                    'bitbucket_url': client.get_bitbucket_url(),
+                    'username': username
+                })
+                for username in usernames),
+            max_workers=max_workers,
+            raw=raw,
+            fields=fields)
 
 
 class UserAdapter(object):
-    def __init__(self, data, client=Client()):
+    def __init__(self, data, client=None):
+        client = client or Client()
         self.client = client
         if data.get('user') is not None:
             # A 1.0 shape has a user container.
@@ -107,9 +140,10 @@ class UserV1(BitbucketBase):
             # Categorize as user, not team
             (data['user'].get('is_team') is False))
 
-    def __init__(self, data, client=Client()):
+    def __init__(self, data, client=None):
         # This completely overrides the base constructor
         # because the user data is a child of the root object.
+        client = client or Client()
         self.data = data
         self.client = client
         if data.get('user'):
@@ -183,6 +183,10 @@ def read(filename):
         return f.read()
 
 
+# The files that only work with Python 3.6 and later.
+PY36_FILES = ['pybitbucket/aio.py', 'tests/test_aio.py']
+
+
 def _lint():
     """Run lint and return an exit code."""
     # Flake8 doesn't have an easy way to run checks using a Python function, so
@@ -193,6 +197,10 @@ def _lint():
     #   to pass a byte string to endswith.
     project_python_files = [filename for filename in get_project_files()
                             if filename.endswith('.py')]
+    if sys.version_info < (3, 6):
+        # These use async generators, which older Pythons cannot parse.
+        project_python_files = [filename for filename in project_python_files
+                                if filename not in PY36_FILES]
     retcode = subprocess.call(
         ['flake8', '--max-complexity=10'] + project_python_files)
     if retcode == 0:
@@ -250,6 +258,11 @@ if sys.version_info < (2, 7) or (3, 0) <= sys.version_info < (3, 3):
 if sys.version_info < (3, 4):
     python_version_specific_requires.append('enum34')
 
+# concurrent.futures has been introduced to python standard library
+# in python 3.2
+if sys.version_info < (3, 2):
+    python_version_specific_requires.append('futures')
+
 
 # See here for more options:
 # <http://pythonhosted.org/setuptools/setuptools.html>
@@ -293,6 +306,12 @@ setup_dict = dict(
         'voluptuous'
         # your module dependencies
     ] + python_version_specific_requires,
+    extras_require={
+        # AsyncClient in pybitbucket.aio, which needs async generators
+        'async': ['aiohttp; python_version >= "3.6"'],
+        # OrjsonCodec in pybitbucket.codec
+        'orjson': ['orjson'],
+    },
     # Allow tests to be run with `python setup.py test'.
     tests_require=[
         'pytest',
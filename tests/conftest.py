@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+import sys
+
+# The AsyncClient uses async generators, which older Pythons cannot parse.
+collect_ignore = ['test_aio.py'] if sys.version_info < (3, 6) else []
@@ -0,0 +1,518 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import inspect
+import json
+import threading
+
+import pytest
+
+from util import JsonSampleDataFixture
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer as Server  # noqa: E402
+
+from pybitbucket.aio import (  # noqa: E402
+    AsyncAnonymous, AsyncBasicAuthenticator, AsyncClient,
+    AsyncOAuth2Authenticator)
+from pybitbucket.bitbucket import BadRequestError  # noqa: E402
+from pybitbucket.checkpoint import CommitCheckpoints  # noqa: E402
+from pybitbucket.codec import OrjsonCodec  # noqa: E402
+from pybitbucket.comment import Comment  # noqa: E402
+from pybitbucket.commit import Commit  # noqa: E402
+from pybitbucket.consumer import Consumer  # noqa: E402
+from pybitbucket.hook import Hook, HookEvent, HookPayload  # noqa: E402
+from pybitbucket.pullrequest import PullRequest  # noqa: E402
+from pybitbucket.ratelimit import TokenBucket  # noqa: E402
+from pybitbucket.repository import Repository  # noqa: E402
+from pybitbucket.retry import RetryPolicy  # noqa: E402
+from pybitbucket.snippet import Snippet  # noqa: E402
+from test_auth import MockGrant  # noqa: E402
+
+
+class StandInBitbucket(object):
+    """A local HTTP server that answers with canned responses."""
+
+    def __init__(self):
+        self.responses = {}
+        self.failures = {}
+        self.requests = []
+        self.bodies = []
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.server = Server(app)
+
+    async def handle(self, request):
+        body = await request.read()
+        self.requests.append((request.method, request.raw_path, request))
+        self.bodies.append(body)
+        failures = self.failures.get((request.method, request.raw_path))
+        if failures:
+            return web.Response(status=failures.pop(0))
+        status, text = self.responses.get(
+            (request.method, request.raw_path),
+            (404, '{"error": {"message": "Not found"}}'))
+        return web.Response(
+            status=status,
+            text=text,
+            content_type='application/json')
+
+    @property
+    def base_uri(self):
+        return str(self.server.make_url('')).rstrip('/')
+
+    def rebase(self, text):
+        return text.replace('https://api.bitbucket.org', self.base_uri)
+
+    def respond(self, method, url, body='', status=200):
+        path = url.replace(self.base_uri, '')
+        self.responses[(method, path)] = (status, self.rebase(body))
+
+    def fail(self, method, url, *statuses):
+        """Answer with the statuses before the response."""
+        path = url.replace(self.base_uri, '')
+        self.failures[(method, path)] = list(statuses)
+
+
+class AsyncClientFixture(JsonSampleDataFixture):
+    username = 'pybitbucket'
+    password = 'secret'
+    email = 'pybitbucket@mailinator.com'
+
+    @staticmethod
+    def run(scenario):
+        async def with_server():
+            bitbucket = StandInBitbucket()
+            await bitbucket.server.start_server()
+            try:
+                return await scenario(bitbucket)
+            finally:
+                await bitbucket.server.close()
+        return asyncio.run(with_server())
+
+    def basic_client(self, bitbucket, **kwargs):
+        return AsyncClient(
+            AsyncBasicAuthenticator(
+                self.username,
+                self.password,
+                self.email,
+                server_base_uri=bitbucket.base_uri),
+            **kwargs)
+
+    def repository(self, bitbucket, client):
+        return client.convert_to_object(
+            json.loads(bitbucket.rebase(self.resource_data('Repository'))))
+
+    def pullrequest_pages(self, bitbucket, pages):
+        pullrequest = json.loads(self.resource_data('PullRequest'))
+        url = self.repository(
+            bitbucket, AsyncClient()).links['pullrequests']['href']
+        for page in range(1, pages + 1):
+            example = {
+                'page': page,
+                'pagelen': 1,
+                'size': pages,
+                'values': [pullrequest],
+            }
+            if page < pages:
+                example['next'] = url + '?page={0}'.format(page + 1)
+            bitbucket.respond(
+                'GET',
+                url + ('?page={0}'.format(page) if page > 1 else ''),
+                body=json.dumps(example))
+        return url
+
+
+class TestAsyncRelationships(AsyncClientFixture):
+    def test_relationships_are_async_generators(self):
+        async def scenario(bitbucket):
+            async with self.basic_client(bitbucket) as client:
+                repository = self.repository(bitbucket, client)
+                assert isinstance(repository, Repository)
+                return inspect.isasyncgen(repository.pullrequests())
+        assert self.run(scenario)
+
+    def test_iterating_over_pages_of_pullrequests(self):
+        async def scenario(bitbucket):
+            self.pullrequest_pages(bitbucket, 3)
+            async with self.basic_client(bitbucket) as client:
+                repository = self.repository(bitbucket, client)
+                pullrequests = [
+                    pr async for pr in repository.pullrequests()]
+            return pullrequests, bitbucket.requests
+        pullrequests, requests = self.run(scenario)
+        assert 3 == len(pullrequests)
+        assert all(isinstance(pr, PullRequest) for pr in pullrequests)
+        assert 3 == len(requests)
+        headers = requests[0][2].headers
+        assert headers['Authorization'].startswith('Basic ')
+        assert self.email == headers['From']
+
+    def test_max_items_and_pagelen(self):
+        async def scenario(bitbucket):
+            url = self.pullrequest_pages(bitbucket, 3)
+            bitbucket.respond(
+                'GET',
+                url + '?pagelen=1',
+                body=bitbucket.responses[('GET', url.replace(
+                    bitbucket.base_uri, ''))][1])
+            async with self.basic_client(bitbucket) as client:
+                repository = self.repository(bitbucket, client)
+                pullrequests = [
+                    pr async for pr in repository.pullrequests(
+                        pagelen=1,
+                        max_items=2)]
+            return pullrequests, bitbucket.requests
+        pullrequests, requests = self.run(scenario)
+        assert 2 == len(pullrequests)
+        assert 2 == len(requests)
+        assert requests[0][1].endswith('?pagelen=1')
+
+    def test_prefetched_pages_stay_in_order(self):
+        async def scenario(bitbucket):
+            self.pullrequest_pages(bitbucket, 5)
+            async with self.basic_client(bitbucket, prefetch=3) as client:
+                repository = self.repository(bitbucket, client)
+                pullrequests = [
+                    pr async for pr in repository.pullrequests()]
+            return pullrequests, bitbucket.requests
+        pullrequests, requests = self.run(scenario)
+        assert 5 == len(pullrequests)
+        assert 5 == len(requests)
+
+    def test_failed_pages_are_retried(self):
+        async def scenario(bitbucket):
+            url = self.pullrequest_pages(bitbucket, 3)
+            bitbucket.fail('GET', url + '?page=2', 503, 502)
+            async with self.basic_client(
+                    bitbucket,
+                    retry=RetryPolicy(backoff_factor=0)) as client:
+                repository = self.repository(bitbucket, client)
+                pullrequests = [
+                    pr async for pr in repository.pullrequests()]
+            return pullrequests, bitbucket.requests
+        pullrequests, requests = self.run(scenario)
+        assert 3 == len(pullrequests)
+        assert 5 == len(requests)
+        assert requests[1][1] == requests[3][1]
+
+    def test_rate_limiter_is_not_used_in_the_event_loop(self):
+        threads = []
+
+        class RecordingBucket(TokenBucket):
+            def reserve(self, key):
+                threads.append(threading.current_thread())
+                return super(RecordingBucket, self).reserve(key)
+
+            def observe(self, key, response):
+                threads.append(threading.current_thread())
+                super(RecordingBucket, self).observe(key, response)
+
+        async def scenario(bitbucket):
+            url = self.pullrequest_pages(bitbucket, 1)
+            async with self.basic_client(
+                    bitbucket, rate_limiter=RecordingBucket()) as client:
+                await client.get_page(url)
+        self.run(scenario)
+        assert 2 == len(threads)
+        assert threading.current_thread() not in threads
+
+    def test_fetch_many_captures_errors_per_item(self):
+        async def scenario(bitbucket):
+            template = '{+bitbucket_url}/2.0/users/{username}'
+            for username in ('evzijst', 'someone'):
+                bitbucket.respond(
+                    'GET',
+                    '/2.0/users/' + username,
+                    body=self.resource_data('User'))
+            async with self.basic_client(bitbucket) as client:
+                return [
+                    r async for r in client.fetch_many(
+                        (template, {
+                            'bitbucket_url': bitbucket.base_uri,
+                            'username': username,
+                        })
+                        for username in ('evzijst', 'someone', 'nobody'))]
+        results = self.run(scenario)
+        assert 3 == len(results)
+        assert 2 == len([r for r in results if r.ok])
+        failed = [r for r in results if not r.ok]
+        assert failed[0].url.endswith('/nobody')
+
+
+class TestAsyncFinders(AsyncClientFixture):
+    def test_finding_one_resource_is_awaitable(self):
+        async def scenario(bitbucket):
+            async with self.basic_client(bitbucket) as client:
+                url = Consumer.expand_link_url(
+                    'self',
+                    bitbucket_url=client.get_bitbucket_url(),
+                    username=client.get_username(),
+                    consumer_id=302126)
+                bitbucket.respond(
+                    'GET', url, body=self.resource_data('Consumer'))
+                return await Consumer.find_consumer_by_id(
+                    302126, client=client)
+        assert isinstance(self.run(scenario), Consumer)
+
+    def test_finding_a_commit_by_revision_is_awaitable(self):
+        async def scenario(bitbucket):
+            commit_data = self.resource_data('Commit')
+            url = bitbucket.rebase(
+                json.loads(commit_data)['links']['self']['href'])
+            bitbucket.respond('GET', url, body=commit_data)
+            async with self.basic_client(bitbucket) as client:
+                return (
+                    await Commit.find_commit_in_repository_by_revision(
+                        'teamsinspace',
+                        'teamsinspace.bitbucket.org',
+                        url.rsplit('/', 1)[1],
+                        client=client),
+                    await Commit.find_commit_in_repository_by_revision(
+                        'teamsinspace',
+                        'teamsinspace.bitbucket.org',
+                        'missing',
+                        client=client))
+        found, missing = self.run(scenario)
+        assert isinstance(found, Commit)
+        assert missing is None
+
+    def test_new_commits_are_an_async_generator(self):
+        async def scenario(bitbucket):
+            url = (
+                bitbucket.base_uri +
+                '/2.0/repositories/teamsinspace/teamsinspace.bitbucket.org' +
+                '/commits/master')
+            bitbucket.respond('GET', url, body=json.dumps({'values': [
+                {'hash': revision} for revision in ('c3', 'c2', 'c1')]}))
+            checkpoints = CommitCheckpoints()
+            # The checkpoint was force pushed away, so it is not found.
+            checkpoints.set(
+                'teamsinspace', 'teamsinspace.bitbucket.org', 'master', 'c0')
+            async with self.basic_client(bitbucket) as client:
+                commits = Commit.find_new_commits_in_repository(
+                    'teamsinspace',
+                    'teamsinspace.bitbucket.org',
+                    branch='master',
+                    known={'c1'},
+                    checkpoints=checkpoints,
+                    client=client,
+                    raw=True)
+                assert inspect.isasyncgen(commits)
+                revisions = [c['hash'] async for c in commits]
+            return revisions, checkpoints
+        revisions, checkpoints = self.run(scenario)
+        assert ['c3', 'c2'] == revisions
+        assert 'c3' == checkpoints.get(
+            'teamsinspace', 'teamsinspace.bitbucket.org', 'master')
+
+    def test_reading_a_diff_is_awaitable_but_not_streamed(self):
+        async def scenario(bitbucket):
+            async with self.basic_client(bitbucket) as client:
+                pullrequest = client.convert_to_object(json.loads(
+                    bitbucket.rebase(self.resource_data('PullRequest'))))
+                bitbucket.respond(
+                    'GET',
+                    pullrequest.links['diff']['href'],
+                    body='diff --git a/one.txt b/one.txt')
+                diff = await pullrequest.diff()
+                with pytest.raises(NotImplementedError):
+                    pullrequest.diff_files()
+            return diff
+        assert b'diff --git a/one.txt b/one.txt' == self.run(scenario)
+
+    def test_snippet_files_are_downloaded_once_read(self, tmpdir):
+        async def scenario(bitbucket):
+            url = bitbucket.base_uri + '/2.0/snippets/evzijst/kypj'
+            files = {
+                filename: {'links': {'self': {
+                    'href': url + '/files/{0}'.format(i)}}}
+                for (i, filename) in enumerate(['one.txt', 'missing.txt'])}
+            bitbucket.respond('GET', url + '/files/0', body='one')
+            async with self.basic_client(bitbucket) as client:
+                snippet = Snippet(
+                    {'id': 'kypj', 'links': {'self': {'href': url}},
+                     'files': files},
+                    client=client)
+                return [
+                    r async for r in snippet.download_all(
+                        str(tmpdir), max_workers=2)]
+        results = {r.url.rsplit('/', 1)[1]: r for r in self.run(scenario)}
+        assert results['0'].ok
+        with open(results['0'].resource) as f:
+            assert 'one' == f.read()
+        assert not results['1'].ok
+
+
+class TestAsyncChanges(AsyncClientFixture):
+    def test_approve_and_unapprove_are_awaitable(self):
+        async def scenario(bitbucket):
+            async with self.basic_client(bitbucket) as client:
+                pullrequest = client.convert_to_object(json.loads(
+                    bitbucket.rebase(self.resource_data('PullRequest'))))
+                url = pullrequest.links['approve']['href']
+                bitbucket.respond(
+                    'POST', url, body=self.resource_data(
+                        'PullRequest.approve'))
+                bitbucket.respond('DELETE', url, status=204)
+                return (
+                    await pullrequest.approve(),
+                    await pullrequest.unapprove())
+        assert (True, True) == self.run(scenario)
+
+    def test_create_put_and_delete_are_awaitable(self):
+        async def scenario(bitbucket):
+            hook_data = bitbucket.rebase(self.resource_data('Hook'))
+            url = json.loads(hook_data)['links']['self']['href']
+            bitbucket.respond(
+                'POST',
+                bitbucket.base_uri +
+                '/2.0/repositories/pybitbucket/testing/hooks',
+                body=hook_data,
+                status=201)
+            bitbucket.respond('PUT', url, body=hook_data)
+            bitbucket.respond('DELETE', url, status=204)
+            payload = HookPayload() \
+                .add_description('WebHook Description') \
+                .add_callback_url('https://example.com/bitbucket/') \
+                .add_event(HookEvent.REPOSITORY_PUSH)
+            async with self.basic_client(bitbucket) as client:
+                hook = await Hook.create(
+                    payload,
+                    repository_name='testing',
+                    owner='pybitbucket',
+                    client=client)
+                updated = await hook.update(payload)
+                deleted = await hook.delete()
+            return hook, updated, deleted, bitbucket.bodies[0]
+        hook, updated, deleted, created_body = self.run(scenario)
+        assert isinstance(hook, Hook)
+        assert isinstance(updated, Hook)
+        assert deleted is None
+        assert ['repo:push'] == json.loads(created_body)['events']
+
+    def test_create_comment_is_awaitable(self):
+        async def scenario(bitbucket):
+            bitbucket.respond(
+                'POST',
+                bitbucket.base_uri + '/2.0/snippets/pybitbucket/kypj/comments',
+                body=self.resource_data('Comment'),
+                status=201)
+            async with self.basic_client(bitbucket) as client:
+                comment = await Comment.create_comment(
+                    'Looks good.', 'kypj', client=client)
+            return comment, bitbucket.bodies[0]
+        comment, body = self.run(scenario)
+        assert isinstance(comment, Comment)
+        assert {'content': {'raw': 'Looks good.'}} == json.loads(body)
+
+    def test_payloads_are_encoded_with_the_codec(self):
+        pytest.importorskip('orjson')
+        orjson_codec = OrjsonCodec()
+
+        async def scenario(bitbucket):
+            hook_data = bitbucket.rebase(self.resource_data('Hook'))
+            bitbucket.respond(
+                'POST',
+                bitbucket.base_uri +
+                '/2.0/repositories/pybitbucket/testing/hooks',
+                body=hook_data,
+                status=201)
+            payload = HookPayload() \
+                .add_description('WebHook Description') \
+                .add_callback_url('https://example.com/bitbucket/') \
+                .add_event(HookEvent.REPOSITORY_PUSH)
+            async with self.basic_client(
+                    bitbucket, codec=orjson_codec) as client:
+                hook = await Hook.create(
+                    payload,
+                    repository_name='testing',
+                    owner='pybitbucket',
+                    client=client)
+            (_, _, request) = bitbucket.requests[0]
+            return hook, bitbucket.bodies[0], request.content_type
+        hook, created_body, content_type = self.run(scenario)
+        assert isinstance(hook, Hook)
+        assert ['repo:push'] == json.loads(created_body)['events']
+        assert 'application/json' == content_type
+
+    def test_bad_requests_raise_the_same_errors(self):
+        async def scenario(bitbucket):
+            url = bitbucket.base_uri + '/2.0/repositories/pybitbucket/testing'
+            bitbucket.respond(
+                'PUT',
+                url,
+                body='{"error": {"message": "Nope."}}',
+                status=400)
+            async with AsyncClient(AsyncAnonymous(
+                    server_base_uri=bitbucket.base_uri)) as client:
+                try:
+                    await client.put(url, json={})
+                except BadRequestError as e:
+                    return e
+        error = self.run(scenario)
+        assert 400 == error.code
+        assert 'Nope.' == error.error_message
+
+
+class TestAsyncOAuth2Authenticator(AsyncClientFixture):
+    def test_token_is_used_for_requests(self):
+        async def scenario(bitbucket):
+            bitbucket.respond(
+                'POST',
+                '/site/oauth2/access_token',
+                body=json.dumps({
+                    'access_token': '2YotnFZFEjr1zCsicMWpAA',
+                    'token_type': 'bearer',
+                    'expires_in': 3600,
+                    'refresh_token': 'tGzv3JOkF0XG5Qx2TlKWIA',
+                    'scope': 'repository',
+                }))
+            bitbucket.respond(
+                'GET', '/2.0/user', body=self.resource_data('User'))
+            auth = AsyncOAuth2Authenticator(
+                '1',
+                'secret',
+                self.email,
+                MockGrant(),
+                server_base_uri=bitbucket.base_uri,
+                # The grant only builds this URL, it is never requested.
+                auth_uri='https://bitbucket.org/site/oauth2/authorize')
+            async with AsyncClient(auth) as client:
+                username = client.get_username()
+            return username, bitbucket.requests
+        username, requests = self.run(scenario)
+        assert 'POST' == requests[0][0]
+        assert requests[0][2].headers['Authorization'].startswith('Basic ')
+        assert 'Bearer 2YotnFZFEjr1zCsicMWpAA' == \
+            requests[1][2].headers['Authorization']
+        assert username
+
+    def test_concurrent_first_requests_fetch_one_token(self):
+        async def scenario(bitbucket):
+            bitbucket.respond(
+                'POST',
+                '/site/oauth2/access_token',
+                body=json.dumps({
+                    'access_token': '2YotnFZFEjr1zCsicMWpAA',
+                    'token_type': 'bearer',
+                }))
+            bitbucket.respond(
+                'GET', '/2.0/user', body=self.resource_data('User'))
+            auth = AsyncOAuth2Authenticator(
+                '1',
+                'secret',
+                self.email,
+                MockGrant(),
+                server_base_uri=bitbucket.base_uri,
+                auth_uri='https://bitbucket.org/site/oauth2/authorize')
+            client = AsyncClient(auth)
+            try:
+                await asyncio.gather(*[
+                    client.get_page(bitbucket.base_uri + '/2.0/user')
+                    for _ in range(4)])
+            finally:
+                await client.close()
+            return bitbucket.requests
+        requests = self.run(scenario)
+        assert 1 == len([r for r in requests if 'POST' == r[0]])
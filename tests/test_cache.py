@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+import httpretty
+import json
+import os
+import time
+from threading import Thread
+
+from test_auth import FakeAuth
+from util import JsonSampleDataFixture
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.cache import (
+    CacheEntry, ResponseCache, SQLiteResponseCache, template_pattern)
+from pybitbucket.commit import Commit
+from pybitbucket.pullrequest import PullRequest
+
+
+class CacheFixture(JsonSampleDataFixture):
+    etag = '"b9a703d5b884"'
+    last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+
+    @classmethod
+    def cached_client(cls, max_entries=1024, cache=None):
+        return Client(FakeAuth(), cache=cache or ResponseCache(max_entries))
+
+    def register_revalidated(self, url, body, content_type):
+        # GIVEN: a full response with validators, followed by a 304
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            responses=[
+                httpretty.Response(
+                    body=body,
+                    content_type=content_type,
+                    adding_headers={
+                        'ETag': self.etag,
+                        'Last-Modified': self.last_modified},
+                    status=200),
+                httpretty.Response(body='', status=304),
+            ])
+
+
+class TestRevalidatingPages(CacheFixture):
+    @httpretty.activate
+    def test_second_page_request_is_conditional_and_reused(self):
+        client = self.cached_client()
+        url = client.get_bitbucket_url() + '/2.0/repositories'
+        self.register_revalidated(
+            url,
+            self.resource_list_data('Repository'),
+            'application/json')
+        first = client.get_page(url)
+        second = client.get_page(url)
+        headers = httpretty.last_request().headers
+        assert self.etag == headers['If-None-Match']
+        assert self.last_modified == headers['If-Modified-Since']
+        # The decoded json is reused, as a copy of its own for each hit.
+        assert first == second
+        assert first is not second
+        assert {'hits': 1, 'misses': 1, 'revalidations': 1} == \
+            client.cache.stats()
+
+    @httpretty.activate
+    def test_changing_a_hit_does_not_change_the_next(self):
+        client = self.cached_client()
+        url = client.get_bitbucket_url() + '/2.0/repositories'
+        self.register_revalidated(
+            url,
+            self.resource_list_data('Repository'),
+            'application/json')
+        first = client.get_page(url)
+        first['values'][0]['name'] = 'changed'
+        second = client.get_page(url)
+        second['values'][0]['links']['self']['href'] = 'changed'
+        third = client.get_page(url)
+        assert 'changed' != third['values'][0]['name']
+        assert 'changed' != third['values'][0]['links']['self']['href']
+
+    @httpretty.activate
+    def test_remote_relationship_uses_the_cache(self):
+        client = self.cached_client()
+        url = client.get_bitbucket_url() + '/2.0/repositories'
+        self.register_revalidated(
+            url,
+            self.resource_list_data('Repository'),
+            'application/json')
+        first = list(client.remote_relationship(url))
+        second = list(client.remote_relationship(url))
+        assert [r.full_name for r in first] == [r.full_name for r in second]
+        assert 1 == client.cache.hits
+
+    @httpretty.activate
+    def test_responses_without_validators_are_not_cached(self):
+        client = self.cached_client()
+        url = client.get_bitbucket_url() + '/2.0/repositories'
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            content_type='application/json',
+            body=self.resource_list_data('Repository'),
+            status=200)
+        client.get_page(url)
+        client.get_page(url)
+        assert 'If-None-Match' not in httpretty.last_request().headers
+        assert {'hits': 0, 'misses': 2, 'revalidations': 0} == \
+            client.cache.stats()
+
+
+class TestRevalidatingDirectRequests(CacheFixture):
+    @httpretty.activate
+    def test_commit_by_revision(self):
+        client = self.cached_client()
+        revision = 'c021208234c65439f57b8244517a2b850b3ecf44'
+        url = (
+            client.get_bitbucket_url() +
+            '/2.0/repositories/teamsinspace/teamsinspace.bitbucket.org' +
+            '/commit/' + revision)
+        self.register_revalidated(
+            url,
+            self.resource_data('Commit'),
+            'application/json')
+        commits = [
+            Commit.find_commit_in_repository_by_revision(
+                'teamsinspace',
+                'teamsinspace.bitbucket.org',
+                revision,
+                client=client)
+            for _ in range(2)]
+        assert all(revision == c.hash for c in commits)
+        assert 1 == client.cache.hits
+
+    @httpretty.activate
+    def test_pullrequest_diff(self):
+        client = self.cached_client()
+        pullrequest = PullRequest(
+            json.loads(self.resource_data('PullRequest')),
+            client=client)
+        diff = self.data_from_file('Diff.txt')
+        self.register_revalidated(
+            pullrequest.links['diff']['href'],
+            diff,
+            'text/plain')
+        assert pullrequest.diff() == pullrequest.diff()
+        assert 1 == client.cache.hits
+
+
+class TestResponseCache(object):
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResponseCache(max_entries=2)
+        for url in ('a', 'b'):
+            cache.set(url, CacheEntry(url, b'{}', etag='"1"'))
+        cache.get('a')
+        cache.set('c', CacheEntry('c', b'{}', etag='"1"'))
+        assert ['a', 'c'] == list(cache.entries)
+
+
+class OtherFakeAuth(FakeAuth):
+    username = 'someone-else'
+
+
+class TestTimeToLive(CacheFixture):
+    ttls = {'{+bitbucket_url}/2.0/repositories{/owner,repository_name}': 60}
+
+    def test_template_patterns_ignore_the_query(self):
+        pattern = template_pattern(
+            '{+bitbucket_url}/2.0/repositories{/owner,repository_name}'
+            '{?pagelen}')
+        base = 'https://api.bitbucket.org/2.0/repositories'
+        assert pattern.match(base)
+        assert pattern.match(base + '/pybitbucket/testing')
+        assert not pattern.match(base + '/pybitbucket/testing/pullrequests')
+
+    @httpretty.activate
+    def test_fresh_responses_are_reused_without_a_request(self):
+        client = self.cached_client(cache=ResponseCache(ttls=self.ttls))
+        url = client.get_bitbucket_url() + '/2.0/repositories'
+        # No validators: the time to live alone makes it cacheable.
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            content_type='application/json',
+            body=self.resource_list_data('Repository'),
+            status=200)
+        first = client.get_page(url + '?page=2')
+        second = client.get_page(url + '?page=2')
+        assert first == second
+        assert 1 == len(httpretty.HTTPretty.latest_requests)
+        assert {'hits': 1, 'misses': 1, 'revalidations': 0} == \
+            client.cache.stats()
+
+    @httpretty.activate
+    def test_stale_responses_are_revalidated(self):
+        cache = ResponseCache(ttls=self.ttls)
+        client = self.cached_client(cache=cache)
+        url = client.get_bitbucket_url() + '/2.0/repositories'
+        self.register_revalidated(
+            url,
+            self.resource_list_data('Repository'),
+            'application/json')
+        client.get_page(url)
+        for entry in cache.entries.values():
+            entry.stored_at -= 61
+        client.get_page(url)
+        assert self.etag == httpretty.last_request().headers['If-None-Match']
+        assert 1 == cache.revalidations
+
+
+class TestSQLiteResponseCache(CacheFixture):
+    @staticmethod
+    def path(tmpdir):
+        return os.path.join(str(tmpdir), 'responses.sqlite')
+
+    @httpretty.activate
+    def test_responses_outlive_the_cache(self, tmpdir):
+        url = FakeAuth.server_base_uri + '/2.0/repositories'
+        self.register_revalidated(
+            url,
+            self.resource_list_data('Repository'),
+            'application/json')
+        first = self.cached_client(
+            cache=SQLiteResponseCache(self.path(tmpdir))).get_page(url)
+        # As if from another process started later.
+        client = self.cached_client(
+            cache=SQLiteResponseCache(self.path(tmpdir)))
+        second = client.get_page(url)
+        assert first == second
+        assert self.etag == httpretty.last_request().headers['If-None-Match']
+        assert 1 == client.cache.hits
+
+    @httpretty.activate
+    def test_identities_do_not_share_responses(self, tmpdir):
+        url = FakeAuth.server_base_uri + '/2.0/repositories'
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            content_type='application/json',
+            adding_headers={'ETag': self.etag},
+            body=self.resource_list_data('Repository'),
+            status=200)
+        cache = SQLiteResponseCache(self.path(tmpdir))
+        self.cached_client(cache=cache).get_page(url)
+        Client(OtherFakeAuth(), cache=cache).get_page(url)
+        assert 'If-None-Match' not in httpretty.last_request().headers
+        assert 2 == cache.misses
+
+    def test_least_recently_used_entries_are_evicted(self, tmpdir):
+        cache = SQLiteResponseCache(
+            self.path(tmpdir), max_entries=2, touch_interval=0)
+        for url in ('a', 'b'):
+            cache.set(url, CacheEntry(url, b'{}', etag='"1"'))
+            time.sleep(0.01)
+        cache.get('a')
+        time.sleep(0.01)
+        cache.set('c', CacheEntry('c', b'{}', etag='"1"'))
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        assert cache.get('c') is not None
+
+    def test_reads_only_record_their_use_now_and_then(self, tmpdir):
+        cache = SQLiteResponseCache(self.path(tmpdir), touch_interval=60)
+        cache.set('a', CacheEntry('a', b'{}', etag='"1"'))
+        statements = []
+        cache.database.connection.set_trace_callback(statements.append)
+        for _ in range(3):
+            assert cache.get('a') is not None
+        assert not [s for s in statements if s.startswith('UPDATE')]
+        cache.database.execute(
+            'UPDATE responses SET accessed_at = accessed_at - 60')
+        del statements[:]
+        cache.get('a')
+        assert 1 == len([s for s in statements if s.startswith('UPDATE')])
+
+    def test_entries_are_evicted_to_fit_max_bytes(self, tmpdir):
+        cache = SQLiteResponseCache(self.path(tmpdir), max_bytes=10)
+        for url in ('a', 'b', 'c'):
+            cache.set(url, CacheEntry(url, b'12345', etag='"1"'))
+            time.sleep(0.01)
+        assert cache.get('a') is None
+        assert b'12345' == cache.get('c').content
+
+    def test_totals_follow_every_write(self, tmpdir):
+        cache = SQLiteResponseCache(self.path(tmpdir))
+        cache.set('a', CacheEntry('a', b'12345', etag='"1"'))
+        cache.set('a', CacheEntry('a', b'123', etag='"2"'))
+        cache.set('b', CacheEntry('b', b'12', etag='"1"'))
+        cache.delete('b')
+        assert (1, 3) == cache.database.execute(
+            'SELECT entries, size FROM response_totals').fetchone()
+        # As if from another process started later.
+        again = SQLiteResponseCache(self.path(tmpdir))
+        assert (1, 3) == again.database.execute(
+            'SELECT entries, size FROM response_totals').fetchone()
+
+    @httpretty.activate
+    def test_revalidation_only_renews_the_time_to_live(self, tmpdir):
+        url = FakeAuth.server_base_uri + '/2.0/repositories'
+        self.register_revalidated(
+            url,
+            self.resource_list_data('Repository'),
+            'application/json')
+        cache = SQLiteResponseCache(self.path(tmpdir))
+        client = self.cached_client(cache=cache)
+        client.get_page(url)
+        statements = []
+        cache.database.connection.set_trace_callback(statements.append)
+        client.get_page(url)
+        assert 1 == cache.hits
+        assert not [s for s in statements if s.startswith('INSERT')]
+        updates = [s for s in statements if s.startswith('UPDATE')]
+        assert 1 == len(updates)
+        assert updates[0].startswith('UPDATE responses SET stored_at =')
+
+    def test_entries_round_trip(self, tmpdir):
+        cache = SQLiteResponseCache(self.path(tmpdir))
+        cache.set('a', CacheEntry(
+            'a',
+            b'{"a": 1}',
+            encoding='utf-8',
+            headers={'Content-Type': 'application/json'},
+            etag='"1"',
+            last_modified=self.last_modified))
+        response = cache.get('a').to_response()
+        assert {'a': 1} == response.json()
+        assert 'application/json' == response.headers['content-type']
+
+    def test_concurrent_writers(self, tmpdir):
+        caches = [SQLiteResponseCache(self.path(tmpdir)) for _ in range(4)]
+
+        def write(cache, n):
+            for i in range(25):
+                url = '{0}-{1}'.format(n, i)
+                cache.set(url, CacheEntry(url, b'{}', etag='"1"'))
+
+        threads = [
+            Thread(target=write, args=(cache, n))
+            for (n, cache) in enumerate(caches)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert all(
+            caches[0].get('{0}-{1}'.format(n, i)) is not None
+            for n in range(4)
+            for i in range(25))
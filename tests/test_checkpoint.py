@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import httpretty
+import json
+import os
+
+from test_auth import FakeAuth
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.checkpoint import CommitCheckpoints, SQLiteCommitCheckpoints
+from pybitbucket.commit import Commit
+
+
+class FakeHistory(object):
+    """
+    Commits listed newest first, two to a page,
+    leaving out the commits reachable from an excluded one.
+    """
+
+    def __init__(self, client, revisions):
+        self.url = (
+            client.get_bitbucket_url() +
+            '/2.0/repositories/teamsinspace/teamsinspace.bitbucket.org' +
+            '/commits/master')
+        self.revisions = list(revisions)
+        self.requests = []
+
+    def push(self, *revisions):
+        self.revisions[:0] = revisions
+
+    def commit(self, revision):
+        return {
+            'hash': revision,
+            'links': {'self': {'href': (
+                'https://api.bitbucket.org/2.0/repositories/teamsinspace/' +
+                'teamsinspace.bitbucket.org/commit/' + revision)}}}
+
+    def __call__(self, request, uri, headers):
+        self.requests.append(request.querystring)
+        revisions = self.revisions
+        for excluded in request.querystring.get('exclude', []):
+            if excluded not in revisions:
+                return (404, headers, '{"error": {"message": "Not found"}}')
+            revisions = revisions[:revisions.index(excluded)]
+        page = int(request.querystring.get('page', ['1'])[0])
+        page_data = {
+            'values': [
+                self.commit(r)
+                for r in revisions[2 * (page - 1):2 * page]]}
+        if 2 * page < len(revisions):
+            query = [('page', str(page + 1))] + [
+                ('exclude', e)
+                for e in request.querystring.get('exclude', [])]
+            page_data['next'] = self.url + '?' + '&'.join(
+                '{0}={1}'.format(k, v) for (k, v) in query)
+        return (200, headers, json.dumps(page_data))
+
+    def register(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.url,
+            content_type='application/json',
+            body=self)
+
+
+class TestFindingNewCommits(object):
+    def new_commits(self, client, checkpoints=None, known=None, raw=False):
+        return [
+            c['hash'] if raw else c.hash
+            for c in Commit.find_new_commits_in_repository(
+                'teamsinspace',
+                'teamsinspace.bitbucket.org',
+                branch='master',
+                known=known,
+                checkpoints=checkpoints,
+                client=client,
+                raw=raw)]
+
+    @httpretty.activate
+    def test_second_sync_only_reads_new_commits(self):
+        client = Client(FakeAuth())
+        history = FakeHistory(client, ['e', 'd', 'c', 'b', 'a'])
+        history.register()
+        checkpoints = CommitCheckpoints()
+        assert ['e', 'd', 'c', 'b', 'a'] == self.new_commits(
+            client, checkpoints)
+        assert 3 == len(history.requests)
+        assert 'e' == checkpoints.get(
+            'teamsinspace', 'teamsinspace.bitbucket.org', 'master')
+        history.push('g', 'f')
+        history.requests = []
+        assert ['g', 'f'] == self.new_commits(client, checkpoints)
+        assert [['e']] == [r['exclude'] for r in history.requests]
+        assert 'g' == checkpoints.get(
+            'teamsinspace', 'teamsinspace.bitbucket.org', 'master')
+
+    @httpretty.activate
+    def test_no_new_commits_keeps_the_checkpoint(self):
+        client = Client(FakeAuth())
+        history = FakeHistory(client, ['b', 'a'])
+        history.register()
+        checkpoints = CommitCheckpoints()
+        self.new_commits(client, checkpoints)
+        assert [] == self.new_commits(client, checkpoints)
+        assert 'b' == checkpoints.get(
+            'teamsinspace', 'teamsinspace.bitbucket.org', 'master')
+
+    @httpretty.activate
+    def test_pagination_stops_at_a_known_commit(self):
+        client = Client(FakeAuth())
+        history = FakeHistory(client, ['e', 'd', 'c', 'b', 'a'])
+        history.register()
+        assert ['e'] == self.new_commits(client, known={'d', 'a'}, raw=True)
+        assert 1 == len(history.requests)
+
+    @httpretty.activate
+    def test_a_lost_checkpoint_falls_back_to_known_commits(self):
+        client = Client(FakeAuth())
+        history = FakeHistory(client, ['f', 'c', 'b', 'a'])
+        history.register()
+        checkpoints = CommitCheckpoints()
+        # The commit was force pushed away.
+        checkpoints.set(
+            'teamsinspace', 'teamsinspace.bitbucket.org', 'master', 'd')
+        assert ['f'] == self.new_commits(
+            client, checkpoints, known={'c', 'd'})
+        assert 'f' == checkpoints.get(
+            'teamsinspace', 'teamsinspace.bitbucket.org', 'master')
+
+    @httpretty.activate
+    def test_an_unfinished_sync_keeps_the_old_checkpoint(self):
+        client = Client(FakeAuth())
+        history = FakeHistory(client, ['c', 'b', 'a'])
+        history.register()
+        checkpoints = CommitCheckpoints()
+        commits = Commit.find_new_commits_in_repository(
+            'teamsinspace',
+            'teamsinspace.bitbucket.org',
+            branch='master',
+            checkpoints=checkpoints,
+            client=client)
+        next(commits)
+        commits.close()
+        assert checkpoints.get(
+            'teamsinspace', 'teamsinspace.bitbucket.org', 'master') is None
+
+
+class TestSQLiteCommitCheckpoints(object):
+    def test_checkpoints_are_shared(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'checkpoints.sqlite')
+        first = SQLiteCommitCheckpoints(path)
+        first.set('teamsinspace', 'teamsinspace.bitbucket.org', None, 'a')
+        first.set('teamsinspace', 'teamsinspace.bitbucket.org', 'dev', 'b')
+        first.set('teamsinspace', 'teamsinspace.bitbucket.org', 'dev', 'c')
+        first.close()
+        second = SQLiteCommitCheckpoints(path)
+        assert 'a' == second.get('teamsinspace', 'teamsinspace.bitbucket.org')
+        assert 'c' == second.get(
+            'teamsinspace', 'teamsinspace.bitbucket.org', 'dev')
+        assert second.get('teamsinspace', 'other') is None
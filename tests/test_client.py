@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 import httpretty
+import inspect
+import json
+import sys
 
-from pybitbucket.bitbucket import Client, BadRequestError, ServerError
+from pybitbucket.bitbucket import (
+    Bitbucket, Client, BadRequestError, ServerError, FetchResult)
 
 from test_auth import FakeAuth
 
@@ -81,3 +85,142 @@ class TestClient(object):
         httpretty.register_uri(httpretty.GET, url)
         response = client.session.get(url)
         assert 200 == response.status_code
+
+    @httpretty.activate
+    def test_fetch_many_captures_errors_per_item(self):
+        client = Client(FakeAuth())
+        template = '{+bitbucket_url}/2.0/things/{n}'
+        url = client.get_bitbucket_url() + '/2.0/things/'
+        for n in range(10):
+            httpretty.register_uri(
+                httpretty.GET,
+                url + str(n),
+                content_type='application/json',
+                body=(
+                    '{"error": {"message": "Oops"}}' if n == 3
+                    else '{{"n": {0}}}'.format(n)),
+                status=500 if n == 3 else 200)
+        requests = [url + '0'] + [
+            (template, {'bitbucket_url': client.get_bitbucket_url(), 'n': n})
+            for n in range(1, 10)]
+        results = list(client.fetch_many(requests, max_workers=3))
+        assert all(isinstance(r, FetchResult) for r in results)
+        assert [0, 1, 2, 4, 5, 6, 7, 8, 9] == sorted(
+            r.resource['n'] for r in results if r.ok)
+        failed = [r for r in results if not r.ok]
+        assert [url + '3'] == [r.url for r in failed]
+        assert isinstance(failed[0].error, ServerError)
+
+    @httpretty.activate
+    def test_fetch_many_raw_keeps_the_decoded_json(self):
+        client = Client(FakeAuth())
+        url = client.get_bitbucket_url() + '/2.0/users/evzijst'
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            content_type='application/json',
+            body='{"type": "user", "username": "evzijst"}',
+            status=200)
+        result = next(client.fetch_many([url], raw=True))
+        assert {'type': 'user', 'username': 'evzijst'} == result.resource
+
+    def test_fields_to_add_or_remove_are_kept_as_they_are(self):
+        assert '+values.id,-values.links' == Client.fields_query(
+            ['+values.id', '-values.links'])
+
+    def test_fields_to_include_keep_pagination_and_identity(self):
+        fields = Client.fields_query('values.title, values.updated_on')
+        kept = fields.split(',')
+        assert ['values.title', 'values.updated_on'] == kept[:2]
+        assert 'next' in kept
+        assert 'values.links.self' in kept
+        assert 'values.full_name' in kept
+
+    def test_fields_to_add_or_remove_among_fields_to_include(self):
+        kept = Client.fields_query(
+            'values.title,+values.state,-values.full_name,'
+            '-values.author.links').split(',')
+        assert ['values.title', 'values.state'] == kept[:2]
+        assert 'values.links.self' in kept
+        assert 'values.full_name' not in kept
+        assert '-values.author.links' == kept[-1]
+        assert not [f for f in kept[:-1] if f[0] in '+-']
+
+    def test_fields_of_a_single_resource_have_no_prefix(self):
+        kept = Client.fields_query('title').split(',')
+        assert 'links.self' in kept
+        assert 'next' not in kept
+
+    def test_identifying_fields_cover_every_resource_type(self):
+        Client.bitbucket_types.load_all()
+        for t in Client.bitbucket_types.by_resource_type.values():
+            for resource in t:
+                assert resource.id_attribute in Client.identifying_fields
+
+    @httpretty.activate
+    def test_relationships_ask_for_fields(self):
+        client = Client(FakeAuth())
+        url = 'https://api.bitbucket.org/2.0/repositories/teamsinspace'
+        self_url = url + '/teamsinspace.bitbucket.org'
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            content_type='application/json',
+            body=json.dumps({'values': [{
+                'full_name': 'teamsinspace/teamsinspace.bitbucket.org',
+                'links': {'self': {'href': self_url}}}]}),
+            status=200)
+        repositories = list(client.remote_relationship(
+            url, fields=['values.full_name']))
+        fields = httpretty.last_request().querystring['fields'][0]
+        assert 'values.full_name' == fields.split(',')[0]
+        repository = repositories[0]
+        assert 'Repository' == type(repository).__name__
+        assert ['full_name', 'links'] == sorted(repository.attributes())
+        assert ['self'] == repository.relationships()
+
+    def test_one_root_per_client(self):
+        client = Client(FakeAuth())
+        assert isinstance(client.root, Bitbucket)
+        assert client.root is client.root
+        assert client is client.root.client
+        assert Client(FakeAuth()).root is not client.root
+
+    def test_roots_share_the_parsed_entrypoints(self):
+        assert Bitbucket(Client(FakeAuth())).data is \
+            Bitbucket(Client(FakeAuth())).data
+        root = Bitbucket(Client(FakeAuth()))
+        assert 'userByUsername' in dir(root)
+        assert root.userByUsername is root.userByUsername
+
+    @httpretty.activate
+    def test_relationships_expand_compiled_templates(self):
+        client = Client(FakeAuth())
+        url = 'https://api.bitbucket.org/2.0/users/evzijst'
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            content_type='application/json',
+            body='{"username": "evzijst"}',
+            status=200)
+        users = list(client.root.userByUsername(username='evzijst'))
+        assert [{'username': 'evzijst'}] == users
+
+    def test_no_client_is_made_at_import(self):
+        # A default Client() argument would create a session at import.
+        defaults = [
+            (module.__name__, name)
+            for module in list(sys.modules.values())
+            if getattr(module, '__name__', '').startswith('pybitbucket.')
+            for name, f in inspect.getmembers(
+                module,
+                lambda m: inspect.isfunction(m) or inspect.isclass(m))
+            for d in self.defaults_of(f)
+            if isinstance(d, Client)]
+        assert [] == defaults
+
+    @staticmethod
+    def defaults_of(f):
+        functions = [f] if inspect.isfunction(f) else [
+            m for (_, m) in inspect.getmembers(f, inspect.isfunction)]
+        return [d for g in functions for d in (g.__defaults__ or ())]
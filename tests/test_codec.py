@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import httpretty
+import json
+from functools import partial
+
+import pytest
+import requests
+
+from test_auth import FakeAuth
+
+from pybitbucket.bitbucket import Client, RepositoryType
+from pybitbucket.codec import JSONCodec, OrjsonCodec
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CODECS = [JSONCodec]
+if orjson is not None:
+    CODECS.append(OrjsonCodec)
+
+
+class RecordingCodec(JSONCodec):
+    def __init__(self):
+        self.decoded = 0
+
+    def decode(self, response):
+        self.decoded += 1
+        return super(RecordingCodec, self).decode(response)
+
+
+class TestCodecs(object):
+    @pytest.mark.parametrize('codec', CODECS)
+    def test_enums_are_encoded_as_their_value(self, codec):
+        payload = {'scm': RepositoryType.GIT, 'name': u'caf\xe9'}
+        encoded = codec().encode(payload)
+        assert {'scm': 'git', 'name': u'caf\xe9'} == json.loads(
+            encoded.decode('utf-8'))
+
+    @pytest.mark.parametrize('codec', CODECS)
+    def test_loads_text_and_bytes(self, codec):
+        assert {'a': [1]} == codec().loads('{"a": [1]}')
+        assert {'a': [1]} == codec().loads(b'{"a": [1]}')
+
+    def test_requests_is_not_patched(self):
+        # Encoding enums is up to each client, not to requests.
+        assert not isinstance(
+            requests.models.complexjson.dumps, partial)
+
+    @pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+    def test_orjson_requires_nothing_else(self):
+        assert OrjsonCodec().orjson is orjson
+
+
+class TestClientCodec(object):
+    def setup_method(self, method):
+        self.codec = RecordingCodec()
+        self.client = Client(FakeAuth(), codec=self.codec)
+        self.url = self.client.get_bitbucket_url() + '/2.0/things'
+
+    @httpretty.activate
+    def test_pages_are_decoded_with_the_codec(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.url,
+            content_type='application/json',
+            body='{"values": [{"n": 1}, {"n": 2}]}',
+            status=200)
+        items = list(self.client.remote_relationship(self.url))
+        assert [1, 2] == [i['n'] for i in items]
+        assert 1 == self.codec.decoded
+
+    @httpretty.activate
+    def test_payloads_are_encoded_with_the_codec(self):
+        httpretty.register_uri(
+            httpretty.POST,
+            self.url,
+            content_type='application/json',
+            body='{"n": 1}',
+            status=200)
+        self.client.post(
+            self.url,
+            json={'scm': RepositoryType.HG},
+            headers={'X-Extra': 'kept'})
+        request = httpretty.last_request()
+        assert {'scm': 'hg'} == json.loads(request.body.decode('utf-8'))
+        assert 'application/json' == request.headers['Content-Type']
+        assert 'kept' == request.headers['X-Extra']
+        assert 1 == self.codec.decoded
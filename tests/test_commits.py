@@ -62,6 +62,40 @@ class TestCommit(object):
         assert commit_hash == commit.hash
         assert 'Testing with some copied html' == commit.message
 
+    @httpretty.activate
+    def test_find_commits_by_revisions(self):
+        found = 'c021208234c65439f57b8244517a2b850b3ecf44'
+        missing = '0000000000000000000000000000000000000000'
+        url = (
+            self.client.get_bitbucket_url() +
+            '/2.0/repositories/' +
+            'teamsinspace/teamsinspace.bitbucket.org' +
+            '/commit/')
+        httpretty.register_uri(
+            httpretty.GET,
+            url + found,
+            content_type='application/json',
+            body=data_from_file(self.test_dir, 'Commit.json'),
+            status=200)
+        httpretty.register_uri(
+            httpretty.GET,
+            url + missing,
+            content_type='application/json',
+            body='{"error": {"message": "Commit not found"}}',
+            status=404)
+        results = {
+            r.url: r
+            for r in Commit.find_commits_by_revisions(
+                'teamsinspace',
+                'teamsinspace.bitbucket.org',
+                [found, missing],
+                client=self.client)}
+        assert results[url + found].ok
+        assert found == results[url + found].resource.hash
+        assert not results[url + missing].ok
+        assert results[url + missing].resource is None
+        assert 404 == results[url + missing].error.response.status_code
+
     def test_commit_author(self):
         commit = self.load_example_commit()
         assert 'Daniel  Stevens <dstevens@atlassian.com>' == commit.raw_author
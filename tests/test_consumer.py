@@ -100,6 +100,20 @@ class TestGettingLinks(ConsumerFixture):
         assert set(['username', 'bitbucket_url']) == \
             variables(self._consumers)
 
+    def test_links_are_parsed_once_per_class(self):
+        assert Consumer.link_templates() is Consumer.link_templates()
+
+    def test_expanding_a_link_matches_its_template(self):
+        values = {
+            'bitbucket_url': 'https://api.bitbucket.org',
+            'username': 'pybitbucket',
+            'consumer_id': 1,
+        }
+        assert expand(self._self, values) == \
+            Consumer.expand_link_url('self', **values)
+        assert expand(self._self, values) == \
+            Consumer.expand_link_urls(**values)['_links']['self']['href']
+
 
 class TestCreatingConsumerPayload(ConsumerPayloadFixture):
     @classmethod
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 import json
+from concurrent.futures import ThreadPoolExecutor
 from os import path
+from threading import Barrier
+
+import pytest
 from test_auth import FakeAuth
 
 from util import data_from_file
@@ -64,3 +68,76 @@ class TestEmbeddedResources(object):
         assert isinstance(my_snip, Snippet)
         assert isinstance(my_snip.owner, User)
         assert isinstance(my_snip.creator, User)
+
+    def test_embedded_resources_are_built_when_first_used(self):
+        example = json.loads(
+                data_from_file(
+                    self.test_dir,
+                    'PullRequest.json'))
+        built = []
+
+        class CountingClient(Client):
+            def convert_to_object(self, data):
+                built.append(data)
+                return super(CountingClient, self).convert_to_object(data)
+
+        client = CountingClient(FakeAuth())
+        pullrequest = client.convert_to_object(example)
+        assert 1 == len(built)
+        assert 'author' in dir(pullrequest)
+        author = pullrequest.author
+        assert isinstance(author, User)
+        assert 2 == len(built)
+        # Once built, the same resource is kept.
+        assert author is pullrequest.author
+        assert 2 == len(built)
+
+    def test_commit_raw_author_is_kept_apart(self):
+        commit = Commit(
+            json.loads(data_from_file(self.test_dir, 'Commit.json')),
+            client=self.client)
+        assert 'raw_author' in dir(commit)
+        assert commit.raw_author.startswith('Daniel')
+        assert isinstance(commit.author, User)
+
+    def test_missing_attributes_are_still_missing(self):
+        assert not hasattr(self.commit, 'no_such_attribute')
+        assert 'fallback' == getattr(self.commit, 'no_such_attribute',
+                                     'fallback')
+
+    def test_a_failed_build_can_be_tried_again(self):
+        example = json.loads(
+                data_from_file(
+                    self.test_dir,
+                    'PullRequest.json'))
+        failures = [ValueError('first try')]
+
+        class FlakyClient(Client):
+            def convert_to_object(self, data):
+                if data is not example and failures:
+                    raise failures.pop()
+                return super(FlakyClient, self).convert_to_object(data)
+
+        pullrequest = FlakyClient(FakeAuth()).convert_to_object(example)
+        with pytest.raises(ValueError):
+            pullrequest.author
+        assert isinstance(pullrequest.author, User)
+
+    def test_threads_share_one_built_resource(self):
+        example = json.loads(
+                data_from_file(
+                    self.test_dir,
+                    'PullRequest.json'))
+        barrier = Barrier(8, timeout=10)
+
+        class SlowClient(Client):
+            def convert_to_object(self, data):
+                if data is not example:
+                    barrier.wait()
+                return super(SlowClient, self).convert_to_object(data)
+
+        pullrequest = SlowClient(FakeAuth()).convert_to_object(example)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            authors = list(executor.map(
+                lambda _: pullrequest.author, range(8)))
+        assert all(a is pullrequest.author for a in authors)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+import httpretty
+import json
+import os
+import pytest
+import re
+import sqlite3
+from threading import Thread
+
+from test_auth import FakeAuth
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.mirror import Mirror
+from pybitbucket.pullrequest import PullRequest, PullRequestState
+from pybitbucket.ref import Branch
+from pybitbucket.repository import Repository
+
+API = 'https://api.bitbucket.org/2.0/repositories/'
+
+
+class FakeBitbucket(object):
+    """
+    The repositories of teamsinspace, with their pull requests,
+    branches, tags, and commits, filtered by updated_on like Bitbucket.
+    """
+
+    def __init__(self):
+        self.repositories = {}
+        self.pullrequests = {}
+        self.commits = {}
+        self.requests = []
+
+    def add_repository(self, name, updated_on):
+        self.repositories[name] = {
+            'full_name': 'teamsinspace/' + name,
+            'updated_on': updated_on,
+            'links': {'self': {'href': API + 'teamsinspace/' + name}}}
+        self.pullrequests.setdefault(name, {})
+        self.commits.setdefault(name, [])
+
+    def add_pullrequest(self, name, id, state, updated_on):
+        self.pullrequests[name][id] = {
+            'id': id,
+            'title': 'PR {0}'.format(id),
+            'state': state,
+            'updated_on': updated_on,
+            'links': {'self': {'href': '{0}teamsinspace/{1}/pullrequests/{2}'
+                               .format(API, name, id)}}}
+
+    def push(self, name, *revisions):
+        self.commits[name][:0] = [
+            {'hash': r, 'date': '2017-01-0{0}T00:00:00+00:00'.format(
+                len(self.commits[name]) + len(revisions) - i),
+             'links': {'self': {'href': '{0}teamsinspace/{1}/commit/{2}'
+                                .format(API, name, r)}}}
+            for (i, r) in enumerate(revisions)]
+
+    @staticmethod
+    def updated_since(query, values):
+        q = query.get('q', [''])[0]
+        if q:
+            # The + of the timezone is decoded as a space by httpretty.
+            since = re.match(
+                r'updated_on > (.+)$', q).group(1).replace(' ', '+')
+            values = [v for v in values if v['updated_on'] > since]
+        if query.get('sort') == ['-updated_on']:
+            values = sorted(
+                values, key=lambda v: v['updated_on'], reverse=True)
+        return values
+
+    def __call__(self, request, uri, headers):
+        path = uri.split('?')[0].split('/2.0/repositories/')[1].split('/')
+        query = request.querystring
+        self.requests.append((path, query))
+        if len(path) == 1:
+            values = self.updated_since(
+                query, list(self.repositories.values()))
+        elif path[2] == 'pullrequests':
+            states = query.get('state', ['OPEN'])
+            values = self.updated_since(query, [
+                pr for pr in self.pullrequests[path[1]].values()
+                if pr['state'] in states])
+        elif path[2] == 'refs':
+            kind = path[3][:-1]
+            values = [
+                {'name': '{0}-{1}'.format(kind, path[1]),
+                 'target': {'date': '2017-01-01T00:00:00+00:00'},
+                 'links': {'self': {'href': '{0}teamsinspace/{1}/refs/{2}/'
+                                    '{3}-{1}'.format(API, path[1], path[3],
+                                                     kind)}}}]
+        else:
+            values = self.commits[path[1]]
+            for excluded in query.get('exclude', []):
+                values = values[:[c['hash'] for c in values].index(excluded)]
+        return (200, headers, json.dumps({'values': values}))
+
+    def register(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            re.compile(r'https://.*/2\.0/repositories/.*'),
+            content_type='application/json',
+            body=self)
+
+
+class TestMirror(object):
+    @staticmethod
+    def mirror(tmpdir, **kwargs):
+        return Mirror(
+            os.path.join(str(tmpdir), 'mirror.sqlite'),
+            owners=['teamsinspace'],
+            client=Client(FakeAuth()),
+            **kwargs)
+
+    @staticmethod
+    def bitbucket():
+        bitbucket = FakeBitbucket()
+        bitbucket.add_repository('site', '2017-01-01T00:00:00+00:00')
+        bitbucket.add_repository('design', '2017-01-02T00:00:00+00:00')
+        bitbucket.add_pullrequest(
+            'site', 1, 'MERGED', '2017-01-01T00:00:00+00:00')
+        bitbucket.add_pullrequest(
+            'site', 2, 'OPEN', '2017-01-03T00:00:00+00:00')
+        bitbucket.push('site', 'b', 'a')
+        bitbucket.push('design', 'c')
+        bitbucket.register()
+        return bitbucket
+
+    @httpretty.activate
+    def test_refresh_mirrors_every_repository(self, tmpdir):
+        self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        results = mirror.refresh()
+        assert all(r.ok for r in results)
+        assert {
+            'pullrequest': 2, 'branch': 1, 'tag': 1, 'commit': 2
+        } == [r for r in results if r.repository_name == 'site'][0].counts
+        assert ['teamsinspace/design', 'teamsinspace/site'] == [
+            r.full_name for r in mirror.repositories('teamsinspace')]
+
+    @httpretty.activate
+    def test_queries_rebuild_resources_without_requests(self, tmpdir):
+        self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        mirror.refresh()
+        mirror.close()
+        httpretty.reset()
+        httpretty.register_uri(
+            httpretty.GET, re.compile('.*'), status=500)
+        mirror = self.mirror(tmpdir)
+        repositories = list(mirror.repositories())
+        assert all(isinstance(r, Repository) for r in repositories)
+        open_prs = list(mirror.pullrequests(
+            'teamsinspace', 'site', state=PullRequestState.OPEN))
+        assert [2] == [pr.id for pr in open_prs]
+        assert isinstance(open_prs[0], PullRequest)
+        assert [2, 1] == [
+            pr['id'] for pr in mirror.pullrequests(raw=True)]
+        assert [1] == [pr.id for pr in mirror.pullrequests(
+            'teamsinspace', 'site', state='MERGED')]
+        assert [2] == [pr.id for pr in mirror.pullrequests(
+            since='2017-01-02T00:00:00+00:00')]
+        branches = list(mirror.branches('teamsinspace', 'site'))
+        assert isinstance(branches[0], Branch)
+        assert ['tag-site'] == [
+            t.name for t in mirror.tags('teamsinspace', 'site')]
+        assert ['b', 'a'] == [
+            c.hash for c in mirror.commits('teamsinspace', 'site')]
+        assert not httpretty.latest_requests()
+
+    @httpretty.activate
+    def test_refresh_only_asks_for_what_changed(self, tmpdir):
+        bitbucket = self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        mirror.refresh()
+        bitbucket.add_pullrequest(
+            'site', 1, 'DECLINED', '2017-01-04T00:00:00+00:00')
+        bitbucket.push('site', 'd')
+        bitbucket.requests = []
+        mirror.refresh()
+        queries = [
+            (path, query) for (path, query) in bitbucket.requests
+            if path[-1] == 'teamsinspace' or
+            path[1:] == ['site', 'pullrequests']]
+        assert all(
+            query['q'][0].startswith('updated_on > ')
+            for (_, query) in queries)
+        commit_requests = [
+            query for (path, query) in bitbucket.requests
+            if path[-1] == 'commits' and path[1] == 'site']
+        assert [['b']] == [q['exclude'] for q in commit_requests]
+        assert [(1, 'DECLINED'), (2, 'OPEN')] == sorted(
+            (pr.id, pr.state) for pr in mirror.pullrequests(
+                'teamsinspace', 'site'))
+        assert ['d', 'b', 'a'] == [
+            c.hash for c in mirror.commits('teamsinspace', 'site')]
+
+    @httpretty.activate
+    def test_repositories_are_listed_for_every_role(self, tmpdir):
+        bitbucket = self.bitbucket()
+        self.mirror(tmpdir).refresh()
+        assert [None] == [
+            query.get('role') for (path, query) in bitbucket.requests
+            if len(path) == 1]
+
+    @httpretty.activate
+    def test_refs_are_listed_again_for_updated_repositories(self, tmpdir):
+        bitbucket = self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        mirror.refresh()
+        bitbucket.requests = []
+        mirror.refresh()
+        assert [] == [p for (p, _) in bitbucket.requests if p[2:3] == ['refs']]
+        bitbucket.add_repository('site', '2017-01-05T00:00:00+00:00')
+        mirror.refresh()
+        assert [['site', 'branches'], ['site', 'tags']] == sorted(
+            [p[1], p[3]] for (p, _) in bitbucket.requests
+            if p[2:3] == ['refs'])
+        assert 1 == len(list(mirror.branches('teamsinspace', 'site')))
+
+    @httpretty.activate
+    def test_close_closes_the_connection_of_every_thread(self, tmpdir):
+        self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        connections = []
+        thread = Thread(
+            target=lambda: connections.append(mirror.database.connection))
+        thread.start()
+        thread.join()
+        mirror.close()
+        with pytest.raises(sqlite3.ProgrammingError):
+            connections[0].execute('SELECT 1')
+        mirror.refresh()
+        assert 2 == len(list(mirror.repositories('teamsinspace')))
+
+    @httpretty.activate
+    def test_full_refresh_forgets_deleted_repositories(self, tmpdir):
+        bitbucket = self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        mirror.refresh()
+        del bitbucket.repositories['design']
+        mirror.refresh(full=True)
+        assert ['teamsinspace/site'] == [
+            r['full_name'] for r in mirror.repositories(raw=True)]
+        assert [] == list(mirror.commits('teamsinspace', 'design'))
+
+    @httpretty.activate
+    def test_full_refresh_forgets_deleted_pullrequests_and_refs(self, tmpdir):
+        bitbucket = self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        mirror.refresh()
+        del bitbucket.pullrequests['site'][1]
+        mirror.refresh()
+        assert [2, 1] == [
+            pr.id for pr in mirror.pullrequests('teamsinspace', 'site')]
+        mirror.refresh(full=True)
+        assert [2] == [
+            pr.id for pr in mirror.pullrequests('teamsinspace', 'site')]
+        assert 1 == len(list(mirror.branches('teamsinspace', 'site')))
+
+    @httpretty.activate
+    def test_commits_that_failed_to_be_stored_are_read_again(self, tmpdir):
+        bitbucket = self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        mirror.refresh()
+        bitbucket.push('site', 'd')
+        store = mirror.store
+
+        def full_disk(kind, *args, **kwargs):
+            if kind == 'commit':
+                raise IOError('disk full')
+            return store(kind, *args, **kwargs)
+        mirror.store = full_disk
+        results = {r.repository_name: r for r in mirror.refresh()}
+        assert not results['site'].ok
+        mirror.store = store
+        mirror.refresh()
+        assert ['d', 'b', 'a'] == [
+            c.hash for c in mirror.commits('teamsinspace', 'site')]
+
+    @httpretty.activate
+    def test_an_error_is_kept_for_its_repository(self, tmpdir):
+        bitbucket = self.bitbucket()
+        del bitbucket.commits['design']
+        results = {
+            r.repository_name: r for r in self.mirror(tmpdir).refresh()}
+        assert results['site'].ok
+        assert not results['design'].ok
+
+    @httpretty.activate
+    def test_scheduled_refreshes(self, tmpdir):
+        self.bitbucket()
+        mirror = self.mirror(tmpdir)
+        refreshes = []
+        schedule = mirror.schedule(60, on_refresh=refreshes.append)
+        assert schedule.refreshed.wait(10)
+        schedule.stop(10)
+        assert not schedule.is_alive()
+        assert 1 == len(refreshes)
+        assert 2 == len(schedule.last_results)
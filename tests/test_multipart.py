@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+import httpretty
+from email.parser import BytesParser
+from io import BytesIO
+from os import path
+
+from requests.exceptions import ConnectionError
+from requests.models import Response
+
+from test_auth import FakeAuth
+
+from pybitbucket.bitbucket import Client, RepositoryType
+from pybitbucket.multipart import LazyFile, MultipartUpload
+from pybitbucket.retry import RetryPolicy
+from pybitbucket.snippet import Snippet, SnippetPayload, open_files
+
+TEST_DIR = path.dirname(path.abspath(__file__))
+EXAMPLE = path.join(TEST_DIR, 'example_upload_1.txt')
+
+
+def parts_of(content_type, body):
+    message = BytesParser().parsebytes(
+        b'Content-Type: ' + content_type.encode('ascii') +
+        b'\r\n\r\n' + body)
+    return [
+        (
+            part.get_param('name', header='content-disposition'),
+            part.get_filename(),
+            part.get_payload(decode=True))
+        for part in message.get_payload()]
+
+
+def read_all(upload, size):
+    chunks = []
+    for chunk in iter(lambda: upload.read(size), b''):
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+class TestLazyFile(object):
+    def test_only_open_while_it_is_read(self):
+        lazy = LazyFile(EXAMPLE)
+        assert lazy.file is None
+        first = lazy.read(3)
+        assert lazy.file is not None
+        rest = read_all(lazy, 3)
+        assert lazy.file is None
+        with open(EXAMPLE, 'rb') as f:
+            assert f.read() == first + rest
+        assert len(lazy) == len(first + rest)
+
+
+class TestMultipartUpload(object):
+    def upload(self, **kwargs):
+        return MultipartUpload(
+            fields={
+                'title': 'Title',
+                'scm': RepositoryType.GIT,
+                'is_private': True,
+                'owner': {'username': 'not sent'},
+            },
+            files=[EXAMPLE, ('file', ('other.txt', BytesIO(b'other')))],
+            chunk_size=4,
+            **kwargs)
+
+    def test_fields_and_files_are_parts(self):
+        upload = self.upload()
+        body = read_all(upload, 7)
+        with open(EXAMPLE, 'rb') as f:
+            example = f.read()
+        assert [
+            ('is_private', None, b'true'),
+            ('scm', None, b'git'),
+            ('title', None, b'Title'),
+            ('file', 'example_upload_1.txt', example),
+            ('file', 'other.txt', b'other'),
+        ] == parts_of(upload.content_type, body)
+        assert len(upload) == len(body)
+
+    def test_reading_again_starts_over(self):
+        upload = self.upload()
+        assert read_all(upload, 5) == read_all(upload, 1000)
+
+    def test_rewinding_starts_a_partly_read_body_over(self):
+        upload = self.upload()
+        whole = read_all(upload, 1000)
+        upload.read(100)
+        upload.rewind()
+        assert whole == read_all(upload, 7)
+        assert all(f.file is None for (_, f) in upload.parts
+                   if isinstance(f, LazyFile))
+
+    def test_progress_is_reported(self):
+        reports = []
+        upload = self.upload(progress=lambda *report: reports.append(report))
+        read_all(upload, 10)
+        assert len(reports) > 1
+        assert (len(upload), len(upload)) == reports[-1]
+        sent = [s for (s, _) in reports]
+        assert sorted(sent) == sent
+
+
+class TestUploadingSnippetFiles(object):
+    @httpretty.activate
+    def test_create_streams_fields_and_files(self):
+        client = Client(FakeAuth())
+        url = client.get_bitbucket_url() + '/2.0/snippets'
+        with open(path.join(TEST_DIR, 'Snippet.json')) as f:
+            httpretty.register_uri(
+                httpretty.POST,
+                url,
+                content_type='application/json',
+                body=f.read(),
+                status=200)
+        files = open_files([EXAMPLE])
+        reports = []
+        snippet = Snippet.create(
+            files,
+            SnippetPayload().add_title('Uploaded'),
+            client=client,
+            progress=lambda *report: reports.append(report))
+        request = httpretty.last_request()
+        parts = parts_of(request.headers['Content-Type'], request.body)
+        assert ('title', None, b'Uploaded') == parts[0]
+        assert 'example_upload_1.txt' == parts[1][1]
+        assert str(len(request.body)) == request.headers['Content-Length']
+        assert reports[-1][0] == len(request.body)
+        assert isinstance(snippet, Snippet)
+        # Every file was closed once it was sent.
+        assert all(f.file is None for (_, (_, f)) in files)
+
+    def test_a_retried_upload_sends_the_whole_body(self):
+        bodies = []
+
+        class FlakySession(object):
+            def put(self, url, data=None, **kwargs):
+                if not bodies:
+                    # The connection drops after part of the body is sent.
+                    bodies.append(data.read(100))
+                    raise ConnectionError()
+                bodies.append(read_all(data, 7))
+                response = Response()
+                response.status_code = 200
+                return response
+
+        client = Client(
+            FakeAuth(),
+            retry=RetryPolicy(backoff_factor=0, sleep=lambda _: None))
+        client.session = FlakySession()
+        client.expect_ok = lambda response: None
+        client.json_from = lambda response: {}
+        client.put('https://example.com/upload', files=[EXAMPLE])
+        first, second = bodies
+        assert 100 == len(first)
+        assert second.startswith(first)
+        assert second.endswith(b'--\r\n')
+        with open(EXAMPLE, 'rb') as f:
+            assert f.read() in second
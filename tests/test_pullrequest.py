@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 from test_bitbucketbase import BitbucketFixture
 import json
+from datetime import datetime
+from io import BytesIO
 
 import httpretty
 from past.builtins import basestring
@@ -8,6 +10,7 @@ from uritemplate import expand
 from pybitbucket.pullrequest import (
     PullRequest, PullRequestPayload, PullRequestState)
 from pybitbucket.bitbucket import Bitbucket
+from pybitbucket.query import Field
 from pybitbucket.comment import Comment
 from pybitbucket.commit import Commit
 from pybitbucket.repository import Repository
@@ -295,6 +298,43 @@ class TestFindingPullRequestsByState(PullRequestFixture):
             client=self.test_client)
         assert isinstance(next(response), PullRequest)
 
+    @httpretty.activate
+    def test_pagelen_and_max_items_are_passed_through(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.url,
+            content_type='application/json',
+            body=self.resource_list_data(),
+            status=200)
+        response = PullRequest.find_pullrequests_for_repository_by_state(
+            repository_name=self.source_repository_name,
+            owner=self.source_repository_owner,
+            state=self.state,
+            client=self.test_client,
+            pagelen=50,
+            max_items=1)
+        assert 1 == len(list(response))
+        assert ['50'] == httpretty.last_request().querystring['pagelen']
+
+    @httpretty.activate
+    def test_filter_and_sort_are_sent_to_bitbucket(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.url,
+            content_type='application/json',
+            body=self.resource_list_data(),
+            status=200)
+        response = PullRequest.find_pullrequests_for_repository_by_state(
+            repository_name=self.source_repository_name,
+            owner=self.source_repository_owner,
+            client=self.test_client,
+            q=Field('updated_on') > datetime(2017, 1, 2, 3, 4, 5),
+            sort=Field('updated_on').descending())
+        assert isinstance(next(response), PullRequest)
+        query = httpretty.last_request().querystring
+        assert ['updated_on > 2017-01-02T03:04:05'] == query['q']
+        assert ['-updated_on'] == query['sort']
+
 
 class TestAccessingLinks(PullRequestFixture):
     @classmethod
@@ -343,6 +383,37 @@ class TestAccessingLinks(PullRequestFixture):
         response = self.response.diff()
         assert isinstance(response, basestring)
 
+    @httpretty.activate
+    def test_diff_files_are_parsed_as_they_arrive(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.diff_url,
+            body=self.diff_data,
+            status=200)
+        files = self.response.diff_files()
+        setup = next(files)
+        assert ('setup.py', 1, 1) == (
+            setup.path, setup.added, setup.removed)
+        init = next(files)
+        assert ('snippet/__init__.py', 2, 0) == (
+            init.path, init.added, init.removed)
+        assert [11] == [h.old_start for h in init.hunks]
+
+    @httpretty.activate
+    def test_diff_can_be_downloaded_or_spooled(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.diff_url,
+            body=self.diff_data,
+            status=200)
+        destination = BytesIO()
+        size = self.response.download_diff(destination)
+        expected = self.diff_data.encode('utf-8')
+        assert (len(expected), expected) == (size, destination.getvalue())
+        spooled = self.response.spool_diff()
+        assert expected == spooled[:]
+        spooled.close()
+
     @httpretty.activate
     def test_activity_is_a_dictionary_generator(self):
         httpretty.register_uri(
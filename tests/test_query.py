@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from datetime import date, datetime
+
+import pytest
+
+from pybitbucket.pullrequest import PullRequestState
+from pybitbucket.query import Field, ascending, descending
+
+
+class TestFilters(object):
+    def test_strings_are_quoted_and_escaped(self):
+        assert 'title = "say \\"hi\\" \\\\o/"' == \
+            str(Field('title') == 'say "hi" \\o/')
+
+    def test_values_of_other_types(self):
+        assert 'is_private = true' == str(Field('is_private') == True)  # noqa
+        assert 'parent != null' == str(Field('parent') != None)  # noqa
+        assert 'size >= 1024' == str(Field('size') >= 1024)
+        assert 'state = "OPEN"' == str(
+            Field('state') == PullRequestState.OPEN)
+        assert 'created_on < 2017-01-02' == str(
+            Field('created_on') < date(2017, 1, 2))
+        assert 'updated_on > 2017-01-02T03:04:05' == str(
+            Field('updated_on') > datetime(2017, 1, 2, 3, 4, 5))
+
+    def test_text_matches(self):
+        assert 'name ~ "fix"' == str(Field('name').contains('fix'))
+        assert 'name !~ "wip"' == str(Field('name').does_not_contain('wip'))
+
+    def test_filters_combine_with_and_and_or(self):
+        q = (
+            (Field('state') == 'OPEN') &
+            (Field('author.username') == 'evzijst') &
+            ((Field('title').contains('fix')) | (Field('title') == 'bug')))
+        assert (
+            'state = "OPEN" AND author.username = "evzijst" AND '
+            '(title ~ "fix" OR title = "bug")') == str(q)
+
+    def test_is_in_is_one_of_the_values(self):
+        q = Field('state').is_in(['OPEN', 'MERGED']) & (Field('id') > 3)
+        assert '(state = "OPEN" OR state = "MERGED") AND id > 3' == str(q)
+        with pytest.raises(ValueError):
+            Field('state').is_in([])
+
+
+class TestSorting(object):
+    def test_sort_order(self):
+        assert 'name' == ascending('name')
+        assert '-updated_on' == descending('updated_on')
+        assert '-updated_on' == Field('updated_on').descending()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import httpretty
+import os
+from threading import Thread
+
+from requests import Session, models
+from requests.adapters import HTTPAdapter
+
+from test_auth import FakeAuth
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.ratelimit import (
+    RateLimitedAdapter, SQLiteTokenBucket, TokenBucket)
+
+
+class RecordedSleep(object):
+    def __init__(self):
+        self.waits = []
+
+    def __call__(self, seconds):
+        self.waits.append(seconds)
+
+
+class Response(object):
+    def __init__(self, status_code=200, **headers):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class TestTokenBucket(object):
+    def test_requests_within_the_budget_do_not_wait(self):
+        sleep = RecordedSleep()
+        bucket = TokenBucket(budget=3, window=60, sleep=sleep)
+        for _ in range(3):
+            bucket.acquire('me')
+        assert [] == sleep.waits
+        assert 0 == bucket.remaining('me')
+
+    def test_requests_beyond_the_budget_wait_their_turn(self):
+        sleep = RecordedSleep()
+        bucket = TokenBucket(budget=2, window=60, sleep=sleep)
+        for _ in range(4):
+            bucket.acquire('me')
+        # One token every 30 seconds, reserved in order.
+        assert [30, 60] == [round(w) for w in sleep.waits]
+
+    def test_credentials_have_their_own_budget(self):
+        bucket = TokenBucket(budget=2, window=60)
+        bucket.acquire('me')
+        assert 1 == bucket.remaining('me')
+        assert 2 == bucket.remaining('someone else')
+
+    def test_remaining_header_lowers_the_budget(self):
+        bucket = TokenBucket(budget=100, window=60)
+        bucket.observe('me', Response(**{'X-RateLimit-Remaining': '10'}))
+        assert 10 == bucket.remaining('me')
+
+    def test_near_limit_header_lowers_the_budget(self):
+        bucket = TokenBucket(budget=100, window=60)
+        bucket.observe('me', Response(**{'X-RateLimit-NearLimit': 'true'}))
+        assert 20 == bucket.remaining('me')
+
+    def test_too_many_requests_waits_for_retry_after(self):
+        sleep = RecordedSleep()
+        bucket = TokenBucket(budget=60, window=60, sleep=sleep)
+        bucket.observe('me', Response(429, **{'Retry-After': '5'}))
+        bucket.acquire('me')
+        assert 6 == round(sleep.waits[0])
+
+
+class TestSQLiteTokenBucket(object):
+    @staticmethod
+    def path(tmpdir):
+        return os.path.join(str(tmpdir), 'buckets.sqlite')
+
+    def test_buckets_are_shared(self, tmpdir):
+        first = SQLiteTokenBucket(self.path(tmpdir), budget=10, window=3600)
+        second = SQLiteTokenBucket(self.path(tmpdir), budget=10, window=3600)
+        first.acquire('me')
+        second.acquire('me')
+        assert 8 == first.remaining('me')
+
+    def test_credentials_are_not_written_to_disk(self, tmpdir):
+        bucket = SQLiteTokenBucket(self.path(tmpdir), budget=10)
+        bucket.acquire('https://api.bitbucket.org cid SECRET-TOKEN')
+        rows = bucket.database.execute('SELECT key FROM buckets').fetchall()
+        assert 1 == len(rows)
+        assert 'SECRET' not in rows[0][0]
+        assert 9 == bucket.remaining(
+            'https://api.bitbucket.org cid SECRET-TOKEN')
+
+    def test_concurrent_requests_take_every_token_once(self, tmpdir):
+        sleep = RecordedSleep()
+        buckets = [
+            SQLiteTokenBucket(
+                self.path(tmpdir),
+                budget=40,
+                window=3600,
+                sleep=sleep)
+            for _ in range(4)]
+
+        def take(bucket):
+            for _ in range(10):
+                bucket.acquire('me')
+
+        threads = [Thread(target=take, args=(b,)) for b in buckets]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert 0 == buckets[0].remaining('me')
+        assert [] == sleep.waits
+
+
+class TestRateLimitedClient(object):
+    @httpretty.activate
+    def test_every_request_takes_a_token(self):
+        client = Client(FakeAuth(), rate_limiter=TokenBucket(budget=10))
+        url = client.get_bitbucket_url() + '/2.0/things'
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            content_type='application/json',
+            adding_headers={'X-RateLimit-Remaining': '5'},
+            body='{"n": 1}',
+            status=200)
+        client.get_page(url)
+        client.get_page(url)
+        assert 4 == client.get_remaining_requests()
+
+    def test_mounting_keeps_the_adapters_of_the_session(self):
+        sent = []
+
+        class RecordingAdapter(HTTPAdapter):
+            def send(self, request, **kwargs):
+                sent.append(request.url)
+                response = models.Response()
+                response.status_code = 200
+                response._content = b''
+                response.request = request
+                return response
+
+        session = Session()
+        custom = RecordingAdapter(max_retries=3, pool_maxsize=32)
+        session.mount('https://', custom)
+        bucket = TokenBucket(budget=10)
+        bucket.mount(session, lambda: 'me')
+        bucket.mount(session, lambda: 'me')
+        adapter = session.get_adapter('https://api.bitbucket.org/2.0/user')
+        assert isinstance(adapter, RateLimitedAdapter)
+        assert custom is adapter.adapter
+        assert 3 == adapter.max_retries.total
+        session.get('https://api.bitbucket.org/2.0/user')
+        assert ['https://api.bitbucket.org/2.0/user'] == sent
+        assert 9 == bucket.remaining('me')
+
+    @httpretty.activate
+    def test_refreshed_tokens_share_a_budget(self):
+        class TokenAuth(FakeAuth):
+            token = 'first'
+
+            def get_identity(self):
+                return '{0} cid {1}'.format(self.server_base_uri, self.token)
+
+        auth = TokenAuth()
+        client = Client(auth, rate_limiter=TokenBucket(budget=10))
+        url = client.get_bitbucket_url() + '/2.0/things'
+        httpretty.register_uri(
+            httpretty.GET,
+            url,
+            content_type='application/json',
+            body='{"n": 1}',
+            status=200)
+        client.get_page(url)
+        auth.token = 'refreshed'
+        client.get_page(url)
+        assert 8 == client.get_remaining_requests()
+        assert ['first' not in k and 'refreshed' not in k
+                for k in client.rate_limiter.buckets] == [True]
+
+    def test_without_a_rate_limiter(self):
+        assert Client(FakeAuth()).get_remaining_requests() is None
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import httpretty
+import json
 from os import path
 from test_auth import FakeAuth
 
@@ -99,3 +100,110 @@ class TestRemoteRelationships(object):
         s = "%s" % snippet_list[0]
         assert s.startswith('Snippet id:')
         assert 5 == len(snippet_list)
+
+    @httpretty.activate
+    def test_two_pages_of_items_with_prefetch(self):
+        url1 = (
+            self.client.get_bitbucket_url() +
+            '/2.0/snippets' +
+            '?role=owner')
+        url2 = url1 + '&page=2'
+        for (url, filename) in (
+                (url1, 'example_snippets_page_1.json'),
+                (url2, 'example_snippets_page_2.json')):
+            httpretty.register_uri(
+                httpretty.GET,
+                url,
+                match_querystring=True,
+                content_type='application/json',
+                body=data_from_file(self.test_dir, filename),
+                status=200)
+        serial = list(self.client.remote_relationship(url1))
+        prefetched = list(self.client.remote_relationship(url1, prefetch=2))
+        assert 5 == len(prefetched)
+        assert [s.id for s in serial] == [s.id for s in prefetched]
+
+    @httpretty.activate
+    def test_many_pages_are_kept_in_order(self):
+        url = self.client.get_bitbucket_url() + '/2.0/things'
+        pages = 6
+        for page in range(1, pages + 1):
+            example = {
+                'page': page,
+                'pagelen': 2,
+                'size': 2 * pages,
+                'values': [{'n': 2 * page - 1}, {'n': 2 * page}],
+            }
+            if page < pages:
+                example['next'] = url + '?page={0}'.format(page + 1)
+            httpretty.register_uri(
+                httpretty.GET,
+                url + ('?page={0}'.format(page) if page > 1 else ''),
+                match_querystring=True,
+                content_type='application/json',
+                body=json.dumps(example),
+                status=200)
+        items = list(self.client.remote_relationship(url, prefetch=3))
+        assert list(range(1, 2 * pages + 1)) == [i['n'] for i in items]
+
+    def test_later_page_urls_from_page_size_and_pagelen(self):
+        json_data = {
+            'page': 2,
+            'pagelen': 10,
+            'size': 41,
+            'next': 'https://example.com/2.0/things?q=x&page=3',
+        }
+        assert [
+            'https://example.com/2.0/things?q=x&page=3',
+            'https://example.com/2.0/things?q=x&page=4',
+            'https://example.com/2.0/things?q=x&page=5',
+        ] == Client.later_page_urls(json_data)
+
+    def test_later_page_urls_need_the_size(self):
+        json_data = {
+            'page': 1,
+            'pagelen': 30,
+            'next': 'https://example.com/2.0/commits?page=2',
+        }
+        assert [] == Client.later_page_urls(json_data)
+
+    @httpretty.activate
+    def test_max_items_does_not_fetch_another_page(self):
+        url1 = (
+            self.client.get_bitbucket_url() +
+            '/2.0/snippets' +
+            '?role=owner')
+        httpretty.register_uri(
+            httpretty.GET,
+            url1,
+            match_querystring=True,
+            content_type='application/json',
+            body=data_from_file(
+                self.test_dir,
+                'example_snippets_page_1.json'),
+            status=200)
+        for prefetch in (0, 2):
+            snippets = list(self.client.remote_relationship(
+                url1,
+                prefetch=prefetch,
+                max_items=3))
+            assert 3 == len(snippets)
+        assert 2 == len(httpretty.HTTPretty.latest_requests)
+
+    @httpretty.activate
+    def test_pagelen_is_added_to_the_query(self):
+        url = (
+            self.client.get_bitbucket_url() +
+            '/2.0/snippets' +
+            '?role=owner')
+        httpretty.register_uri(
+            httpretty.GET,
+            url + '&pagelen=100',
+            match_querystring=True,
+            content_type='application/json',
+            body=data_from_file(
+                self.test_dir,
+                'example_snippets_page_2.json'),
+            status=200)
+        snippets = list(self.client.remote_relationship(url, pagelen=100))
+        assert 2 == len(snippets)
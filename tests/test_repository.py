@@ -119,6 +119,17 @@ class TestAccessingRepositoryAttributes(RepositoryFixture):
                 self.response.clone['https']
 
 
+class TestDeferringTheV1Companion(RepositoryFixture):
+    def test_v1_is_built_when_first_used_and_kept(self):
+        repository = self.example_object()
+        assert 'v1' not in vars(repository)
+        v1 = repository.v1
+        assert isinstance(v1, RepositoryV1)
+        assert v1 is repository.v1
+        assert self.full_name == '/'.join(
+            (v1.v2.owner_name, v1.v2.repository_name))
+
+
 class TestAccessingRepositoryV1Attributes(RepositoryV1Fixture):
     @classmethod
     def setup_class(cls):
@@ -211,6 +222,20 @@ class TestFindingRepositoryByFullName(RepositoryFixture):
             client=self.test_client)
         assert isinstance(response, Repository)
 
+    @httpretty.activate
+    def test_raw_response_is_the_decoded_json(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.resource_url(),
+            content_type='application/json',
+            body=self.resource_data(),
+            status=200)
+        response = Repository.find_repository_by_full_name(
+            full_name=self.full_name,
+            client=self.test_client,
+            raw=True)
+        assert json.loads(self.resource_data()) == response
+
 
 class TestFindingRepositoryByNameOnly(RepositoryFixture):
     @classmethod
@@ -283,6 +308,22 @@ class TestFindingRepositoriesForOwner(RepositoryFixture):
             role=RepositoryRole.MEMBER,
             client=self.test_client)
         assert isinstance(next(response), Repository)
+        assert ['member'] == httpretty.last_request().querystring['role']
+
+    @httpretty.activate
+    def test_no_role_finds_every_repository_of_the_owner(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.url,
+            content_type='application/json',
+            body=self.resource_list_data(),
+            status=200)
+        response = Repository.find_repositories_by_owner_and_role(
+            owner=self.owner,
+            role=None,
+            client=self.test_client)
+        assert isinstance(next(response), Repository)
+        assert 'role' not in httpretty.last_request().querystring
 
 
 class TestFindingRepositoriesForSelf(RepositoryFixture):
@@ -352,6 +393,36 @@ class TestFindingPublicRepositories(RepositoryFixture):
             client=self.test_client)
         assert isinstance(next(response), Repository)
 
+    @httpretty.activate
+    def test_raw_response_is_a_generator_of_dicts(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.url,
+            content_type='application/json',
+            body=self.resource_list_data(),
+            status=200)
+        response = Repository.find_public_repositories(
+            client=self.test_client,
+            raw=True)
+        item = next(response)
+        assert isinstance(item, dict)
+        assert 'full_name' in item
+
+    @httpretty.activate
+    def test_fields_are_asked_for(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.url,
+            content_type='application/json',
+            body=self.resource_list_data(),
+            status=200)
+        response = Repository.find_public_repositories(
+            client=self.test_client,
+            fields='-values.owner')
+        assert isinstance(next(response), Repository)
+        assert ['-values.owner'] == \
+            httpretty.last_request().querystring['fields']
+
 
 class TestAccessingLinks(RepositoryFixture):
     @classmethod
@@ -386,6 +457,17 @@ class TestAccessingLinks(RepositoryFixture):
         response = self.response.forks()
         assert isinstance(next(response), Repository)
 
+    @httpretty.activate
+    def test_raw_forks_returns_a_generator_of_dicts(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.forks_url,
+            content_type='application/json',
+            body=self.forks_data,
+            status=200)
+        response = self.response.forks(raw=True)
+        assert isinstance(next(response), dict)
+
     @httpretty.activate
     def test_watchers_returns_a_user_generator(self):
         httpretty.register_uri(
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import httpretty
+import json
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from test_auth import FakeAuth
+
+from pybitbucket.bitbucket import Client, ServerError
+from pybitbucket.retry import RetryPolicy
+
+
+class RecordedSleep(object):
+    def __init__(self):
+        self.waits = []
+
+    def __call__(self, seconds):
+        self.waits.append(seconds)
+
+
+class RetryFixture(object):
+    def setup_method(self, method):
+        self.sleep = RecordedSleep()
+        self.client = Client(
+            FakeAuth(),
+            retry=RetryPolicy(max_retries=2, sleep=self.sleep))
+        self.url = self.client.get_bitbucket_url() + '/2.0/things'
+
+    def register_pages(self, pages, failures):
+        for page in range(1, pages + 1):
+            example = {
+                'page': page,
+                'pagelen': 1,
+                'size': pages,
+                'values': [{'n': page}],
+            }
+            if page < pages:
+                example['next'] = self.url + '?page={0}'.format(page + 1)
+            ok = httpretty.Response(body=json.dumps(example), status=200)
+            httpretty.register_uri(
+                httpretty.GET,
+                self.url + ('?page={0}'.format(page) if page > 1 else ''),
+                match_querystring=True,
+                content_type='application/json',
+                responses=failures.get(page, []) + [ok])
+
+    @staticmethod
+    def requested_pages():
+        return [
+            r.querystring.get('page', ['1'])[0]
+            for r in httpretty.HTTPretty.latest_requests]
+
+
+class TestRetryingPages(RetryFixture):
+    @httpretty.activate
+    def test_a_failed_page_is_retried_without_starting_over(self):
+        self.register_pages(3, {2: [httpretty.Response(body='', status=503)]})
+        items = list(self.client.remote_relationship(self.url))
+        assert [1, 2, 3] == [i['n'] for i in items]
+        assert ['1', '2', '2', '3'] == self.requested_pages()
+        assert 1 == len(self.sleep.waits)
+
+    @httpretty.activate
+    def test_retry_after_is_honoured(self):
+        self.register_pages(1, {1: [httpretty.Response(
+            body='',
+            status=429,
+            adding_headers={'Retry-After': '7'})]})
+        list(self.client.remote_relationship(self.url))
+        assert [7.0] == self.sleep.waits
+
+    @httpretty.activate
+    def test_too_long_a_retry_after_is_not_waited_for(self):
+        self.register_pages(1, {1: [httpretty.Response(
+            body='',
+            status=503,
+            adding_headers={'Retry-After': '3600'})]})
+        with pytest.raises(ServerError):
+            list(self.client.remote_relationship(self.url))
+        assert [] == self.sleep.waits
+
+    @httpretty.activate
+    def test_the_error_gives_the_page_to_resume_from(self):
+        failure = httpretty.Response(body='', status=502)
+        self.register_pages(3, {3: [failure] * 3})
+        items = self.client.remote_relationship(self.url)
+        assert [1, 2] == [next(items)['n'], next(items)['n']]
+        with pytest.raises(ServerError) as e:
+            next(items)
+        assert e.value.url.endswith('?page=3')
+        assert 2 == len(self.sleep.waits)
+
+    @httpretty.activate
+    def test_posts_are_not_retried(self):
+        httpretty.register_uri(
+            httpretty.POST,
+            self.url,
+            responses=[
+                httpretty.Response(body='', status=503),
+                httpretty.Response(body='{}', status=200),
+            ])
+        with pytest.raises(ServerError) as e:
+            self.client.post(self.url, json={})
+        # The 200 that a retry would have found was never asked for.
+        assert 503 == e.value.code
+        assert [] == self.sleep.waits
+
+
+class Response(object):
+    status_code = 200
+    headers = {}
+
+
+class TestRetryPolicy(object):
+    def test_connection_errors_are_retried(self):
+        sleep = RecordedSleep()
+        attempts = []
+
+        def request():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError()
+            return response
+
+        response = Response()
+        policy = RetryPolicy(sleep=sleep)
+        assert response is policy.call('GET', request)
+        assert 2 == len(sleep.waits)
+
+    def test_responses_are_closed_before_a_retry(self):
+        class ClosingResponse(Response):
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        failed, succeeded = ClosingResponse(), ClosingResponse()
+        failed.status_code = 503
+        responses = [failed, succeeded]
+        policy = RetryPolicy(sleep=RecordedSleep())
+        assert succeeded is policy.call('GET', lambda: responses.pop(0))
+        assert failed.closed
+        assert not succeeded.closed
+
+    def test_connection_errors_are_raised_for_posts(self):
+        def request():
+            raise ConnectionError()
+
+        with pytest.raises(ConnectionError):
+            RetryPolicy(sleep=RecordedSleep()).call('POST', request)
+
+    def test_backoff_grows_with_jitter_up_to_a_limit(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5)
+        waits = [policy.backoff(retry) for retry in range(10)]
+        assert all(0 <= w <= min(5, 2 ** r) for (r, w) in enumerate(waits))
+
+    def test_retry_after_as_an_http_date(self):
+        response = Response()
+        response.headers = {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+        # The date has passed, so there is no need to wait.
+        assert 0 == RetryPolicy.retry_after(response)
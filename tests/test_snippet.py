@@ -3,6 +3,7 @@ from test_bitbucketbase import BitbucketFixture
 import json
 
 import httpretty
+import pytest
 from uritemplate import expand
 from pybitbucket.bitbucket import Bitbucket, RepositoryType
 from pybitbucket.snippet import (
@@ -405,6 +406,119 @@ class TestAccessingSnippetContent(SnippetFixture):
             'this_file_is_not_in_the_snippet.test')
         assert not content
 
+    @httpretty.activate
+    def test_content_can_be_streamed(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.response.file_url(self.filename),
+            body='example',
+            status=200)
+        chunks = self.response.stream(self.filename, chunk_size=3)
+        assert [b'exa', b'mpl', b'e'] == list(chunks)
+
+    @httpretty.activate
+    def test_content_can_be_downloaded_into_a_buffer(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.response.file_url(self.filename),
+            body='example',
+            status=200)
+        buffer = bytearray(10)
+        assert 7 == self.response.download(self.filename, buffer)
+        assert b'example' == bytes(buffer[:7])
+        with pytest.raises(ValueError):
+            self.response.download(self.filename, bytearray(3))
+
+    @httpretty.activate
+    def test_content_can_be_downloaded_into_a_file(self, tmpdir):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.response.file_url(self.filename),
+            body='example',
+            status=200)
+        destination = str(tmpdir.join('copy'))
+        assert 7 == self.response.download(self.filename, destination)
+        with open(destination, 'rb') as f:
+            assert b'example' == f.read()
+
+    def test_nothing_is_streamed_for_missing_file(self):
+        assert self.response.stream('not_in_the_snippet.test') is None
+
+
+class TestDownloadingEverySnippetFile(SnippetFixture):
+    @httpretty.activate
+    def test_files_are_downloaded_concurrently(self, tmpdir):
+        snippet = Snippet(
+            json.loads(self.resource_data('Snippet.two_files')),
+            client=Client(FakeAuth()))
+        for filename in snippet.filenames:
+            httpretty.register_uri(
+                httpretty.GET,
+                snippet.file_url(filename),
+                body=filename,
+                status=200 if filename.endswith('.txt') else 404)
+        results = {
+            path.basename(r.url): r
+            for r in snippet.download_all(str(tmpdir), max_workers=2)}
+        written = results['example_upload_1.txt']
+        assert written.ok
+        with open(written.resource) as f:
+            assert 'example_upload_1.txt' == f.read()
+        assert not results['example_upload_2.rst'].ok
+
+    @staticmethod
+    def snippet_with_files(filenames):
+        url = 'https://api.bitbucket.org/2.0/snippets/evzijst/kypj'
+        return {
+            'id': 'kypj',
+            'links': {'self': {'href': url}},
+            'files': {
+                filename: {'links': {'self': {
+                    'href': url + '/files/{0}'.format(i)}}}
+                for (i, filename) in enumerate(filenames)},
+        }
+
+    @httpretty.activate
+    def test_files_keep_their_relative_paths(self, tmpdir):
+        data = self.snippet_with_files([
+            'docs/README', 'src/README', '../escape', '/etc/escape'])
+        snippet = Snippet(data, client=Client(FakeAuth()))
+        for filename in data['files']:
+            httpretty.register_uri(
+                httpretty.GET, snippet.file_url(filename), body=filename)
+        results = list(snippet.download_all(str(tmpdir)))
+        written = sorted(r.resource for r in results if r.ok)
+        assert [
+            path.join(str(tmpdir), 'docs', 'README'),
+            path.join(str(tmpdir), 'src', 'README'),
+        ] == written
+        with open(written[1]) as f:
+            assert 'src/README' == f.read()
+        errors = [r.error for r in results if not r.ok]
+        assert 2 == len(errors)
+        assert all(isinstance(e, ValueError) for e in errors)
+        assert ['docs', 'src'] == sorted(
+            p.basename for p in tmpdir.listdir())
+
+    @httpretty.activate
+    def test_a_snippet_found_without_files_is_got_again(self, tmpdir):
+        data = self.snippet_with_files(['one.txt'])
+        httpretty.register_uri(
+            httpretty.GET,
+            data['links']['self']['href'],
+            content_type='application/json',
+            body=json.dumps(data))
+        httpretty.register_uri(
+            httpretty.GET,
+            data['files']['one.txt']['links']['self']['href'],
+            body='one')
+        listed = dict(data)
+        del listed['files']
+        snippet = Snippet(listed, client=Client(FakeAuth()))
+        results = list(snippet.download_all(str(tmpdir)))
+        assert [path.join(str(tmpdir), 'one.txt')] == [
+            r.resource for r in results]
+
 
 class TestOpeningFilesFromFilelist(SnippetFixture):
     @classmethod
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+import httpretty
+import json
+from glob import glob
+from os import path
+
+import pytest
+
+from test_auth import FakeAuth
+
+from pybitbucket.bitbucket import Client
+from pybitbucket.cache import ResponseCache
+from pybitbucket.pullrequest import PullRequest
+from pybitbucket.streaming import DiffParser, ValuesParser, parse_diff
+
+TEST_DIR = path.dirname(path.abspath(__file__))
+
+
+def parse(content, chunk_size):
+    parser = ValuesParser()
+    items = []
+    for start in range(0, len(content), chunk_size):
+        items.extend(parser.feed(content[start:start + chunk_size]))
+    items.extend(parser.feed(b'', final=True))
+    return items, parser.close()
+
+
+class TestValuesParser(object):
+    @pytest.mark.parametrize('chunk_size', [1, 3, 64, 1 << 20])
+    def test_pages_of_the_fixtures(self, chunk_size):
+        for filename in glob(path.join(TEST_DIR, '*_list.json')):
+            with open(filename, 'rb') as f:
+                content = f.read()
+            if not content:
+                continue
+            page = json.loads(content.decode('utf-8'))
+            if not isinstance(page, dict) or 'values' not in page:
+                continue
+            items, rest = parse(content, chunk_size)
+            assert page.pop('values') == items, filename
+            assert dict(page, values=[]) == rest, filename
+
+    def test_strings_do_not_fool_the_parser(self):
+        content = (
+            '{"next": "a \\"values\\": [", "values": ['
+            '{"t": "]}\\\\"}, {"t": "café {["}], "size": 2}'
+        ).encode('utf-8')
+        items, rest = parse(content, 1)
+        assert [{'t': ']}\\'}, {'t': u'café {['}] == items
+        assert {'next': 'a "values": [', 'values': [], 'size': 2} == rest
+
+    def test_items_are_given_as_soon_as_they_are_complete(self):
+        parser = ValuesParser()
+        assert [] == parser.feed(b'{"values": [{"n": 1')
+        assert [{'n': 1}] == parser.feed(b'}, {"n"')
+        assert [{'n': 2}] == parser.feed(b': 2}]}', final=True)
+        assert {'values': []} == parser.close()
+
+    def test_only_the_item_being_parsed_is_held(self):
+        parser = ValuesParser()
+        parser.feed(b'{"values": [')
+        for n in range(100):
+            parser.feed('{{"n": {0}}}, '.format(n).encode('utf-8'))
+        parser.feed(b'{"n": ')
+        assert '{"n": ' == parser.buffer
+
+    def test_a_large_item_is_decoded_once_it_has_arrived(self):
+        parser = ValuesParser()
+        parser.feed(b'{"values": [{"t": "')
+        items = []
+        for _ in range(10):
+            items.extend(parser.feed(b'x' * 10))
+        items.extend(parser.feed(b'"}]}', final=True))
+        assert [{'t': 'x' * 100}] == items
+        assert {'values': []} == parser.close()
+
+    def test_a_truncated_page_is_an_error(self):
+        parser = ValuesParser()
+        parser.feed(b'{"values": [{"n": 1}, {"n"', final=True)
+        with pytest.raises(ValueError):
+            parser.close()
+
+
+class TestStreamingClient(object):
+    def setup_method(self, method):
+        self.client = Client(FakeAuth(), stream=True)
+        with open(path.join(TEST_DIR, 'PullRequest.json')) as f:
+            self.pullrequest = json.load(f)
+        self.url = (
+            self.client.get_bitbucket_url() +
+            '/2.0/repositories/teamsinspace/teamsinspace.bitbucket.org'
+            '/pullrequests')
+
+    def register_pages(self, pages):
+        for page in range(1, pages + 1):
+            example = {
+                'page': page,
+                'pagelen': 2,
+                'size': 2 * pages,
+                'values': [self.pullrequest, self.pullrequest],
+            }
+            if page < pages:
+                example['next'] = self.url + '?page={0}'.format(page + 1)
+            httpretty.register_uri(
+                httpretty.GET,
+                self.url + ('?page={0}'.format(page) if page > 1 else ''),
+                match_querystring=True,
+                content_type='application/json',
+                body=json.dumps(example),
+                status=200)
+
+    @httpretty.activate
+    def test_pages_are_followed(self):
+        self.register_pages(3)
+        items = list(self.client.remote_relationship(self.url))
+        assert 6 == len(items)
+        assert all(isinstance(i, PullRequest) for i in items)
+
+    @httpretty.activate
+    def test_max_items_stops_before_the_next_page(self):
+        self.register_pages(3)
+        items = list(self.client.remote_relationship(self.url, max_items=2))
+        assert 2 == len(items)
+        assert 1 == len(httpretty.HTTPretty.latest_requests)
+
+    @httpretty.activate
+    def test_a_single_resource_is_streamed_whole(self):
+        httpretty.register_uri(
+            httpretty.GET,
+            self.url + '/1',
+            content_type='application/json',
+            body=json.dumps(self.pullrequest),
+            status=200)
+        items = list(self.client.remote_relationship(self.url + '/1'))
+        assert [PullRequest] == [type(i) for i in items]
+
+    @httpretty.activate
+    def test_cached_pages_can_be_streamed(self):
+        self.client.cache = ResponseCache()
+        self.register_pages(2)
+        assert 4 == len(list(self.client.remote_relationship(self.url)))
+        assert 4 == len(list(self.client.remote_relationship(self.url)))
+
+
+DIFF = b'''diff --git a/old.py b/new.py
+similarity index 90%
+rename from old.py
+rename to new.py
+index 1111111..2222222 100644
+--- a/old.py
++++ b/new.py
+@@ -1,3 +1,3 @@
+ keep
+--- a removed line that looks like a header
++++ an added line that looks like a header
+ keep
+\\ No newline at end of file
+diff --git a/added.txt b/added.txt
+new file mode 100644
+index 0000000..3333333
+--- /dev/null
++++ b/added.txt
+@@ -0,0 +1 @@
++hello
+diff --git a/gone.bin b/gone.bin
+deleted file mode 100644
+index 4444444..0000000
+Binary files a/gone.bin and /dev/null differ
+'''
+
+
+class TestDiffParser(object):
+    @pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+    def test_files_of_a_diff(self, chunk_size):
+        files = list(parse_diff(
+            DIFF[i:i + chunk_size] for i in range(0, len(DIFF), chunk_size)))
+        assert [
+            ('old.py', 'new.py', 1, 1, False),
+            (None, 'added.txt', 1, 0, False),
+            ('gone.bin', None, 0, 0, True),
+        ] == [
+            (f.old_path, f.new_path, f.added, f.removed, f.is_binary)
+            for f in files]
+
+    def test_hunks_keep_their_lines(self):
+        renamed = next(parse_diff([DIFF]))
+        [hunk] = renamed.hunks
+        assert (1, 3, 1, 3) == (
+            hunk.old_start, hunk.old_lines, hunk.new_start, hunk.new_lines)
+        assert 5 == len(hunk.lines)
+        assert (1, 1) == (hunk.added, hunk.removed)
+
+    def test_a_file_is_given_once_the_next_one_starts(self):
+        parser = DiffParser()
+        first, rest = DIFF.split(b'diff --git a/added', 1)
+        assert [] == parser.feed(first)
+        assert ['new.py', 'added.txt'] == [
+            f.path for f in parser.feed(b'diff --git a/added' + rest)]
+        assert ['gone.bin'] == [
+            f.path for f in parser.feed(b'', final=True)]
@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 import json
+import subprocess
+import sys
+from glob import glob
 from os import path
+
+import pytest
 from test_auth import FakeAuth
 
-from pybitbucket.bitbucket import Client
+from pybitbucket.bitbucket import BitbucketTypes, Client
+from pybitbucket.user import User
 
 
 class TestTypes(object):
@@ -45,3 +51,110 @@ class TestTypes(object):
         import pybitbucket.user  # noqa
         s = "%s" % self.object_from_file('User.json')
         assert s.startswith('User username:')
+
+    def test_type_index_agrees_with_is_type(self):
+        # The indexed lookup must find one of the classes
+        # that would have claimed the data by scanning every type.
+        Client.bitbucket_types.load_all()
+        for filename in glob(path.join(self.test_dir, '*.json')):
+            with open(filename) as f:
+                content = f.read()
+            if not content:
+                continue
+            example = json.loads(content)
+            if isinstance(example, dict) and example.get('values'):
+                items = example['values']
+            else:
+                items = [example]
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                matches = [
+                    t for t in Client.bitbucket_types if t.is_type(item)]
+                found = Client.bitbucket_types.type_of(item)
+                if matches:
+                    assert found in matches, filename
+                else:
+                    assert found is None, filename
+
+    def test_type_index_ignores_duplicate_registration(self):
+        types = BitbucketTypes()
+        types.add(User)
+        types.add(User)
+        assert [User] == types.by_resource_type['users']
+
+    def test_resource_modules_are_imported_when_first_seen(self):
+        # A fresh interpreter, since this one has imported them all.
+        script = """
+import json
+import sys
+from pybitbucket.bitbucket import Client
+from pybitbucket.auth import Anonymous
+loaded = lambda: sorted(
+    m for m in ('pybitbucket.commit', 'pybitbucket.repository')
+    if m in sys.modules)
+print(json.dumps(loaded()))
+with open({0!r}) as f:
+    repository = Client(Anonymous()).convert_to_object(json.load(f))
+print(json.dumps([loaded(), type(repository).__name__]))
+"""
+        filename = path.join(self.test_dir, 'Repository.json')
+        output = subprocess.check_output(
+            [sys.executable, '-c', script.format(filename)],
+            cwd=path.dirname(self.test_dir))
+        before, after = [
+            json.loads(line) for line in output.decode().splitlines()]
+        assert [] == before
+        assert [['pybitbucket.repository'], 'Repository'] == after
+
+    def test_resource_modules_are_imported_once_for_every_thread(self):
+        # Threads that see the data while its module is being imported
+        # must wait for its classes instead of finding none.
+        script = """
+import json
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from pybitbucket.bitbucket import Client
+from pybitbucket.auth import Anonymous
+with open({0!r}) as f:
+    data = json.load(f)
+client = Client(Anonymous())
+barrier = Barrier(8)
+def convert(_):
+    barrier.wait()
+    return type(client.convert_to_object(data)).__name__
+with ThreadPoolExecutor(max_workers=8) as executor:
+    print(json.dumps(list(executor.map(convert, range(8)))))
+"""
+        filename = path.join(self.test_dir, 'Repository.json')
+        output = subprocess.check_output(
+            [sys.executable, '-c', script.format(filename)],
+            cwd=path.dirname(self.test_dir))
+        assert ['Repository'] * 8 == json.loads(output.decode())
+
+    def test_slow_dependencies_are_imported_when_used(self):
+        script = """
+import json
+import sys
+import pybitbucket.bitbucket
+print(json.dumps(sorted(
+    m for m in (
+        'concurrent.futures', 'oauthlib', 'requests_oauthlib',
+        'pybitbucket.auth', 'pybitbucket.multipart',
+        'pybitbucket.streaming', 'uritemplate', 'voluptuous')
+    if m in sys.modules)))
+"""
+        output = subprocess.check_output(
+            [sys.executable, '-c', script],
+            cwd=path.dirname(self.test_dir))
+        assert [] == json.loads(output.decode())
+
+    @pytest.mark.skipif(
+        sys.version_info < (3, 7),
+        reason='module __getattr__ needs Python 3.7')
+    def test_resource_classes_are_still_found_in_bitbucket(self):
+        from pybitbucket.bitbucket import Repository
+        from pybitbucket.repository import Repository as Original
+        assert Original is Repository
+        with pytest.raises(ImportError):
+            from pybitbucket.bitbucket import Nonexistent  # noqa: F401
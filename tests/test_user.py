@@ -61,6 +61,14 @@ class TestCheckingTheExampleData(UserFixture):
         assert User.is_type(self.data)
 
 
+class TestDeferringTheV1Companion(UserFixture):
+    def test_v1_is_built_when_first_used_and_kept(self):
+        user = self.example_object()
+        assert 'v1' not in vars(user)
+        assert isinstance(user.v1, UserV1)
+        assert user.v1 is user.v1
+
+
 class TestCheckingTheExampleDataForV1(UserV1Fixture):
     @classmethod
     def setup_class(cls):
@@ -87,6 +95,26 @@ class TestFindingUserByUsername(UserFixture):
         assert 'Erik van Zijst' == response.display_name
 
 
+class TestFindingUsersByUsernames(UserFixture):
+    @httpretty.activate
+    def test_responses_are_users_as_they_arrive(self):
+        usernames = ['evzijst', 'someone', 'someone-else']
+        for username in usernames:
+            httpretty.register_uri(
+                httpretty.GET,
+                self.test_client.get_bitbucket_url() +
+                '/2.0/users/' + username,
+                content_type='application/json',
+                body=self.resource_data(),
+                status=200)
+        results = list(User.find_users_by_usernames(
+            usernames,
+            client=self.test_client,
+            max_workers=2))
+        assert 3 == len(results)
+        assert all(isinstance(r.resource, User) for r in results)
+
+
 class TestFindingCurrentUser(UserFixture):
     @httpretty.activate
     def test_response_is_a_user(self):